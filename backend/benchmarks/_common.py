@@ -0,0 +1,64 @@
+"""Shared setup for the benchmark scripts.
+
+Each script runs against a throwaway test database (in-memory for SQLite) built
+from the migrations, so it never touches db.sqlite3:
+
+    cd backend
+    python benchmarks/search_transactions.py --rows 1000000
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expense_backend.settings')
+
+
+@contextmanager
+def benchmark_database(on_disk=False, throttled=False):
+    """on_disk=True uses a temporary SQLite file, so threads get their own connections to it.
+
+    Request throttling is off unless throttled=True: the scripts call endpoints far more often than clients may.
+    """
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import override_settings
+    old_name = connection.settings_dict['NAME']
+    if on_disk and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(**({} if throttled else {'LEDGER_THROTTLE_RATES': {}})):
+            yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def create_company(name='Benchmark Co', directors=2):
+    from ledger.models import Company, Director, User
+    owner = User.objects.create_user(f'{name}-owner', password='x', role='COMPANY')
+    company = Company.objects.create(name=name, created_by=owner)
+    users = []
+    for index in range(directors):
+        user = User.objects.create_user(f'{name}-director-{index}', password='x')
+        Director.objects.create(user=user, company=company)
+        users.append(user)
+    return company, owner, users
+
+
+def timeit(label, fn, repeat=5):
+    """Run fn `repeat` times and print the median and best wall time"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    print(f'{label:<48} median {statistics.median(timings) * 1000:9.2f} ms   best {min(timings) * 1000:9.2f} ms')
+    return result
@@ -0,0 +1,155 @@
+"""Concurrent approvals: every director approves every item at once, from many threads.
+
+Each director's requests go through the API with an Idempotency-Key and are
+sent twice, as a client retrying after a timeout would. Afterwards every item
+must be APPROVED with exactly one approval per eligible director, the company counters
+must match the ledger and each income transaction must have queued exactly one
+milestone check. Exits non-zero if any check fails.
+
+    python benchmarks/approval_stress.py --directors 4 --items 50
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from _common import benchmark_database, create_company
+
+
+def seed(company, owner, directors, items):
+    from ledger import approvals
+    from ledger.bookkeeping import record_change, snapshot
+    from ledger.models import Director, Project, Salary, Transaction
+
+    created = {'projects': [], 'transactions': [], 'salaries': [], 'payees': {}}
+    director_rows = list(Director.objects.filter(company=company))
+    for index in range(items):
+        project = Project.objects.create(
+            company=company, name=f'Project {index}', start_date=date(2025, 1, 1), project_value=1000,
+            created_by=owner, approvals_required=approvals.required_approvals(company, Project),
+        )
+        transaction = Transaction.objects.create(
+            company=company, transaction_type='INCOME' if index % 2 else 'EXPENSE', amount=Decimal(index + 1),
+            description=f'Item {index}', date=date(2025, 1, 1), account='COMPANY', created_by=owner,
+            approvals_required=approvals.required_approvals(company, Transaction),
+        )
+        salary = Salary.objects.create(
+            company=company, director=director_rows[index % len(director_rows)], amount=Decimal(10),
+            date=date(2025, 1, 1), account='COMPANY', created_by=owner,
+            approvals_required=approvals.required_approvals(company, Salary),
+        )
+        for obj in (project, transaction, salary):
+            approvals.open_approvals(obj)
+            record_change(None, snapshot(obj))
+        created['projects'].append(project.id)
+        created['transactions'].append(transaction.id)
+        created['salaries'].append(salary.id)
+        created['payees'][salary.id] = salary.director.user_id
+    return created
+
+
+def director_worker(user, created, errors):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user)
+    requests = [
+        (f'/api/{kind}/{pk}/approve/', f'{user.id}-{kind}-{pk}')
+        for kind in ('projects', 'transactions', 'salaries')
+        for pk in created[kind]
+        # Nobody approves their own salary
+        if not (kind == 'salaries' and created['payees'][pk] == user.id)
+    ]
+    random.Random(user.id).shuffle(requests)
+    try:
+        for path, key in requests:
+            # The retry must replay the first response, not count a second approval
+            for _ in range(2):
+                response = client.post(path, HTTP_IDEMPOTENCY_KEY=key)
+                if response.status_code != 200:
+                    errors.append(f'{path}: {response.status_code} {response.data}')
+    except Exception as e:
+        errors.append(f'{user.username}: {e!r}')
+    finally:
+        connection.close()
+
+
+def check(company, directors, created):
+    from django.db.models import Sum
+    from ledger.models import (
+        CompanyCounters, OutboxTask, Project, ProjectApproval, Salary, SalaryApproval, Transaction, TransactionApproval,
+    )
+
+    failures = []
+    for model, ids in ((Project, created['projects']), (Transaction, created['transactions']), (Salary, created['salaries'])):
+        for item in model.objects.filter(pk__in=ids):
+            if item.status != 'APPROVED':
+                failures.append(f'{model.__name__} {item.pk} is {item.status}')
+            if item.approvals_received != item.approvals_required:
+                failures.append(f'{model.__name__} {item.pk} counted {item.approvals_received} approvals')
+    for approval_model, field, ids in (
+        (ProjectApproval, 'project', created['projects']),
+        (TransactionApproval, 'transaction', created['transactions']),
+    ):
+        approved = approval_model.objects.filter(**{f'{field}__in': ids}, approved=True).count()
+        if approved != len(ids) * len(directors):
+            failures.append(f'{approval_model.__name__}: {approved} approved rows, expected {len(ids) * len(directors)}')
+    approved = SalaryApproval.objects.filter(salary__in=created['salaries'], approved=True).count()
+    if approved != len(created['salaries']) * (len(directors) - 1):
+        failures.append(f'SalaryApproval: {approved} approved rows, expected {len(created["salaries"]) * (len(directors) - 1)}')
+
+    counters = CompanyCounters.objects.get(company=company)
+    income = Transaction.objects.filter(
+        company=company, status='APPROVED', transaction_type='INCOME',
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    pending = (counters.pending_projects, counters.pending_transactions, counters.pending_salaries)
+    if pending != (0, 0, 0):
+        failures.append(f'pending counters are {pending}, expected all zero')
+    if counters.approved_income_total != income:
+        failures.append(f'approved_income_total is {counters.approved_income_total}, ledger says {income}')
+
+    income_ids = list(Transaction.objects.filter(pk__in=created['transactions'], transaction_type='INCOME').values_list('id', flat=True))
+    checks = [task.payload.get('transaction_id') for task in OutboxTask.objects.filter(kind='check_milestones')]
+    if sorted(checks) != sorted(income_ids):
+        failures.append(f'{len(checks)} milestone checks queued for {len(income_ids)} income transactions')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directors', type=int, default=4)
+    parser.add_argument('--items', type=int, default=50, help='Projects, transactions and salaries each')
+    args = parser.parse_args()
+
+    with benchmark_database(on_disk=True):
+        from django.test.utils import setup_test_environment
+        # Lets the test client's "testserver" host through ALLOWED_HOSTS
+        setup_test_environment()
+        company, owner, directors = create_company(directors=args.directors)
+        created = seed(company, owner, directors, args.items)
+        errors = []
+        threads = [threading.Thread(target=director_worker, args=(user, created, errors)) for user in directors]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        requests = (3 * len(directors) - 1) * args.items * 2
+        print(f'{requests} approve requests from {len(directors)} threads in {elapsed:.2f}s')
+
+        failures = errors + check(company, directors, created)
+        for failure in failures[:20]:
+            print('FAIL', failure)
+        if failures:
+            print(f'{len(failures)} failures')
+            sys.exit(1)
+        print('OK: every item approved exactly once per director')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Cost of auditing on write requests: no audit vs. buffered (one INSERT per request) vs. per-change inserts.
+
+Each request creates a transaction, which approves itself in a single-director
+company, so it makes two audited changes. The requests go through the API on an
+on-disk database, so commits cost what they do in production.
+
+    python benchmarks/audit_overhead.py --requests 300
+"""
+import argparse
+import time
+
+from _common import benchmark_database, create_company
+
+
+def run(company, owner, requests, label):
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from ledger.models import AuditEntry
+
+    client = APIClient()
+    client.force_authenticate(owner)
+    inserts = 0
+
+    def count_inserts(execute, sql, params, many, context):
+        nonlocal inserts
+        inserts += sql.startswith('INSERT INTO "ledger_auditentry"')
+        return execute(sql, params, many, context)
+
+    before = AuditEntry.objects.count()
+    started = time.perf_counter()
+    with connection.execute_wrapper(count_inserts):
+        for index in range(requests):
+            client.post('/api/transactions/', {
+                'company': company.id, 'transaction_type': 'EXPENSE', 'amount': '10', 'date': '2025-01-01',
+                'account': 'COMPANY', 'description': f'{label} {index}',
+            }, format='json')
+    elapsed = time.perf_counter() - started
+    print(
+        f'{label:<22} {elapsed / requests * 1000:7.2f} ms/request   '
+        f'{inserts / requests:4.1f} audit INSERTs/request   {AuditEntry.objects.count() - before} entries'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    with benchmark_database(on_disk=True):
+        from django.conf import settings
+        from django.db.models.signals import post_delete, post_init, post_save
+        from django.test.utils import override_settings, setup_test_environment
+        from ledger import audit
+
+        setup_test_environment()
+        company, owner, _ = create_company(directors=1)
+        unbuffered = [m for m in settings.MIDDLEWARE if m != 'ledger.middleware.AuditMiddleware']
+
+        for model in audit.AUDITED:
+            for signal, name in ((post_init, 'init'), (post_save, 'save'), (post_delete, 'delete')):
+                signal.disconnect(sender=model, dispatch_uid=f'audit-{name}-{model.__name__}')
+        run(company, owner, args.requests, 'no audit')
+        audit.connect()
+        run(company, owner, args.requests, 'buffered')
+        # Without the middleware every change is written on its own as it commits
+        with override_settings(MIDDLEWARE=unbuffered):
+            run(company, owner, args.requests, 'insert per change')
+
+
+if __name__ == '__main__':
+    main()
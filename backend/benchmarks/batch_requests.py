@@ -0,0 +1,68 @@
+"""Several API calls as separate requests vs. one POST /api/batch/.
+
+Every separate request goes through the middleware and validates its JWT;
+the batch does that once and dispatches the calls in-process. Time to data
+adds one round trip (--rtt-ms) per request made in sequence.
+
+    python benchmarks/batch_requests.py --calls 8 --rtt-ms 150
+"""
+import argparse
+import statistics
+import time
+
+from _common import benchmark_database, create_company
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=8)
+    parser.add_argument('--rtt-ms', type=float, default=150)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.test.utils import setup_test_environment
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from ledger.models import Transaction
+
+        setup_test_environment()
+        company, owner, _ = create_company(directors=2)
+        ids = [
+            Transaction.objects.create(
+                company=company, transaction_type='EXPENSE', amount='10', date='2025-01-01', account='COMPANY',
+                created_by=owner, approvals_required=2,
+            ).id
+            for _ in range(args.calls)
+        ]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(owner).access_token}')
+        paths = [f'/api/transactions/{pk}/' for pk in ids]
+
+        def separate():
+            for path in paths:
+                assert client.get(path).status_code == 200
+
+        def batched():
+            response = client.post('/api/batch/', {'requests': [{'path': path} for path in paths]}, format='json')
+            assert all(sub['status'] == 200 for sub in response.data['responses'])
+
+        for label, fn, round_trips in (('separate requests', separate, args.calls), ('one batch', batched, 1)):
+            server = median_ms(fn, args.repeat)
+            print(
+                f'{label:<18} server {server:7.2f} ms   {round_trips} sequential round trip(s)   '
+                f'time to data {server + round_trips * args.rtt_ms:8.2f} ms'
+            )
+
+
+if __name__ == '__main__':
+    main()
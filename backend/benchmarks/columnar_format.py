@@ -0,0 +1,43 @@
+"""/api/transactions/ as a list of objects vs. ?format=columnar, with and without ?fields=.
+
+Seeds the same company as list_serializers.py and prints the response size
+and time of each variant, plus gzip-compressed sizes.
+
+    python benchmarks/columnar_format.py --rows 10000
+"""
+import argparse
+
+from _common import benchmark_database, create_company, timeit
+from list_serializers import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.test.utils import setup_test_environment
+        from rest_framework.test import APIClient
+
+        setup_test_environment()
+        company, owner, users = create_company(directors=3)
+        seed(company, users, args.rows)
+        client = APIClient()
+        client.force_authenticate(owner)
+
+        for label, query in (
+            ('objects', ''),
+            ('columnar', '&format=columnar'),
+            ('columnar, fields=date,amount', '&format=columnar&fields=date,amount'),
+            ('columnar, fields=date,transaction_type,base_amount', '&format=columnar&fields=date,transaction_type,base_amount'),
+        ):
+            path = f'/api/transactions/?company={company.id}{query}'
+            plain = len(client.get(path).content)
+            compressed = len(client.get(path, HTTP_ACCEPT_ENCODING='gzip').content)
+            print(f'{label:<48} {plain:12,d} bytes {compressed:12,d} gzipped')
+            timeit('  GET', lambda: client.get(path), repeat=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Deleting and archiving a large company: one cascading delete vs. chunked purge/archive.
+
+A company's Company.delete() removes every row in a single transaction, which
+holds SQLite's write lock (and the request) for its whole duration. The purge
+and archive tasks move a few hundred rows per transaction instead; what
+matters for other requests is the longest of those transactions.
+
+    python benchmarks/company_archive.py --rows 200000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from _common import benchmark_database, create_company
+
+
+def seed(connection, company, user, rows):
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    sql = (
+        'INSERT INTO ledger_transaction (company_id, transaction_type, amount, description, date, account, '
+        'is_project_related, created_by_id, created_at, status, approvals_required, approvals_received, currency) '
+        "VALUES (%s, %s, %s, 'seeded', %s, 'COMPANY', 0, %s, '2025-01-01 00:00:00', 'APPROVED', 1, 1, 'INR')"
+    )
+    with connection.cursor() as cursor:
+        batch = []
+        for _ in range(rows):
+            batch.append((
+                company.id, rng.choice(('INCOME', 'EXPENSE')), f'{rng.randint(100, 10000000) / 100:.2f}',
+                (start + timedelta(days=rng.randint(0, 1999))).isoformat(), user.id,
+            ))
+            if len(batch) == 10000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+        # One approval per transaction
+        cursor.execute(
+            'INSERT INTO ledger_transactionapproval (transaction_id, approver_id, approved, approved_at, notes) '
+            "SELECT id, %s, 1, '2025-01-02 00:00:00', '' FROM ledger_transaction WHERE company_id = %s",
+            [user.id, company.id],
+        )
+        cursor.execute('ANALYZE')
+
+
+class ChunkTimer:
+    """Wraps archive._delete to record how long each chunk's transaction takes"""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.original = archive._delete
+        self.timings = []
+
+    def __enter__(self):
+        def timed(model, rows):
+            started = time.perf_counter()
+            self.original(model, rows)
+            self.timings.append(time.perf_counter() - started)
+        self.archive._delete = timed
+        return self
+
+    def __exit__(self, *exc):
+        self.archive._delete = self.original
+
+
+def report(label, elapsed, longest):
+    print(f'{label:<34} total {elapsed * 1000:10.1f} ms   longest transaction {longest * 1000:8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Transactions per company (each with one approval)')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with benchmark_database(on_disk=True) as connection:
+        from django.db import transaction
+        from django.utils import timezone
+        from ledger import archive
+        from ledger.models import ArchivedRow, Company, Transaction
+
+        companies = []
+        for name in ('Hard delete', 'Chunked purge', 'Archive'):
+            company, owner, _ = create_company(name=name, directors=1)
+            seed(connection, company, owner, args.rows)
+            companies.append(company)
+        print(f'Seeded 3 companies with {args.rows} transactions and {args.rows} approvals each')
+        hard, purged, archived = companies
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            hard.delete()
+        elapsed = time.perf_counter() - started
+        report('Company.delete() (cascade)', elapsed, elapsed)
+
+        Company.objects.filter(pk=purged.pk).update(deleted_at=timezone.now())
+        with ChunkTimer(archive) as timer:
+            started = time.perf_counter()
+            archive.purge_company(purged.pk, chunk_size=args.chunk_size)
+            report(f'purge_company (chunks of {args.chunk_size})', time.perf_counter() - started, max(timer.timings))
+
+        with ChunkTimer(archive) as timer:
+            started = time.perf_counter()
+            counts = archive.archive_company(archived, chunk_size=args.chunk_size)
+            report(f'archive_company (chunks of {args.chunk_size})', time.perf_counter() - started, max(timer.timings))
+        assert ArchivedRow.objects.filter(company_id=archived.pk).count() == sum(counts.values())
+
+        started = time.perf_counter()
+        archive.restore_company(Company.all_objects.get(pk=archived.pk), chunk_size=args.chunk_size)
+        print(f'{"restore_company":<34} total {(time.perf_counter() - started) * 1000:10.1f} ms')
+        assert Transaction.objects.filter(company=archived).count() == args.rows
+
+
+if __name__ == '__main__':
+    main()
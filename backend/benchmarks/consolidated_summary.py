@@ -0,0 +1,79 @@
+"""An owner's totals across many companies: one /api/summary/ per company vs. /api/summary/consolidated/.
+
+Every company gets --rows approved transactions spread over five years and
+its month-end snapshots, so both paths start from the same base positions.
+
+    python benchmarks/consolidated_summary.py --companies 200 --rows 500
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+
+from _common import benchmark_database, timeit
+
+
+def seed(connection, owner, companies, rows):
+    from ledger.models import Company
+    from ledger.snapshots import build_snapshots
+
+    rng = random.Random(42)
+    start = date(2021, 1, 1)
+    ids = [Company.objects.create(name=f'Company {index}', created_by=owner).id for index in range(companies)]
+    sql = (
+        'INSERT INTO ledger_transaction (company_id, transaction_type, amount, description, date, account, '
+        'is_project_related, created_by_id, created_at, status, approvals_required, approvals_received, currency) '
+        "VALUES (%s, %s, %s, '', %s, %s, 0, %s, '2025-01-01 00:00:00', 'APPROVED', 0, 0, 'INR')"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (company_id, rng.choice(('INCOME', 'EXPENSE')), f'{rng.randint(100, 1000000) / 100:.2f}',
+             (start + timedelta(days=rng.randint(0, 1999))).isoformat(), rng.choice(('PARTNER1', 'PARTNER2', 'COMPANY')),
+             owner.id)
+            for company_id in ids for _ in range(rows)
+        ])
+        cursor.execute('ANALYZE')
+    for company_id in ids:
+        build_snapshots(company_id)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--companies', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=500, help='Transactions per company')
+    args = parser.parse_args()
+
+    with benchmark_database() as connection:
+        from django.db import reset_queries
+        from django.test.utils import CaptureQueriesContext, setup_test_environment
+        from rest_framework.test import APIClient
+        from ledger.models import User
+
+        setup_test_environment()
+        owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        ids = seed(connection, owner, args.companies, args.rows)
+        client = APIClient()
+        client.force_authenticate(owner)
+        print(f'{args.companies} companies with {args.rows} transactions each')
+
+        def per_company():
+            return {company_id: client.get(f'/api/summary/?company={company_id}').data for company_id in ids}
+
+        def consolidated():
+            return json.loads(b''.join(client.get('/api/summary/consolidated/').streaming_content))
+
+        for label, fn in (('one summary per company', per_company), ('consolidated', consolidated)):
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                fn()
+            print(f'{label:<48} {len(queries.captured_queries):6d} queries')
+        separate = timeit('one summary per company', per_company, repeat=3)
+        combined = timeit('consolidated', consolidated, repeat=3)
+        assert all(
+            separate[item['id']]['total_balance'] == item['total_balance'] for item in combined['companies']
+        ), 'consolidated totals differ from the per-company summaries'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Dashboard page load: the separate requests it makes today vs. one /api/bootstrap/ call.
+
+Requests are authenticated with a real JWT, so every one of them pays for
+token validation and the user lookup. Server time is measured in-process; the
+time to data on a mobile link adds one round trip per sequential request
+(--rtt-ms), and the dashboard needs the company list before it can ask for
+the summary.
+
+    python benchmarks/dashboard_bootstrap.py --rows 5000 --rtt-ms 150
+"""
+import argparse
+import statistics
+import time
+
+from _common import benchmark_database, create_company
+from sync_feed import seed
+
+
+def measure(client, urls, repeat, **headers):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for url in urls:
+            response = client.get(url, **headers)
+            assert response.status_code in (200, 304), (url, response.status_code)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--rtt-ms', type=float, default=150)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with benchmark_database() as connection:
+        from django.test.utils import setup_test_environment
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from ledger.models import Milestone
+
+        setup_test_environment()
+        company, owner, _ = create_company(directors=2)
+        seed(connection, company, owner, args.rows)
+        for target in (10000, 100000, 1000000):
+            Milestone.objects.create(company=company, target_amount=target, label=f'{target}', created_by=owner)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(owner).access_token}')
+
+        separate = [
+            '/api/companies/', f'/api/summary/?company={company.id}', '/api/pending-approvals-count/',
+            f'/api/milestones/?company={company.id}', f'/api/transactions/?company={company.id}&date_from=2025-06-18',
+        ]
+        # The transactions filter stands in for "recent transactions" (about as many rows as bootstrap's ten).
+        # Companies come first, then the other four in parallel
+        rounds = {'separate requests': 2, 'bootstrap': 1, 'bootstrap, all ETags held': 1}
+        server = {}
+        server['separate requests'], _ = measure(client, separate, args.repeat)
+        server['bootstrap'], response = measure(client, ['/api/bootstrap/'], args.repeat)
+        etags = ', '.join(response.data['etags'].values())
+        server['bootstrap, all ETags held'], _ = measure(client, ['/api/bootstrap/'], args.repeat, HTTP_IF_NONE_MATCH=etags)
+        for label, seconds in server.items():
+            total = seconds * 1000 + rounds[label] * args.rtt_ms
+            print(f'{label:<28} server {seconds * 1000:8.2f} ms   {rounds[label]} round trip(s)   time to data {total:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
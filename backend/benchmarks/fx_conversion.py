@@ -0,0 +1,93 @@
+"""Base-currency totals over mixed-currency transactions: conversion in SQL vs. per row in Python.
+
+A third of the rows are in the company's base currency, the rest in USD or
+EUR with one imported rate per day. The SQL aggregate is what reports and
+snapshots use; the Python loops show what the rate LRU saves when single rows
+are converted (serializers, bookkeeping).
+
+    python benchmarks/fx_conversion.py --rows 1000000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from _common import benchmark_database, create_company, timeit
+
+CURRENCIES = ('INR', 'USD', 'EUR')
+DAYS = 2000
+
+
+def seed(connection, company, user, rows):
+    from ledger.models import FxRate
+
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    FxRate.objects.bulk_create([
+        FxRate(currency=currency, base_currency='INR', date=start + timedelta(days=day),
+               rate=Decimal(base + rng.uniform(-2, 2)).quantize(Decimal('0.0001')))
+        for currency, base in (('USD', 80), ('EUR', 90)) for day in range(DAYS)
+    ], batch_size=1000)
+    sql = (
+        'INSERT INTO ledger_transaction (company_id, transaction_type, amount, description, date, account, '
+        'is_project_related, created_by_id, created_at, status, approvals_required, approvals_received, currency) '
+        "VALUES (%s, %s, %s, '', %s, 'COMPANY', 0, %s, '2025-01-01 00:00:00', 'APPROVED', 0, 0, %s)"
+    )
+    batch = []
+    with connection.cursor() as cursor:
+        for _ in range(rows):
+            batch.append((
+                company.id, rng.choice(('INCOME', 'EXPENSE')), f'{rng.randint(100, 10000000) / 100:.2f}',
+                (start + timedelta(days=rng.randint(0, DAYS - 1))).isoformat(), user.id, rng.choice(CURRENCIES),
+            ))
+            if len(batch) == 10000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+        cursor.execute('ANALYZE')
+
+
+def python_total(qs, convert):
+    total = Decimal('0')
+    for amount, currency, day in qs.values_list('amount', 'currency', 'date').iterator(chunk_size=10000):
+        total += convert(amount, currency, 'INR', day)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--uncached-rows', type=int, default=20000, help='Rows for the uncached per-row loop')
+    args = parser.parse_args()
+
+    with benchmark_database() as connection:
+        from django.db.models import Sum
+        from ledger import fx
+        from ledger.models import Transaction
+
+        company, owner, _ = create_company()
+        print(f'Seeding {args.rows} transactions in {len(CURRENCIES)} currencies ...')
+        seed(connection, company, owner, args.rows)
+        qs = Transaction.objects.filter(company=company)
+
+        sql = timeit('SQL CASE + rate subquery (Sum)', lambda: qs.aggregate(total=Sum(fx.base_amount()))['total'], repeat=3)
+
+        def cached():
+            fx._imported_rate.cache_clear()
+            return python_total(qs, fx.convert)
+        python = timeit('Python per row, LRU rates', cached, repeat=3)
+        # SQLite sums decimals as floats, so compare at cent precision
+        sql = sql.quantize(fx.CENT)
+        print(f'totals agree: {sql == python} ({sql} vs {python}); {fx._imported_rate.cache_info()}')
+
+        def uncached(amount, currency, base_currency, day):
+            fx._imported_rate.cache_clear()
+            return fx.convert(amount, currency, base_currency, day)
+        sample = qs.order_by('id')[:args.uncached_rows]
+        timeit(f'Python per row, no cache ({args.uncached_rows} rows)', lambda: python_total(sample, uncached), repeat=1)
+        timeit(f'Python per row, LRU rates ({args.uncached_rows} rows)', lambda: python_total(sample, fx.convert), repeat=1)
+
+
+if __name__ == '__main__':
+    main()
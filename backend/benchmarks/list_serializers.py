@@ -0,0 +1,123 @@
+"""List endpoints: ModelSerializer(many=True) vs. the values() fast path in ledger/listings.py.
+
+Seeds a company with --rows transactions (pending ones with approvals, some in a
+foreign currency without a rate, some linked to a project, some with
+attachments), --rows / 10 salaries and a few milestones. It first checks that
+both paths render the same JSON bytes for every list, then times them and
+prints rows per second.
+
+    python benchmarks/list_serializers.py --rows 10000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from _common import benchmark_database, create_company, timeit
+
+
+def seed(company, users, rows):
+    from ledger.models import (
+        Attachment, Blob, FxRate, Milestone, Project, Salary, SalaryApproval, Transaction, TransactionApproval,
+    )
+
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    FxRate.objects.create(currency='USD', base_currency=company.base_currency, date=start, rate=Decimal('83.12345678'))
+    project = Project.objects.create(
+        company=company, name='Benchmark project', start_date=start, project_value=Decimal('100000'), created_by=users[0],
+    )
+    transactions = Transaction.objects.bulk_create([
+        Transaction(
+            company=company, transaction_type=rng.choice(('INCOME', 'EXPENSE')),
+            amount=Decimal(rng.randint(100, 1000000)) / 100, currency=rng.choice(('INR', 'INR', 'USD', 'EUR')),
+            description=f'Row {index}', date=start + timedelta(days=rng.randint(0, 700)),
+            account=rng.choice(('PARTNER1', 'PARTNER2', 'COMPANY')),
+            project=project if index % 5 == 0 else None, is_project_related=index % 5 == 0,
+            created_by=rng.choice(users), status='PENDING' if index % 3 == 0 else 'APPROVED',
+            approvals_required=len(users), approvals_received=1 if index % 3 == 0 else len(users),
+        )
+        for index in range(rows)
+    ])
+    TransactionApproval.objects.bulk_create([
+        TransactionApproval(transaction=transaction, approver=user, approved=user == users[0] or transaction.status == 'APPROVED')
+        for transaction in transactions for user in users
+    ])
+    directors = list(company.directors.all())
+    salaries = Salary.objects.bulk_create([
+        Salary(
+            company=company, director=directors[index % len(directors)], amount=Decimal('50000.00'),
+            date=start + timedelta(days=30 * (index % 24)), account='COMPANY', created_by=users[0],
+            approvals_required=len(users) - 1,
+        )
+        for index in range(rows // 10)
+    ])
+    SalaryApproval.objects.bulk_create([
+        SalaryApproval(salary=salary, approver=director.user)
+        for salary in salaries for director in directors if director != salary.director
+    ])
+    blob = Blob.objects.create(sha256='0' * 64, size=1234)
+    Attachment.objects.bulk_create(
+        [Attachment(company=company, transaction=transaction, blob=blob, filename='receipt.pdf',
+                    content_type='application/pdf', size=1234, uploaded_by=users[0]) for transaction in transactions[::7]]
+        + [Attachment(company=company, salary=salary, blob=blob, filename='payslip.pdf',
+                      content_type='application/pdf', size=1234, uploaded_by=users[0]) for salary in salaries[::5]]
+    )
+    for target in (1000, 100000, 10000000, 0):
+        Milestone.objects.create(
+            company=company, target_amount=target, label=f'{target}', created_by=users[0],
+            achieved=target <= 100000, achieved_at=date(2025, 1, 1) if target <= 100000 else None,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.test.utils import setup_test_environment
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from ledger import listings
+        from ledger.serializers import MilestoneSerializer, SalarySerializer, TransactionSerializer
+        from ledger.views import MilestoneViewSet, SalaryViewSet, TransactionViewSet
+
+        setup_test_environment()
+        company, owner, users = create_company(directors=3)
+        seed(company, users, args.rows)
+        factory = APIRequestFactory()
+        renderer = JSONRenderer()
+
+        def queryset(viewset):
+            # The list action's own queryset, filters and prefetching included
+            request = factory.get('/', {'company': company.id})
+            force_authenticate(request, owner)
+            view = viewset(action_map={'get': 'list'})
+            view.request = view.initialize_request(request)
+            view.format_kwarg = None
+            return view.get_queryset()
+
+        for label, viewset, serializer_class, fast in (
+            ('transactions', TransactionViewSet, TransactionSerializer, listings.transactions),
+            ('salaries', SalaryViewSet, SalarySerializer, listings.salaries),
+            ('milestones', MilestoneViewSet, MilestoneSerializer, listings.milestones),
+        ):
+            qs = queryset(viewset)
+            count = qs.count()
+            expected = renderer.render(serializer_class(qs.all(), many=True).data)
+            actual = renderer.render(fast(qs.all()))
+            assert actual == expected, f'{label}: the fast path renders different JSON'
+            print(f'{label}: {count} rows, identical JSON ({len(actual)} bytes)')
+            for name, fn in (
+                (f'{label} ModelSerializer', lambda: renderer.render(serializer_class(qs.all(), many=True).data)),
+                (f'{label} listings', lambda: renderer.render(fast(qs.all()))),
+            ):
+                started = time.perf_counter()
+                timeit(name, fn, repeat=3)
+                print(f'{"":<48} {count * 3 / (time.perf_counter() - started):12,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""One materialize_recurring run over many companies, then an idempotent re-run.
+
+Every company gets two directors, a monthly salary for each and two monthly
+subscriptions, all started six months ago, so the first run books
+6 * 4 rows per company.
+
+    python benchmarks/materialize_recurring.py --companies 2000
+"""
+import argparse
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from _common import benchmark_database
+
+
+def seed(companies):
+    from django.utils import timezone
+    from ledger.models import Company, Director, RecurringEntry, User
+
+    owners = User.objects.bulk_create([User(username=f'owner-{i}', role='COMPANY') for i in range(companies)])
+    company_rows = Company.objects.bulk_create([
+        Company(name=f'Company {i}', created_by=owner) for i, owner in enumerate(owners)
+    ])
+    users = User.objects.bulk_create([User(username=f'director-{i}-{n}') for i in range(companies) for n in range(2)])
+    directors = Director.objects.bulk_create([
+        Director(user=user, company=company_rows[index // 2]) for index, user in enumerate(users)
+    ])
+    start = timezone.localdate() - timedelta(days=180)
+    entries = []
+    for index, company in enumerate(company_rows):
+        owner = owners[index]
+        for director in directors[2 * index:2 * index + 2]:
+            entries.append(RecurringEntry(
+                company=company, kind='SALARY', amount=Decimal('3000'), account='COMPANY', director=director,
+                start_date=start, next_date=start, created_by=owner,
+            ))
+        for description, amount in (('hosting', Decimal('49')), ('office rent', Decimal('1200'))):
+            entries.append(RecurringEntry(
+                company=company, kind='TRANSACTION', transaction_type='EXPENSE', amount=amount, account='COMPANY',
+                description=description, start_date=start, next_date=start, created_by=owner,
+            ))
+    RecurringEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--companies', type=int, default=2000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from ledger.models import Salary, SalaryApproval, Transaction, TransactionApproval
+        from ledger.recurring import materialize
+
+        seed(args.companies)
+        for label in ('first run', 're-run'):
+            started = time.perf_counter()
+            stats = materialize()
+            print(f'{label:<10} {time.perf_counter() - started:7.2f}s  {stats}')
+        print(
+            f'{Transaction.objects.count()} transactions, {Salary.objects.count()} salaries, '
+            f'{TransactionApproval.objects.count() + SalaryApproval.objects.count()} approval rows'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Rendering and compressing the large list responses.
+
+Seeds the same company as list_serializers.py, then for /api/transactions/ and
+/api/salaries/:
+
+- renders the list with the stock JSONRenderer and with FastJSONRenderer,
+  checking that the bytes are identical, and times both;
+- compresses the body with gzip and, when installed, Brotli, and prints bytes
+  on the wire and compression time;
+- times the whole request without and with Accept-Encoding.
+
+    python benchmarks/response_encoding.py --rows 10000
+"""
+import argparse
+import time
+
+from _common import benchmark_database, create_company, timeit
+from list_serializers import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.test.utils import setup_test_environment
+        from django.utils.text import compress_string
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIClient
+        from ledger import listings, middleware, renderers
+        from ledger.models import Salary, Transaction
+
+        setup_test_environment()
+        company, owner, users = create_company(directors=3)
+        seed(company, users, args.rows)
+        client = APIClient()
+        client.force_authenticate(owner)
+        print(f'orjson: {"yes" if renderers.orjson else "no"}   brotli: {"yes" if middleware.brotli else "no"}')
+
+        for label, path, build, model in (
+            ('transactions', '/api/transactions/', listings.transactions, Transaction),
+            ('salaries', '/api/salaries/', listings.salaries, Salary),
+        ):
+            data = build(model.objects.filter(company=company))
+            stock = JSONRenderer().render(data)
+            fast = renderers.FastJSONRenderer().render(data)
+            assert fast == stock, f'{label}: FastJSONRenderer output differs from JSONRenderer'
+            print(f'{label}: {len(data)} rows, identical JSON')
+            timeit(f'{label} render JSONRenderer', lambda: JSONRenderer().render(data))
+            timeit(f'{label} render FastJSONRenderer', lambda: renderers.FastJSONRenderer().render(data))
+
+            codecs = [('gzip', lambda body: compress_string(body, max_random_bytes=100))]
+            if middleware.brotli is not None:
+                codecs.append(('br', lambda body: middleware.brotli.compress(body, quality=middleware.BROTLI_QUALITY)))
+            print(f'{label + " identity":<48} {len(stock):12,d} bytes')
+            for coding, compress in codecs:
+                started = time.perf_counter()
+                size = len(compress(stock))
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f'{label + " " + coding:<48} {size:12,d} bytes  {elapsed:8.2f} ms  ({len(stock) / size:.1f}x)')
+
+            for coding in ('identity', 'gzip'):
+                response = client.get(path, HTTP_ACCEPT_ENCODING=coding)
+                assert response.get('Content-Encoding', 'identity') == coding
+                timeit(f'GET {path} Accept-Encoding: {coding}', lambda: client.get(path, HTTP_ACCEPT_ENCODING=coding), repeat=3)
+
+
+if __name__ == '__main__':
+    main()
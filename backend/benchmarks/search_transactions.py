@@ -0,0 +1,70 @@
+"""Transaction search: indexed full-text lookup vs. a LIKE scan.
+
+    python benchmarks/search_transactions.py --rows 1000000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from _common import benchmark_database, create_company, timeit
+
+WORDS = (
+    'aws invoice google workspace rent office travel taxi hotel laptop monitor '
+    'consulting retainer hosting domain renewal salary advance marketing ads '
+    'facebook linkedin printer paper coffee team lunch client dinner figma slack'
+).split()
+
+
+def seed(connection, company, user, rows):
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    sql = (
+        'INSERT INTO ledger_transaction (company_id, transaction_type, amount, description, date, account, '
+        'is_project_related, created_by_id, created_at, status, approvals_required, approvals_received, currency) '
+        "VALUES (%s, %s, %s, %s, %s, %s, 0, %s, %s, %s, 0, 0, 'INR')"
+    )
+    batch = []
+    with connection.cursor() as cursor:
+        for index in range(rows):
+            batch.append((
+                company.id, rng.choice(('INCOME', 'EXPENSE')), rng.randint(1, 100000),
+                ' '.join(rng.sample(WORDS, 4)) + f' #{index}',
+                (start + timedelta(days=rng.randint(0, 2000))).isoformat(),
+                'COMPANY', user.id, '2025-01-01 00:00:00', 'APPROVED',
+            ))
+            if len(batch) == 10000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+        # Give the query planner real statistics, as a periodically analyzed production DB would have
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with benchmark_database() as connection:
+        from ledger.models import Transaction
+        from ledger.search import search_transactions
+
+        company, owner, _ = create_company()
+        print(f'Seeding {args.rows} transactions ...')
+        seed(connection, company, owner, args.rows)
+
+        qs = Transaction.objects.filter(company=company)
+        for text in ('aws invoice', 'figma', 'invoise', 'retainer hosting renewal', str(args.rows // 3)):
+            timeit(f'indexed search {text!r} (first 50)', lambda: list(search_transactions(qs, text)[:50]))
+            timeit(f'LIKE scan      {text!r} (first 50)', lambda: list(
+                qs.filter(description__icontains=text.split()[0])[:50]
+            ))
+            timeit(f'indexed search {text!r} (count)', lambda: search_transactions(qs, text).count(), repeat=3)
+            timeit(f'LIKE scan      {text!r} (count)', lambda: qs.filter(
+                description__icontains=text.split()[0]
+            ).count(), repeat=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Refreshing a client after a few edits: reloading the transaction list vs. the delta-sync feed.
+
+The company is seeded with --rows approved transactions (each with its
+SyncChange entry, as the migration backfills them). Then --changes of them are
+edited through the API, and the client either reloads /api/transactions/ as
+the frontend does today or asks /api/sync/ for what changed since its cursor.
+
+    python benchmarks/sync_feed.py --rows 20000 --changes 10
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from _common import benchmark_database, create_company, timeit
+
+
+def seed(connection, company, user, rows):
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    sql = (
+        'INSERT INTO ledger_transaction (company_id, transaction_type, amount, description, date, account, '
+        'is_project_related, created_by_id, created_at, status, approvals_required, approvals_received, currency) '
+        "VALUES (%s, %s, %s, 'seeded', %s, 'COMPANY', 0, %s, '2025-01-01 00:00:00', 'APPROVED', 0, 0, 'INR')"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (company.id, rng.choice(('INCOME', 'EXPENSE')), f'{rng.randint(100, 10000000) / 100:.2f}',
+             (start + timedelta(days=rng.randint(0, 1999))).isoformat(), user.id)
+            for _ in range(rows)
+        ])
+        cursor.execute(
+            'INSERT INTO ledger_syncchange (company_id, model, object_id, deleted) '
+            "SELECT company_id, 'transaction', id, 0 FROM ledger_transaction WHERE company_id = %s ORDER BY id",
+            [company.id],
+        )
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--changes', type=int, default=10)
+    args = parser.parse_args()
+
+    with benchmark_database() as connection:
+        from django.test.utils import setup_test_environment
+        from rest_framework.test import APIClient
+        from ledger.models import Transaction
+
+        setup_test_environment()
+        company, owner, _ = create_company(directors=1)
+        seed(connection, company, owner, args.rows)
+        client = APIClient()
+        client.force_authenticate(owner)
+        cursor = client.get(f'/api/sync/?company={company.id}&since=0&limit=1').data['cursor']
+        # Catch up with the seeded rows, as a client that has the full list would have
+        while True:
+            page = client.get(f'/api/sync/?company={company.id}&since={cursor}').data
+            cursor = page['cursor']
+            if not page['more']:
+                break
+        ids = list(Transaction.objects.filter(company=company).values_list('id', flat=True)[:args.changes])
+        for pk in ids:
+            client.patch(f'/api/transactions/{pk}/', {'description': 'edited'}, format='json')
+        print(f'{args.rows} transactions, {args.changes} edited since the client last synced')
+
+        sizes = {}
+
+        def fetch(label, url):
+            def run():
+                response = client.get(url)
+                sizes[label] = len(response.content)
+                return response
+            return run
+
+        timeit('GET /api/transactions/ (full reload)', fetch('list', f'/api/transactions/?company={company.id}'), repeat=3)
+        delta = timeit('GET /api/sync/?since=<cursor>', fetch('sync', f'/api/sync/?company={company.id}&since={cursor}'))
+        assert len(delta.data['changed']['transactions']) == args.changes
+        print(f'payload: full list {sizes["list"] / 1024:.1f} KiB, sync {sizes["sync"] / 1024:.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Approvals in one company while another company imports.
+
+One thread keeps posting atomic /api/batch/ imports of --batch transactions
+into company A, pausing --pause seconds between them like a client would.
+Meanwhile a director of company B approves B's transactions one by one and
+reads B's /api/summary/. Both companies share the database file and its one
+write lock, so every approval has to wait for the import transaction in
+progress. Prints the latencies with SQLite's own busy handler (the stock
+backend's BEGIN) and with ledger.backends.sqlite3's queued BEGIN, each on a
+fresh database file.
+
+    python benchmarks/tenant_contention.py --items 100 --batch 20 --pause 0.02
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from _common import benchmark_database, create_company
+
+
+def importer(owner, company, batch, pause, stop, counts):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(owner)
+    body = {'transaction_type': 'EXPENSE', 'amount': '12.50', 'date': '2025-01-01', 'account': 'COMPANY',
+            'description': 'Imported', 'company': company.id}
+    try:
+        while not stop.is_set():
+            response = client.post('/api/batch/', {
+                'atomic': True, 'requests': [{'method': 'POST', 'path': '/api/transactions/', 'body': body}] * batch,
+            }, format='json')
+            assert response.status_code == 200, response.data
+            counts['imported'] += batch
+            stop.wait(pause)
+    finally:
+        connection.close()
+
+
+def percentiles(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f'  {label:<26} median {statistics.median(timings) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms   '
+          f'max {timings[-1] * 1000:8.2f} ms')
+
+
+def run(label, journal_mode, items, batch, pause):
+    with benchmark_database(on_disk=True) as connection:
+        from django.test.utils import setup_test_environment, teardown_test_environment
+        from rest_framework.test import APIClient
+        from ledger import approvals
+        from ledger.models import Transaction
+
+        setup_test_environment()
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        importing, importing_owner, _ = create_company('Importer', directors=1)
+        company, owner, (director,) = create_company('Approver', directors=1)
+        pending = [
+            Transaction.objects.create(
+                company=company, transaction_type='INCOME', amount=Decimal('10'), date=date(2025, 1, 1),
+                account='COMPANY', created_by=owner, approvals_required=approvals.required_approvals(company, Transaction),
+            ) for _ in range(items)
+        ]
+        for item in pending:
+            approvals.open_approvals(item)
+        connection.close()
+
+        client = APIClient()
+        client.force_authenticate(director)
+        stop, counts = threading.Event(), {'imported': 0}
+        thread = threading.Thread(target=importer, args=(importing_owner, importing, batch, pause, stop, counts))
+        thread.start()
+        approve, read, failed = [], [], 0
+        started = time.perf_counter()
+        try:
+            for item in pending:
+                began = time.perf_counter()
+                response = client.post(f'/api/transactions/{item.id}/approve/')
+                approve.append(time.perf_counter() - began)
+                failed += response.status_code != 200
+                began = time.perf_counter()
+                client.get(f'/api/summary/?company={company.id}')
+                read.append(time.perf_counter() - began)
+        finally:
+            stop.set()
+            thread.join()
+        elapsed = time.perf_counter() - started
+        print(f'{label}: {items} approvals in {elapsed:.1f} s, {counts["imported"]} rows imported meanwhile, '
+              f'{failed} approvals failed')
+        percentiles('approve (company B)', approve)
+        percentiles('summary (company B)', read)
+        teardown_test_environment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100, help='Transactions company B approves')
+    parser.add_argument('--batch', type=int, default=20, help='Transactions per import batch of company A')
+    parser.add_argument('--pause', type=float, default=0.02, help='Seconds between import batches')
+    parser.add_argument('--journal-mode', default='delete', choices=('delete', 'wal'))
+    args = parser.parse_args()
+
+    from django.db.backends.sqlite3.base import DatabaseWrapper as StockWrapper
+    from ledger.backends.sqlite3.base import DatabaseWrapper
+
+    queued = DatabaseWrapper._start_transaction_under_autocommit
+    DatabaseWrapper._start_transaction_under_autocommit = StockWrapper._start_transaction_under_autocommit
+    try:
+        run('SQLite busy handler', args.journal_mode, args.items, args.batch, args.pause)
+    finally:
+        DatabaseWrapper._start_transaction_under_autocommit = queued
+    run('queued BEGIN', args.journal_mode, args.items, args.batch, args.pause)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Cost of the request throttles per request, with in-process and SQLite buckets.
+
+Runs DRF's check_throttles() for an authenticated POST (the default user and
+company write throttles) and a GET of a heavy read (its user and company
+throttles) over --users users, each a director of one of --companies
+companies and naming it, with rates high enough that nothing is rejected, and
+prints the time per request. The company throttles' membership check is
+included.
+
+    python benchmarks/throttle_overhead.py --requests 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from _common import benchmark_database
+
+RATES = {scope: '1000000000/s' for scope in ('write', 'company_write', 'heavy_read', 'company_heavy_read', 'auth')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--companies', type=int, default=100)
+    args = parser.parse_args()
+
+    with benchmark_database(throttled=True):
+        from django.test.utils import override_settings
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from rest_framework.views import APIView
+        from ledger import throttling
+        from ledger.models import Company, Director, User
+
+        users = User.objects.bulk_create([User(username=f'user-{index}') for index in range(args.users)])
+        companies = [Company.objects.create(name=f'Company {index}', created_by=users[0]) for index in range(args.companies)]
+        Director.objects.bulk_create([
+            Director(user=user, company=companies[index % len(companies)]) for index, user in enumerate(users)
+        ])
+        factory = APIRequestFactory()
+
+        def requests(method, throttle_classes):
+            view = APIView()
+            view.throttle_classes = throttle_classes
+            built = []
+            for index in range(args.requests):
+                user_index = index % len(users)
+                path = f'/api/summary/?company={companies[user_index % len(companies)].pk}'
+                django_request = getattr(factory, method)(path, {'amount': '1'} if method == 'post' else None, format='json')
+                force_authenticate(django_request, users[user_index])
+                request = Request(django_request, parsers=view.get_parsers(), authenticators=view.get_authenticators())
+                request.user  # authenticate up front, it is not part of throttling
+                if method == 'post':
+                    request.data
+                built.append(request)
+            return view, built
+
+        cases = (
+            ('POST, write throttles', 'post', [throttling.UserWriteThrottle, throttling.CompanyWriteThrottle]),
+            ('GET, heavy read throttles', 'get', throttling.HEAVY_READ_THROTTLES),
+        )
+        prepared = [(label, *requests(method, classes)) for label, method, classes in cases]
+        empty = APIView()
+        empty.throttle_classes = []
+        path = os.path.join(tempfile.mkdtemp(), 'throttle.sqlite3')
+        for store, store_path in (('memory', None), ('sqlite', path)):
+            with override_settings(LEDGER_THROTTLE_RATES=RATES, LEDGER_THROTTLE_DB_PATH=store_path):
+                for label, view, built in prepared:
+                    started = time.perf_counter()
+                    for request in built:
+                        empty.check_throttles(request)
+                    baseline = time.perf_counter() - started
+                    started = time.perf_counter()
+                    for request in built:
+                        view.check_throttles(request)
+                    elapsed = time.perf_counter() - started - baseline
+                    print(f'{store:<8} {label:<28} {elapsed / len(built) * 1e6:8.2f} us per request')
+
+
+if __name__ == '__main__':
+    main()
@@ -29,12 +29,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ledger.middleware.MetricsMiddleware',
+    'ledger.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ledger.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,8 +64,14 @@ WSGI_APPLICATION = 'expense_backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'ledger.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts. SQLite ignores SELECT ... FOR UPDATE,
+            # so this is what serializes concurrent approvals (see ledger/approvals.py)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -112,7 +121,8 @@ CSRF_TRUSTED_ORIGINS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # Stock JSONRenderer output, encoded with orjson when it is installed
+        'ledger.renderers.FastJSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -120,9 +130,54 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'ledger.throttling.UserWriteThrottle',
+        'ledger.throttling.CompanyWriteThrottle',
+    ],
     'EXCEPTION_HANDLER': 'expense_backend.exception_handler.custom_exception_handler',
 }
 
+# Token bucket per user (or client IP) and per company, see ledger/throttling.py. A scope set to
+# None is not throttled. Summaries and approval counts are heavy reads; auth is login and registration.
+LEDGER_THROTTLE_RATES = {
+    'write': '300/min',
+    'company_write': '600/min',
+    'heavy_read': '60/min',
+    'company_heavy_read': '120/min',
+    'auth': '10/min',
+}
+# Buckets are per process; point this at a SQLite file to share them between workers
+LEDGER_THROTTLE_DB_PATH = os.getenv('LEDGER_THROTTLE_DB_PATH') or None
+
+# JSON and text responses at least this large are sent gzip- or Brotli-compressed when the client accepts it
+LEDGER_COMPRESS_MIN_BYTES = int(os.getenv('LEDGER_COMPRESS_MIN_BYTES', 1024))
+
+# Bearer token Prometheus uses to scrape /metrics. Admin JWTs are accepted as well.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Run queued background tasks right after the request commits instead of in `run_workers`
+LEDGER_TASKS_EAGER = os.getenv('LEDGER_TASKS_EAGER', '0') == '1'
+
+# Receipt and invoice files (see ledger/attachments.py); keep this directory out of the web root and back it up
+LEDGER_ATTACHMENTS_ROOT = Path(os.getenv('LEDGER_ATTACHMENTS_ROOT', BASE_DIR / 'attachments'))
+LEDGER_ATTACHMENT_MAX_BYTES = int(os.getenv('LEDGER_ATTACHMENT_MAX_BYTES', 20 * 1024 * 1024))
+LEDGER_THUMBNAIL_THREADS = 2
+
+# Soft-deleted companies can be restored for this long before their rows are purged
+LEDGER_COMPANY_PURGE_DELAY_DAYS = int(os.getenv('LEDGER_COMPANY_PURGE_DELAY_DAYS', 7))
+
+# Archived companies' rows go to ArchivedRow in this database; set LEDGER_ARCHIVE_DB_PATH to keep
+# them in a separate SQLite file (then run `manage.py migrate --database archive` once)
+LEDGER_ARCHIVE_DATABASE = 'default'
+if os.getenv('LEDGER_ARCHIVE_DB_PATH'):
+    DATABASES['archive'] = {
+        'ENGINE': 'ledger.backends.sqlite3',
+        'NAME': os.getenv('LEDGER_ARCHIVE_DB_PATH'),
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+    }
+    LEDGER_ARCHIVE_DATABASE = 'archive'
+DATABASE_ROUTERS = ['ledger.routers.ArchiveRouter']
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
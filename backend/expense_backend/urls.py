@@ -1,10 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from ledger.views import prometheus_metrics
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('ledger.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
 
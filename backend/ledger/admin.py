@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     User, Company, Director, Project, ProjectApproval,
-    Transaction, TransactionApproval, Salary
+    Transaction, TransactionApproval, Salary, SalaryApproval, RecurringEntry, FxRate, Attachment, AuditEntry
 )
 
 
@@ -17,13 +17,14 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
-    list_display = ('name', 'created_by', 'created_at', 'partner1_name', 'partner2_name')
+    list_display = ('name', 'created_by', 'created_at', 'partner1_name', 'partner2_name', 'deleted_at', 'archived_at')
     list_filter = ('created_at',)
     search_fields = ('name',)
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'deleted_at', 'archived_at')
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        # Deleted and archived companies too
+        qs = Company.all_objects.all()
         return qs.select_related('created_by')
 
 
@@ -67,3 +68,49 @@ class SalaryAdmin(admin.ModelAdmin):
     list_display = ('director', 'amount', 'account', 'date', 'status', 'created_at')
     list_filter = ('status', 'account', 'date', 'company')
     search_fields = ('director__user__username', 'description')
+
+
+@admin.register(SalaryApproval)
+class SalaryApprovalAdmin(admin.ModelAdmin):
+    list_display = ('salary', 'approver', 'approved', 'approved_at')
+    list_filter = ('approved', 'approved_at')
+    search_fields = ('salary__director__user__username', 'approver__username')
+
+
+@admin.register(RecurringEntry)
+class RecurringEntryAdmin(admin.ModelAdmin):
+    list_display = ('company', 'kind', 'amount', 'frequency', 'interval', 'next_date', 'active')
+    list_filter = ('kind', 'frequency', 'active', 'company')
+    search_fields = ('description', 'company__name')
+
+
+@admin.register(FxRate)
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'base_currency', 'date', 'rate')
+    list_filter = ('currency', 'base_currency')
+    date_hierarchy = 'date'
+
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'company', 'transaction', 'salary', 'size', 'uploaded_by', 'uploaded_at')
+    list_filter = ('company', 'content_type')
+    search_fields = ('filename', 'blob__sha256')
+    raw_id_fields = ('transaction', 'salary', 'blob')
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'action', 'object_type', 'object_id', 'company', 'actor', 'path')
+    list_filter = ('action', 'object_type')
+    search_fields = ('object_id', 'actor__username')
+
+    # Append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
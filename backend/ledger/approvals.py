@@ -0,0 +1,202 @@
+"""Approval state machine for projects, transactions and salaries.
+
+PENDING moves to APPROVED once approvals_received reaches approvals_required
+(fixed when the item is created), and PENDING or APPROVED moves to REJECTED.
+Every transition runs in one database transaction with the item's row locked
+(select_for_update; on SQLite the IMMEDIATE transaction mode serializes writers
+instead), so concurrent approvals are counted exactly once each and only the
+approval that completes the count changes the status and queues derived work.
+"""
+from django.db import transaction
+from django.db.models import CharField, Exists, F, OuterRef, Q, Value
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, PermissionDenied
+
+from .bookkeeping import record_change, snapshot
+from .models import (
+    Company, Director, Project, ProjectApproval, Salary, SalaryApproval, Transaction, TransactionApproval,
+)
+from .periods import ensure_period_open
+from .tasks import enqueue, enqueue_approval_latency
+
+
+class InvalidTransition(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This item can no longer change to that status.'
+    default_code = 'invalid_transition'
+
+
+# model -> (approval model, its foreign key to the item, latency object type)
+APPROVAL_MODELS = {
+    Project: (ProjectApproval, 'project', 'PROJECT'),
+    Transaction: (TransactionApproval, 'transaction', 'TRANSACTION'),
+    Salary: (SalaryApproval, 'salary', 'SALARY'),
+}
+
+
+def required_approvals(company, model):
+    """Approvals a new item of `model` needs: none with a single director,
+    otherwise every director, except salaries where the paid director doesn't vote"""
+    directors = Director.objects.filter(company=company).count()
+    if directors <= 1:
+        return 0
+    return directors - 1 if model is Salary else directors
+
+
+def open_approvals(item):
+    """Create the pending approval rows of a new multi-director item in one query"""
+    if not item.approvals_required:
+        return
+    approval_model, field, _ = APPROVAL_MODELS[type(item)]
+    directors = Director.objects.filter(company_id=item.company_id)
+    if isinstance(item, Salary):
+        directors = directors.exclude(pk=item.director_id)
+    approval_model.objects.bulk_create(
+        [approval_model(**{field: item, 'approver_id': user_id}) for user_id in directors.values_list('user_id', flat=True)],
+        ignore_conflicts=True,
+    )
+
+
+def _lock(obj):
+    locked = type(obj).objects.select_for_update().get(pk=obj.pk)
+    # Dated rows can't change inside a closed period
+    if hasattr(locked, 'date'):
+        ensure_period_open(obj.company, locked.date)
+    return locked
+
+
+def _record_vote(item, user, notes):
+    """Store the user's approval. Returns False if they had already approved."""
+    if isinstance(item, Salary) and item.director.user_id == user.id:
+        raise PermissionDenied('Directors cannot approve their own salary.')
+    approval_model, field, object_type = APPROVAL_MODELS[type(item)]
+    approval, _ = approval_model.objects.get_or_create(**{field: item, 'approver': user})
+    if approval.approved:
+        return False
+    approval.approved = True
+    approval.approved_at = timezone.now()
+    approval.notes = notes
+    approval.save()
+    enqueue_approval_latency(item, user, object_type, approval.approved_at)
+    return True
+
+
+def approve(obj, user, notes=''):
+    """Record the user's approval and approve the item once enough have come in.
+
+    Idempotent: approving twice, or approving an approved item, changes nothing.
+    """
+    with transaction.atomic():
+        item = _lock(obj)
+        if item.status == 'APPROVED':
+            return item
+        if item.status != 'PENDING':
+            raise InvalidTransition(f'Cannot approve a {item.status.lower()} item.')
+        before = snapshot(item)
+        if _record_vote(item, user, notes):
+            type(item).objects.filter(pk=item.pk).update(approvals_received=F('approvals_received') + 1)
+            item.refresh_from_db(fields=['approvals_received'])
+        if item.approvals_received >= item.approvals_required:
+            item.status = 'APPROVED'
+            item.save()
+            record_change(before, snapshot(item))
+            if isinstance(item, Transaction) and item.transaction_type == 'INCOME':
+                # Queued in the same transaction, so it exists exactly when the approval does
+                enqueue('check_milestones', item.company_id, {'transaction_id': item.id})
+        return item
+
+
+def reject(obj, user):
+    """Reject a pending or approved item. Rejecting twice changes nothing."""
+    with transaction.atomic():
+        item = _lock(obj)
+        if item.status == 'REJECTED':
+            return item
+        before = snapshot(item)
+        item.status = 'REJECTED'
+        item.save()
+        record_change(before, snapshot(item))
+        return item
+
+
+def approve_many(queryset, ids, user, notes=''):
+    """Approve several items of one type; each is its own locked transition.
+
+    Returns (approved items, {id: error}) so one locked period or rejected item
+    doesn't fail the rest.
+    """
+    items = {item.pk: item for item in queryset.filter(pk__in=ids).select_related('company')}
+    approved, errors = [], {}
+    for pk in ids:
+        item = items.get(pk)
+        if item is None:
+            errors[pk] = 'Not found'
+        elif user not in item.company.get_all_members():
+            errors[pk] = 'Not authorized'
+        else:
+            try:
+                approved.append(approve(item, user, notes))
+            except APIException as e:
+                errors[pk] = str(e.detail)
+    return approved, errors
+
+
+def awaiting(model, user, companies=None):
+    """Pending items of `model` that `user` can approve and hasn't yet, as one query.
+    `companies` (ids) saves the membership lookup when the caller already has it."""
+    approval_model, field, _ = APPROVAL_MODELS[model]
+    # Deleted and archived companies' items can't be approved, for admins either
+    qs = model.objects.filter(status='PENDING', company__deleted_at__isnull=True, company__archived_at__isnull=True)
+    if user.role != 'ADMIN':
+        if companies is None:
+            companies = Company.objects.filter(Q(created_by=user) | Q(directors__user=user))
+        voted = approval_model.objects.filter(**{field: OuterRef('pk')}, approver=user, approved=True)
+        qs = qs.filter(company__in=companies).exclude(Exists(voted))
+        if model is Salary:
+            qs = qs.exclude(director__user=user)
+    return qs
+
+
+# model -> (inbox kind, expressions for the columns the three types don't share)
+INBOX_COLUMNS = {
+    Project: ('project', {'title': F('name'), 'amount_': F('project_value'), 'date_': F('start_date')}),
+    Transaction: ('transaction', {'title': F('description'), 'amount_': F('amount'), 'date_': F('date')}),
+    Salary: ('salary', {'title': F('director__user__username'), 'amount_': F('amount'), 'date_': F('date')}),
+}
+INBOX_FIELDS = (
+    'kind', 'id', 'company_id', 'company_name', 'title', 'amount_', 'currency', 'date_', 'created_at',
+    'created_by_name', 'approvals_required', 'approvals_received',
+)
+
+
+def _after(qs, kind, cursor):
+    """Rows of one inbox kind that come after `cursor` in (-created_at, -kind, -id) order"""
+    created_at, cursor_kind, cursor_id = cursor
+    if kind < cursor_kind:
+        return qs.filter(created_at__lte=created_at)
+    if kind > cursor_kind:
+        return qs.filter(created_at__lt=created_at)
+    return qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=cursor_id))
+
+
+def inbox(user, limit, cursor=None, companies=None):
+    """Up to `limit` items awaiting the user's approval across all three types, newest first.
+
+    One UNION ALL of the awaiting() queries, each an anti-join on the approval
+    table's (item, approver) unique index; `cursor` is the (created_at, kind, id)
+    of the last row of the previous page.
+    """
+    parts = []
+    for model, (kind, columns) in INBOX_COLUMNS.items():
+        qs = awaiting(model, user, companies)
+        if cursor is not None:
+            qs = _after(qs, kind, cursor)
+        parts.append(qs.annotate(
+            kind=Value(kind, output_field=CharField()),
+            company_name=F('company__name'),
+            created_by_name=F('created_by__username'),
+            **columns,
+        ).order_by().values(*INBOX_FIELDS))
+    first, *rest = parts
+    return list(first.union(*rest, all=True).order_by('-created_at', '-kind', '-id')[:limit])
@@ -1,10 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class LedgerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ledger'
 
-
-
-
+    def ready(self):
+        from . import audit, fx, search, sync
+        audit.connect()
+        sync.connect()
+        fx.connect()
+        post_migrate.connect(search.restore_triggers, sender=self)
@@ -0,0 +1,156 @@
+"""Chunked purge, archive and restore of a whole company's ledger.
+
+A company's rows are handled model by model, children before parents, a few
+hundred rows per database transaction. The write lock is released between
+chunks, so a large company never blocks other requests for long (deleting
+a Company row directly cascades through everything in one transaction).
+
+Archiving serializes every row into ArchivedRow, in LEDGER_ARCHIVE_DATABASE,
+before deleting it from the ledger tables; restoring does the reverse,
+parents first. A row is inserted on one side before it is deleted from the
+other, and inserts skip rows that are already there, so both commands can be
+re-run after an interruption. Directors stay in place so their users keep
+their director profile.
+"""
+import logging
+
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, sync
+from .metrics import invalidate_company_caches
+from .models import (
+    ApprovalLatencyBucket, ArchivedRow, Attachment, BalanceSnapshot, ClosedPeriod, Company, CompanyCounters, Director,
+    Milestone, OutboxTask, Project, ProjectApproval, RecurringEntry, Salary, SalaryApproval, SyncChange, Transaction,
+    TransactionApproval,
+)
+
+
+logger = logging.getLogger('ledger')
+
+# (model, lookup to the company), parents before children
+COMPANY_ROWS = [
+    (Project, 'company'),
+    (RecurringEntry, 'company'),
+    (Transaction, 'company'),
+    (Salary, 'company'),
+    (ProjectApproval, 'project__company'),
+    (TransactionApproval, 'transaction__company'),
+    (SalaryApproval, 'salary__company'),
+    (Attachment, 'company'),
+    (Milestone, 'company'),
+    (ClosedPeriod, 'company'),
+    (BalanceSnapshot, 'company'),
+    (CompanyCounters, 'company'),
+    (ApprovalLatencyBucket, 'company'),
+]
+
+CHUNK_SIZE = 500
+
+
+def _archive_db():
+    return settings.LEDGER_ARCHIVE_DATABASE
+
+
+def _chunks(model, lookup, company_id, chunk_size):
+    """Successive lists of the company's rows of `model`; the caller removes each chunk before the next"""
+    while True:
+        chunk = list(model.objects.filter(**{lookup: company_id}).order_by('pk')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+
+
+def _delete(model, rows):
+    with transaction.atomic():
+        model.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+
+def _delete_sync_changes(company_id, chunk_size):
+    while True:
+        ids = list(SyncChange.objects.filter(company_id=company_id).values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            SyncChange.objects.filter(pk__in=ids).delete()
+
+
+def purge_company(company_id, chunk_size=CHUNK_SIZE):
+    """Delete a soft-deleted company and all its rows, chunk by chunk. No-op if it was restored."""
+    company = Company.all_objects.filter(pk=company_id, deleted_at__isnull=False).first()
+    if company is None:
+        return 0
+    deleted = 0
+    with sync.paused():
+        for model, lookup in reversed(COMPANY_ROWS):
+            for chunk in _chunks(model, lookup, company_id, chunk_size):
+                _delete(model, chunk)
+                deleted += len(chunk)
+        _delete_sync_changes(company_id, chunk_size)
+        # What is left is small: directors, queued tasks and the company itself
+        company.delete()
+    logger.info(f'Purged company {company_id}: {deleted} rows')
+    return deleted
+
+
+def archive_company(company, chunk_size=CHUNK_SIZE):
+    """Move the company's rows to ArchivedRow. Returns {model name: rows archived}."""
+    now = timezone.now()
+    # Hidden from the API from here on, so nothing new is written while rows move
+    Company.all_objects.filter(pk=company.pk).update(archived_at=now)
+    audit.record('UPDATE', company, {'archived_at': [company.archived_at, now]})
+    company.archived_at = now
+    OutboxTask.objects.filter(company=company, status='PENDING').delete()
+    counts = {}
+    with sync.paused():
+        for model, lookup in reversed(COMPANY_ROWS):
+            label = model._meta.label_lower
+            counts[model.__name__] = 0
+            for chunk in _chunks(model, lookup, company.pk, chunk_size):
+                ArchivedRow.objects.using(_archive_db()).bulk_create([
+                    ArchivedRow(company_id=company.pk, model=label, object_id=str(data['pk']), data=data)
+                    for data in serializers.serialize('python', chunk)
+                ], ignore_conflicts=True)
+                _delete(model, chunk)
+                counts[model.__name__] += len(chunk)
+        # Restoring gives every row a new change sequence instead
+        _delete_sync_changes(company.pk, chunk_size)
+    invalidate_company_caches(company.pk)
+    return counts
+
+
+def restore_company(company, chunk_size=CHUNK_SIZE):
+    """Move an archived company's rows back into the ledger tables. Returns {model name: rows restored}."""
+    archived = ArchivedRow.objects.using(_archive_db()).filter(company_id=company.pk)
+    counts = {}
+    for model, _ in COMPANY_ROWS:
+        label = model._meta.label_lower
+        counts[model.__name__] = 0
+        while True:
+            rows = list(archived.filter(model=label).order_by('id')[:chunk_size])
+            if not rows:
+                break
+            objects = [item.object for item in serializers.deserialize('python', [row.data for row in rows])]
+            with transaction.atomic():
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+                if model in sync.SYNCED:
+                    sync.touch(model, [(company.pk, obj.pk) for obj in objects])
+            ArchivedRow.objects.using(_archive_db()).filter(pk__in=[row.pk for row in rows]).delete()
+            counts[model.__name__] += len(rows)
+    Company.all_objects.filter(pk=company.pk).update(archived_at=None)
+    audit.record('UPDATE', company, {'archived_at': [company.archived_at, None]})
+    sync.touch(Company, [(company.pk, company.pk)])
+    sync.touch(Director, company.directors.values_list('company_id', 'id'))
+    company.archived_at = None
+    invalidate_company_caches(company.pk)
+    return counts
+
+
+def archived_blobs():
+    """Blobs referenced by archived attachments, which purge_blobs must keep"""
+    return set(
+        ArchivedRow.objects.using(_archive_db()).filter(model='ledger.attachment')
+        .values_list('data__fields__blob', flat=True)
+    )
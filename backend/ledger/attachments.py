@@ -0,0 +1,270 @@
+"""Content-addressed storage for receipt and invoice attachments.
+
+Uploads are copied chunk by chunk into a temporary file while their SHA-256 is
+computed, then moved to blobs/<first two hex digits>/<sha256> under
+LEDGER_ATTACHMENTS_ROOT. Identical files are stored once and shared by every
+Attachment row pointing at the Blob. Orphaned blobs are removed by the
+purge_blobs outbox task, except those of archived companies. It and store()
+lock the Blob row, so a blob being re-uploaded while it is purged is either
+kept or written back.
+
+Thumbnails are made on first request, on a small thread pool, and only when
+Pillow is installed.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import FileResponse, HttpResponse
+from django.template.defaultfilters import filesizeformat
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .archive import archived_blobs
+from .models import Attachment, Blob, Salary, Transaction
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are optional
+    Image = None
+
+
+logger = logging.getLogger('ledger')
+
+# model -> the Attachment foreign key pointing at it
+ATTACHABLE = {
+    Transaction: 'transaction',
+    Salary: 'salary',
+}
+
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+
+class AttachmentTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Attachment is too large.'
+    default_code = 'attachment_too_large'
+
+
+def _root():
+    return Path(settings.LEDGER_ATTACHMENTS_ROOT)
+
+
+def blob_path(sha256):
+    return _root() / 'blobs' / sha256[:2] / sha256
+
+
+def thumbnail_path(sha256):
+    return _root() / 'thumbnails' / sha256[:2] / f'{sha256}.jpg'
+
+
+def _write_temp(uploaded_file):
+    """Copy the upload to a temporary file next to the blobs. Returns (path, sha256, size)."""
+    tmp_dir = _root() / 'tmp'
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    limit = settings.LEDGER_ATTACHMENT_MAX_BYTES
+    digest, size = hashlib.sha256(), 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in uploaded_file.chunks():
+                size += len(chunk)
+                if size > limit:
+                    raise AttachmentTooLarge(f'Attachments are limited to {filesizeformat(limit)}.')
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def store(uploaded_file, parent, user):
+    """Save an uploaded file as an attachment of a transaction or salary"""
+    tmp_path, sha256, size = _write_temp(uploaded_file)
+    try:
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is None:
+                blob = Blob.objects.create(sha256=sha256, size=size)
+            target = blob_path(sha256)
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, target)
+            return Attachment.objects.create(**{
+                ATTACHABLE[type(parent)]: parent,
+                'company_id': parent.company_id,
+                'blob': blob,
+                'filename': os.path.basename(uploaded_file.name or '')[:255] or 'attachment',
+                'content_type': (uploaded_file.content_type or 'application/octet-stream')[:100],
+                'size': size,
+                'uploaded_by': user,
+            })
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def purge_blobs():
+    """Delete blobs no attachment references any more, with their files. Returns how many."""
+    referenced = Attachment.objects.filter(blob=OuterRef('pk'))
+    # Archived companies' attachments come back on restore
+    archived = archived_blobs()
+    purged = 0
+    for sha256 in Blob.objects.filter(~Exists(referenced)).values_list('sha256', flat=True).iterator():
+        if sha256 in archived:
+            continue
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(sha256=sha256).first()
+            # Re-checked under the lock: an upload may have claimed it since the scan
+            if blob is None or Attachment.objects.filter(blob=blob).exists():
+                continue
+            blob.delete()
+            for path in (blob_path(sha256), thumbnail_path(sha256)):
+                path.unlink(missing_ok=True)
+            purged += 1
+    return purged
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single-range header, None to send the whole
+    file, or False if the range can't be satisfied"""
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Malformed and multi-range requests get the whole file
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+class _FileRange:
+    """Read at most `length` bytes of an open file"""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+def serve(request, attachment, path=None, content_type=None, as_attachment=True):
+    """FileResponse for an attachment's bytes, honouring Range and If-None-Match"""
+    path = path or blob_path(attachment.blob_id)
+    etag = f'"{attachment.blob_id}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        logger.error(f'Attachment {attachment.id} is missing its file {path}')
+        return None
+    size = os.fstat(f.fileno()).st_size
+    byte_range = None
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        f.close()
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    options = {
+        'content_type': content_type or attachment.content_type,
+        'as_attachment': as_attachment,
+        'filename': attachment.filename,
+    }
+    if byte_range:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(_FileRange(f, end - start + 1), status=status.HTTP_206_PARTIAL_CONTENT, **options)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(f, **options)
+    response['Accept-Ranges'] = 'bytes'
+    # Blob contents never change, but access depends on the user
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+_thumbnail_pool = None
+_thumbnail_futures = {}
+_thumbnail_lock = threading.Lock()
+
+
+def _make_thumbnail(sha256):
+    target = thumbnail_path(sha256)
+    if target.exists():
+        return target
+    try:
+        with Image.open(blob_path(sha256)) as image:
+            image.draft('RGB', THUMBNAIL_SIZE)
+            image.thumbnail(THUMBNAIL_SIZE)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=target.parent)
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    image.convert('RGB').save(out, 'JPEG', quality=80)
+                os.replace(tmp_path, target)
+            finally:
+                # Left behind when the image fails to decode or encode
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+    except Exception as e:
+        logger.warning(f'No thumbnail for blob {sha256}: {e}')
+        return None
+    return target
+
+
+def thumbnail(attachment, timeout=10):
+    """Path of the attachment's thumbnail, rendering it first if needed, or None if it can't have one"""
+    if Image is None or attachment.content_type not in THUMBNAIL_TYPES:
+        return None
+    target = thumbnail_path(attachment.blob_id)
+    if target.exists():
+        return target
+    global _thumbnail_pool
+    with _thumbnail_lock:
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ThreadPoolExecutor(
+                max_workers=settings.LEDGER_THUMBNAIL_THREADS, thread_name_prefix='ledger-thumbnail',
+            )
+        # Concurrent requests for the same image wait on one render
+        future = _thumbnail_futures.get(attachment.blob_id)
+        if future is None:
+            future = _thumbnail_futures[attachment.blob_id] = _thumbnail_pool.submit(_make_thumbnail, attachment.blob_id)
+            future.add_done_callback(lambda _, sha256=attachment.blob_id: _thumbnail_futures.pop(sha256, None))
+    return future.result(timeout=timeout)
@@ -0,0 +1,155 @@
+"""Append-only audit trail of changes to ledger models.
+
+Every save and delete of an AUDITED model becomes an AuditEntry holding the
+changed fields' before and after values. The values each instance was loaded
+with are remembered on it (post_init), so a diff costs no extra query. Inside
+a request the entries are buffered and AuditMiddleware writes them with one
+bulk_create once the response is ready. Entries are only buffered when their
+database transaction commits, so rolled-back changes leave no trace. Outside
+requests (commands, workers) each entry is written as its change commits.
+
+Only changes made through Model.save()/delete() fire the signals this relies
+on. QuerySet.update() and bulk_create() are used for counters, rollups and
+rows generated by materialize_recurring, and those are not audited. Period
+close/reopen call record() directly.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import reduce
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import (
+    Attachment, AuditEntry, Company, Director, Milestone, Project, ProjectApproval, RecurringEntry, Salary,
+    SalaryApproval, Transaction, TransactionApproval, User,
+)
+
+
+logger = logging.getLogger('ledger')
+
+# model -> attribute path to the company an entry is filed under
+AUDITED = {
+    User: None,
+    Company: 'id',
+    Director: 'company_id',
+    Project: 'company_id',
+    ProjectApproval: 'project.company_id',
+    Transaction: 'company_id',
+    TransactionApproval: 'transaction.company_id',
+    Salary: 'company_id',
+    SalaryApproval: 'salary.company_id',
+    Milestone: 'company_id',
+    RecurringEntry: 'company_id',
+    Attachment: 'company_id',
+}
+
+# Secrets and bookkeeping-maintained values; COUNTER_FIELDS are skipped too
+IGNORED_FIELDS = {'password', 'last_login', 'updated_at', 'version'}
+
+_MISSING = object()
+
+_buffer = ContextVar('audit_buffer', default=None)
+
+
+def _tracked_fields(model):
+    ignored = IGNORED_FIELDS | set(getattr(model, 'COUNTER_FIELDS', ()))
+    return [f.attname for f in model._meta.concrete_fields if f.name not in ignored]
+
+
+_TRACKED = {model: _tracked_fields(model) for model in AUDITED}
+
+
+def _state(instance):
+    # __dict__ rather than getattr, so deferred fields aren't loaded just to be remembered
+    return {attname: instance.__dict__.get(attname, _MISSING) for attname in _TRACKED[type(instance)]}
+
+
+def _company_id(instance):
+    path = AUDITED[type(instance)]
+    if path is None:
+        return None
+    return reduce(getattr, path.split('.'), instance)
+
+
+def record(action, instance, changes):
+    """Queue an entry for a change to `instance`; {field: [before, after]}"""
+    now = timezone.now()
+    entry = AuditEntry(
+        company_id=_company_id(instance),
+        action=action,
+        object_type=type(instance).__name__,
+        object_id=str(instance.pk),
+        changes=changes,
+        created_at=now,
+        month=now.date().replace(day=1),
+    )
+    buffer = _buffer.get()
+    if buffer is not None:
+        transaction.on_commit(lambda: buffer.append(entry))
+    else:
+        transaction.on_commit(lambda: AuditEntry.objects.bulk_create([entry]))
+
+
+def _remember(sender, instance, **kwargs):
+    instance._audit_state = _state(instance)
+
+
+def _saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    before = {} if created else getattr(instance, '_audit_state', {})
+    after = _state(instance)
+    changes = {
+        attname: [None if created else before.get(attname), value]
+        for attname, value in after.items()
+        if value is not _MISSING
+        and (update_fields is None or attname in update_fields or attname.removesuffix('_id') in update_fields)
+        and (created or (before.get(attname, _MISSING) is not _MISSING and before[attname] != value))
+    }
+    instance._audit_state = after
+    if changes:
+        record('CREATE' if created else 'UPDATE', instance, changes)
+
+
+def _deleted(sender, instance, origin=None, **kwargs):
+    # Rows removed by a cascade are covered by the entry of the row that was deleted
+    if origin is not None and origin is not instance:
+        return
+    state = getattr(instance, '_audit_state', None) or _state(instance)
+    record('DELETE', instance, {
+        attname: [value, None] for attname, value in state.items() if value is not _MISSING
+    })
+
+
+def connect():
+    for model in AUDITED:
+        post_init.connect(_remember, sender=model, dispatch_uid=f'audit-init-{model.__name__}')
+        post_save.connect(_saved, sender=model, dispatch_uid=f'audit-save-{model.__name__}')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'audit-delete-{model.__name__}')
+
+
+@contextmanager
+def buffered():
+    """Collect the entries of a unit of work (a request) for one flush()"""
+    entries = []
+    token = _buffer.set(entries)
+    try:
+        yield entries
+    finally:
+        _buffer.reset(token)
+
+
+def flush(entries, actor_id=None, path=''):
+    if not entries:
+        return
+    for entry in entries:
+        entry.actor_id = actor_id
+        entry.path = path[:255]
+    try:
+        AuditEntry.objects.bulk_create(entries)
+    except Exception:
+        # The changes themselves are committed; losing their audit rows must not fail the response
+        logger.exception(f'Could not write {len(entries)} audit entries')
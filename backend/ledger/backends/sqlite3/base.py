@@ -0,0 +1,95 @@
+"""SQLite backend that hands the write lock to waiting transactions in order.
+
+With transaction_mode IMMEDIATE every write transaction starts by taking the
+database's single write lock. SQLite's own busy handler retries after 1, 2,
+5, ... and then every 100 ms, and whoever retries at the right moment wins:
+one company running back-to-back imports keeps approvals of every other
+company waiting for seconds.
+
+Here BEGIN waits in a first-come, first-served queue per database file, so
+within a process the transaction that has waited longest is the only one
+trying to take the lock. That one retries BEGIN after LOCK_POLL_INTERVAL,
+doubling up to LOCK_POLL_MAX_INTERVAL, which competes with other processes
+without busy-looping while their transactions run. Waiting, in the queue and
+for the lock, is bounded by the connection's `timeout` and ends in SQLite's
+"database is locked" error. Statements outside BEGIN keep SQLite's busy
+handler.
+"""
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+LOCK_POLL_INTERVAL = 0.001
+LOCK_POLL_MAX_INTERVAL = 0.025
+DEFAULT_TIMEOUT = 5  # seconds, as in sqlite3.connect()
+
+
+class WriterQueue:
+    """First-come, first-served turns at starting a write transaction"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._waiting = deque()
+
+    def wait(self, deadline):
+        """Block until it's the caller's turn, then return the ticket to pass to done()"""
+        ticket = object()
+        with self._condition:
+            self._waiting.append(ticket)
+            while self._waiting[0] is not ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    raise OperationalError('database is locked')
+                self._condition.wait(remaining)
+        return ticket
+
+    def done(self, ticket):
+        with self._condition:
+            self._waiting.remove(ticket)
+            self._condition.notify_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def writer_queue(name):
+    with _queues_lock:
+        if name not in _queues:
+            _queues[name] = WriterQueue()
+        return _queues[name]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        timeout = self.settings_dict['OPTIONS'].get('timeout', DEFAULT_TIMEOUT)
+        deadline = time.monotonic() + timeout
+        queue = writer_queue(str(self.settings_dict['NAME']))
+        ticket = queue.wait(deadline)
+        try:
+            self.connection.execute('PRAGMA busy_timeout = 0')
+            try:
+                self._poll_begin(deadline)
+            finally:
+                self.connection.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+        finally:
+            # The next waiter may start polling while this transaction holds the lock
+            queue.done(ticket)
+
+    def _poll_begin(self, deadline):
+        interval = LOCK_POLL_INTERVAL
+        while True:
+            try:
+                self.cursor().execute(f'BEGIN {self.transaction_mode}')
+                return
+            except OperationalError as e:
+                if 'locked' not in str(e) or time.monotonic() >= deadline:
+                    raise
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 2, LOCK_POLL_MAX_INTERVAL)
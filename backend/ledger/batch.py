@@ -0,0 +1,124 @@
+"""In-process execution of the sub-requests of POST /api/batch/.
+
+Each sub-request becomes a WSGIRequest built from the batch request's
+environ and dispatched to its view through the URL resolver, skipping the
+middleware. It is authenticated as the batch request's user without checking
+the token again, and it runs on the same thread, so on the same database
+connection. Only the client's own headers are passed on: the batch's
+Idempotency-Key, If-None-Match or Range would mean something else for every
+sub-request.
+"""
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+
+logger = logging.getLogger('ledger')
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+PREFIX = '/api/'
+# Batch request headers every sub-request inherits
+INHERITED_HEADERS = ('HTTP_HOST', 'HTTP_USER_AGENT', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_PROTO')
+
+
+class InvalidSubRequest(ValueError):
+    pass
+
+
+def _environ(request, method, path, query, body, headers):
+    environ = {
+        key: value for key, value in request.META.items()
+        if not key.startswith(('HTTP_', 'CONTENT_')) or key in INHERITED_HEADERS
+    }
+    payload = json.dumps(body).encode() if body is not None else b''
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload),
+    })
+    for name, value in headers.items():
+        environ[f'HTTP_{name.upper().replace("-", "_")}'] = str(value)
+    return environ
+
+
+def parse(item):
+    """(method, path, query, body, headers) of one sub-request, or InvalidSubRequest"""
+    if not isinstance(item, dict):
+        raise InvalidSubRequest('Each request must be an object with method and path')
+    method = str(item.get('method', 'GET')).upper()
+    if method not in METHODS:
+        raise InvalidSubRequest(f'Unsupported method {method}')
+    url = urlsplit(str(item.get('path', '')))
+    if not url.path.startswith(PREFIX) or url.scheme or url.netloc:
+        raise InvalidSubRequest(f'path must start with {PREFIX}')
+    headers = item.get('headers') or {}
+    if not isinstance(headers, dict):
+        raise InvalidSubRequest('headers must be an object')
+    return method, url.path, url.query, item.get('body'), headers
+
+
+def _body(response):
+    if hasattr(response, 'data'):
+        return response.data
+    return response.content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def dispatch(request, method, path, query, body, headers):
+    """Run one sub-request as request.user. Returns {status, body} and whether it succeeded."""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {'status': status.HTTP_404_NOT_FOUND, 'body': {'error': f'No route for {path}'}}, False
+    if match.url_name == 'batch':
+        return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': 'Batches cannot be nested'}}, False
+    sub = WSGIRequest(_environ(request, method, path, query, body, headers))
+    # Picked up by rest_framework.request.Request in place of the authentication classes
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    response = match.func(sub, *match.args, **match.kwargs)
+    if getattr(response, 'streaming', False):
+        # A failure like any other, so an atomic batch rolls back instead of going on without the download
+        response.close()
+        return {
+            'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': 'Streaming responses (downloads) cannot be batched'},
+        }, False
+    result = {'status': response.status_code, 'body': _body(response)}
+    if response.has_header('ETag'):
+        result['etag'] = response['ETag']
+    return result, response.status_code < 400
+
+
+def _dispatch_safely(request, item):
+    try:
+        return dispatch(request, *item)
+    except Exception:
+        logger.exception(f'Batched {item[0]} {item[1]} failed')
+        return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': {'error': 'Internal server error'}}, False
+
+
+def run(request, items, atomic=False):
+    """Results of the parsed sub-requests, in order, and whether they were rolled back.
+
+    With atomic=True everything runs in one transaction that stops at the first
+    failing sub-request and is rolled back; the sub-requests after it don't run.
+    """
+    if not atomic:
+        return [_dispatch_safely(request, item)[0] for item in items], False
+    results = []
+    with transaction.atomic():
+        for item in items:
+            result, ok = _dispatch_safely(request, item)
+            results.append(result)
+            if not ok:
+                transaction.set_rollback(True)
+                return results, True
+    return results, False
@@ -0,0 +1,154 @@
+"""Derived bookkeeping for ledger rows.
+
+Views take a snapshot() of a row before and after they change it and hand both
+to record_change(), or a batch of such pairs to record_changes(). Everything derived from ledger rows (company counters,
+project profit rollups, month-end balance snapshots) is updated from the difference between the two
+snapshots, so create, approve, reject, edit and delete all go through the same
+code path.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F
+
+from . import sync
+from .fx import to_base
+from .models import CompanyCounters, Milestone, Project
+from .snapshots import update_balance_snapshots
+
+
+def snapshot(obj):
+    """The fields of a ledger row that derived data depends on. `amount` is in
+    the company's base currency, which is what every derived total is kept in."""
+    amount = getattr(obj, 'amount', None)
+    return {
+        'model': type(obj).__name__,
+        'company_id': obj.company_id,
+        'status': getattr(obj, 'status', None),
+        'transaction_type': getattr(obj, 'transaction_type', None),
+        'project_id': getattr(obj, 'project_id', None),
+        'account': getattr(obj, 'account', None),
+        'date': getattr(obj, 'date', None),
+        'amount': to_base(obj) if amount is not None else None,
+        'achieved': getattr(obj, 'achieved', None),
+    }
+
+
+def _counter_contributions(snap):
+    """What a single row adds to its company's counters"""
+    if snap is None:
+        return {}
+    model = snap['model']
+    if model == 'Project' and snap['status'] == 'PENDING':
+        return {'pending_projects': 1}
+    if model == 'Transaction':
+        if snap['status'] == 'PENDING':
+            return {'pending_transactions': 1}
+        if snap['status'] == 'APPROVED' and snap['transaction_type'] == 'INCOME':
+            return {'approved_income_total': snap['amount'] or Decimal('0')}
+    if model == 'Salary' and snap['status'] == 'PENDING':
+        return {'pending_salaries': 1}
+    if model == 'Milestone' and snap['achieved']:
+        return {'milestones_achieved': 1}
+    return {}
+
+
+def _diff(before, after):
+    deltas = defaultdict(int)
+    for field, value in _counter_contributions(after).items():
+        deltas[field] += value
+    for field, value in _counter_contributions(before).items():
+        deltas[field] -= value
+    return {field: value for field, value in deltas.items() if value}
+
+
+def update_company_counters(company_id, deltas):
+    if not deltas:
+        return
+    CompanyCounters.objects.get_or_create(company_id=company_id)
+    CompanyCounters.objects.filter(company_id=company_id).update(
+        **{field: F(field) + value for field, value in deltas.items()}
+    )
+
+
+def _project_contributions(snap):
+    """(project_id, income, expense) an approved project-linked transaction adds to its project"""
+    if snap is None or snap['model'] != 'Transaction' or snap['status'] != 'APPROVED' or not snap['project_id']:
+        return None
+    amount = snap['amount'] or Decimal('0')
+    if snap['transaction_type'] == 'INCOME':
+        return snap['project_id'], amount, Decimal('0')
+    if snap['transaction_type'] == 'EXPENSE':
+        return snap['project_id'], Decimal('0'), amount
+    return None
+
+
+def update_project_totals(changes):
+    deltas = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    companies = {}
+    for before, after in changes:
+        for snap, sign in ((after, 1), (before, -1)):
+            contribution = _project_contributions(snap)
+            if contribution:
+                project_id, income, expense = contribution
+                deltas[project_id][0] += sign * income
+                deltas[project_id][1] += sign * expense
+                companies[project_id] = snap['company_id']
+    # Every touched project gets a new version, even when the totals net out
+    # (e.g. a description edit), because its ledger stream still changed.
+    for project_id, (income, expense) in deltas.items():
+        # A project deleted in the meantime (transactions are SET_NULL) simply matches no row
+        Project.objects.filter(pk=project_id).update(
+            income_total=F('income_total') + income,
+            expense_total=F('expense_total') + expense,
+            profit=F('profit') + income - expense,
+            version=F('version') + 1,
+        )
+    sync.touch(Project, [(companies[project_id], project_id) for project_id in deltas])
+
+
+def record_change(before, after):
+    """Apply the derived effects of a ledger row going from `before` to `after`.
+
+    Either side may be None for creates and deletes.
+    """
+    record_changes([(before, after)])
+
+
+def record_changes(changes):
+    """record_change() for many (before, after) pairs, merging their deltas so
+    each company, project and snapshot row is updated once"""
+    counters = defaultdict(lambda: defaultdict(int))
+    for before, after in changes:
+        if before and after and before['company_id'] != after['company_id']:
+            pairs = ((before['company_id'], _diff(before, None)), (after['company_id'], _diff(None, after)))
+        else:
+            pairs = (((after or before)['company_id'], _diff(before, after)),)
+        for company_id, deltas in pairs:
+            for field, value in deltas.items():
+                counters[company_id][field] += value
+    if len(counters) == 1:
+        for company_id, deltas in counters.items():
+            update_company_counters(company_id, {field: value for field, value in deltas.items() if value})
+    elif counters:
+        # Batches (e.g. recurring entries) often move many companies by the same amounts:
+        # one UPDATE per distinct set of deltas instead of one per company
+        CompanyCounters.objects.bulk_create(
+            [CompanyCounters(company_id=company_id) for company_id in counters], ignore_conflicts=True,
+        )
+        by_deltas = defaultdict(list)
+        for company_id, deltas in counters.items():
+            by_deltas[tuple(sorted((field, value) for field, value in deltas.items() if value))].append(company_id)
+        for deltas, company_ids in by_deltas.items():
+            if deltas:
+                CompanyCounters.objects.filter(company_id__in=company_ids).update(
+                    **{field: F(field) + value for field, value in deltas}
+                )
+    # Milestone progress is measured against approved income
+    income_companies = [company_id for company_id, deltas in counters.items() if deltas.get('approved_income_total')]
+    if income_companies:
+        sync.touch(Milestone, Milestone.objects.filter(
+            company_id__in=income_companies, achieved=False,
+        ).values_list('company_id', 'id'))
+    update_project_totals(changes)
+    update_balance_snapshots(changes)
@@ -0,0 +1,163 @@
+"""Column-oriented responses: ?format=columnar (JSON) and ?format=arrow.
+
+Charts and exports read a few columns of many rows, and in the usual list of
+objects every row repeats every key. A columnar response has one array per
+column instead: {"count": n, "columns": {"date": [...], "amount": [...]}}.
+?fields=date,amount keeps only the columns asked for. List endpoints build
+the arrays straight from values_list(), so no model instances or serializers
+are involved. Amounts stay decimal strings, as in the row format.
+
+?format=arrow sends the same columns as an Apache Arrow IPC stream
+(application/vnd.apache.arrow.stream) with typed decimal, date and timestamp
+columns. It is offered only when pyarrow is installed; error responses are
+JSON either way.
+"""
+import decimal
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fx import CENT, base_amount
+from .renderers import FastJSONRenderer
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # Arrow output is optional
+    pyarrow = None
+
+
+FORMATS = ('columnar', 'arrow')
+
+# Columnar list of transactions: name -> values_list() path, or a function returning an amount expression
+TRANSACTION_COLUMNS = {
+    'id': 'id',
+    'company': 'company_id',
+    'company_name': 'company__name',
+    'transaction_type': 'transaction_type',
+    'amount': 'amount',
+    'currency': 'currency',
+    'base_amount': base_amount,
+    'description': 'description',
+    'date': 'date',
+    'account': 'account',
+    'project': 'project_id',
+    'project_name': 'project__name',
+    'is_project_related': 'is_project_related',
+    'created_by': 'created_by_id',
+    'created_by_name': 'created_by__username',
+    'created_at': 'created_at',
+    'status': 'status',
+    'approvals_required': 'approvals_required',
+    'approvals_received': 'approvals_received',
+}
+
+SALARY_COLUMNS = {
+    'id': 'id',
+    'company': 'company_id',
+    'company_name': 'company__name',
+    'director': 'director_id',
+    'director_name': 'director__user__username',
+    'amount': 'amount',
+    'currency': 'currency',
+    'base_amount': base_amount,
+    'description': 'description',
+    'date': 'date',
+    'account': 'account',
+    'created_by': 'created_by_id',
+    'created_by_name': 'created_by__username',
+    'created_at': 'created_at',
+    'status': 'status',
+    'approvals_required': 'approvals_required',
+    'approvals_received': 'approvals_received',
+}
+
+
+class UnknownColumns(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Unknown fields.'
+    default_code = 'unknown_columns'
+
+
+class ColumnarEncoder(JSONEncoder):
+    def default(self, obj):
+        # Exact decimal strings, like the serializers' DecimalFields
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+class ColumnarRenderer(FastJSONRenderer):
+    media_type = 'application/vnd.ledger.columnar+json'
+    format = 'columnar'
+    encoder_class = ColumnarEncoder
+
+
+class ArrowRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if not isinstance(data, dict) or 'columns' not in data:
+            # Errors and the like
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return FastJSONRenderer().render(data, renderer_context=renderer_context)
+        table = pyarrow.table({name: pyarrow.array(values) for name, values in data['columns'].items()})
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def renderers(arrow=True):
+    """Renderer classes of a view with columnar output; Arrow only for flat payloads"""
+    classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer]
+    if arrow and pyarrow is not None:
+        classes.append(ArrowRenderer)
+    return classes
+
+
+def requested(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) in FORMATS
+
+
+def selected(fields, available):
+    """Column names from a ?fields= value, in the order given, or all of `available`"""
+    fields = [name.strip() for name in (fields or '').split(',') if name.strip()]
+    if not fields:
+        return list(available)
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise UnknownColumns(f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(available)}')
+    return list(dict.fromkeys(fields))
+
+
+def from_queryset(queryset, columns, fields=None):
+    """{count, columns} for the rows of `queryset`, read with one values_list()"""
+    names = selected(fields, columns)
+    annotations = {f'_{name}': columns[name]() for name in names if callable(columns[name])}
+    paths = [f'_{name}' if callable(columns[name]) else columns[name] for name in names]
+    rows = list(queryset.prefetch_related(None).annotate(**annotations).values_list(*paths))
+    arrays = [list(values) for values in zip(*rows)] if rows else [[] for _ in names]
+    for index, name in enumerate(names):
+        if callable(columns[name]):
+            # Computed columns are amounts, which SQLite returns unquantized (10.5 for 10.50)
+            arrays[index] = [None if value is None else value.quantize(CENT) for value in arrays[index]]
+    return {'count': len(rows), 'columns': dict(zip(names, arrays))}
+
+
+def from_rows(rows, fields=None):
+    """{count, columns} for a list of dicts that all have the same keys"""
+    if not rows:
+        # Nothing to check ?fields= against
+        return {'count': 0, 'columns': {}}
+    names = selected(fields, list(rows[0]))
+    return {'count': len(rows), 'columns': {name: [row[name] for row in rows] for name in names}}
@@ -0,0 +1,101 @@
+"""Conversion of money rows into their company's base currency.
+
+Aggregates convert in SQL with base_amount(): rows already in the base
+currency short-circuit in a CASE, the rest multiply by the latest FxRate on
+or before their date. Single rows (serializers, bookkeeping snapshots) go
+through to_base(), backed by an in-process LRU of (currency, base, date)
+rates. Only rates that exist are cached, so a rate imported later is
+picked up at once; the LRU is cleared when an FxRate is saved or deleted
+in this process. Both round each converted row to cents, so running totals kept from
+snapshots agree with a fresh aggregate.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, When
+from django.db.models.functions import Round
+from django.db.models.signals import post_delete, post_save
+
+from .models import Company, FxRate
+
+
+CENT = Decimal('0.01')
+ONE = Decimal('1')
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+class MissingRate(ValueError):
+    pass
+
+
+@lru_cache(maxsize=8192)
+def _imported_rate(currency, base_currency, day):
+    # lru_cache doesn't keep exceptions, so a missing rate is looked up again next time
+    value = (
+        FxRate.objects.filter(currency=currency, base_currency=base_currency, date__lte=day)
+        .order_by('-date').values_list('rate', flat=True).first()
+    )
+    if value is None:
+        raise MissingRate(f'No {currency}/{base_currency} exchange rate on or before {day.isoformat()}')
+    return value
+
+
+def rate(currency, base_currency, day):
+    """Value of one `currency` in `base_currency` on `day`, or None without an imported rate"""
+    if currency == base_currency:
+        return ONE
+    try:
+        return _imported_rate(currency, base_currency, day)
+    except MissingRate:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def company_base_currency(company_id):
+    # Safe to cache: a company's base currency can't change once it exists
+    return Company.objects.values_list('base_currency', flat=True).get(pk=company_id)
+
+
+def convert(amount, currency, base_currency, day):
+    if currency == base_currency:
+        return amount
+    fx_rate = rate(currency, base_currency, day)
+    if fx_rate is None:
+        raise MissingRate(f'No {currency}/{base_currency} exchange rate on or before {day.isoformat()}')
+    return (amount * fx_rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_base(obj, field='amount', date_field='date'):
+    """A money field of a row in its company's base currency"""
+    amount = getattr(obj, field)
+    if amount is None:
+        return None
+    return convert(amount, obj.currency, company_base_currency(obj.company_id), getattr(obj, date_field))
+
+
+def clear_caches():
+    _imported_rate.cache_clear()
+    company_base_currency.cache_clear()
+
+
+def _rates_changed(sender, **kwargs):
+    _imported_rate.cache_clear()
+
+
+def connect():
+    post_save.connect(_rates_changed, sender=FxRate, dispatch_uid='fx-rate-saved')
+    post_delete.connect(_rates_changed, sender=FxRate, dispatch_uid='fx-rate-deleted')
+
+
+def base_amount(field='amount'):
+    """SQL expression for a row's `field` in its company's base currency"""
+    fx_rate = FxRate.objects.filter(
+        currency=OuterRef('currency'),
+        base_currency=OuterRef('company__base_currency'),
+        date__lte=OuterRef('date'),
+    ).order_by('-date').values('rate')[:1]
+    return Case(
+        When(currency=F('company__base_currency'), then=F(field)),
+        default=Round(F(field) * Subquery(fx_rate), 2),
+        output_field=MONEY,
+    )
@@ -0,0 +1,72 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+# How long a key is remembered; a retry after that runs the request again
+KEY_TTL = timedelta(hours=24)
+
+
+class _KeyTaken(Exception):
+    pass
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored.request_hash != fingerprint:
+        return Response(
+            {'error': 'Idempotency-Key was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored.response_body, status=stored.response_status, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on a viewset action.
+
+    The first request with a key runs inside a transaction that also stores its
+    response; repeats with the same key and body get that response back without
+    running the action again. When two requests with one key race, the loser's
+    changes are rolled back and it replays the winner's response.
+    """
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(self, request, *args, **kwargs)
+        key = key[:255]
+        fingerprint = _fingerprint(request)
+        cutoff = timezone.now() - KEY_TTL
+        IdempotencyKey.objects.filter(user=request.user, created_at__lt=cutoff).delete()
+        stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if stored:
+            return _replay(stored, fingerprint)
+        try:
+            with transaction.atomic():
+                response = view(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    try:
+                        with transaction.atomic():
+                            IdempotencyKey.objects.create(
+                                user=request.user, key=key, method=request.method, path=request.path[:255],
+                                request_hash=fingerprint, response_status=response.status_code,
+                                response_body=response.data,
+                            )
+                    except IntegrityError:
+                        raise _KeyTaken
+        except _KeyTaken:
+            return _replay(IdempotencyKey.objects.get(user=request.user, key=key), fingerprint)
+        return response
+    return wrapper
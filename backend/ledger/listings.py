@@ -0,0 +1,209 @@
+"""Read-only fast path for the transaction, salary and milestone lists.
+
+Serializing thousands of model instances through ModelSerializer spends most
+of its time building instances and resolving fields. The list actions read
+plain values() rows instead, fetch nested approvals and attachments with one
+query per chunk of parents, and build each item with accessors prepared once
+per request from the serializer's own fields. Values are formatted by those
+fields' to_representation(), so the rendered JSON is the same, byte for byte,
+as TransactionSerializer, SalarySerializer and MilestoneSerializer produce
+(ledger/tests/test_listings.py and benchmarks/list_serializers.py check it).
+A field added to one of those serializers must be given a column or an
+accessor here, or the list fails loudly instead of leaving it out.
+"""
+from collections import defaultdict
+
+from django.db.models import Min, Sum
+from rest_framework.relations import RelatedField
+
+from . import fx
+from .fx import base_amount
+from .models import Attachment, SalaryApproval, Transaction, TransactionApproval
+from .serializers import (
+    AttachmentSerializer, MilestoneSerializer, SalaryApprovalSerializer, SalarySerializer,
+    TransactionApprovalSerializer, TransactionSerializer,
+)
+
+
+# Parents per query for nested rows, under SQLite's default limit on query parameters
+CHUNK_SIZE = 900
+
+# Left out of the item, as DRF does when a read-only field's source passes through a null relation
+SKIP = object()
+
+
+def _read(column, to_representation):
+    def read(row):
+        value = row[column]
+        if value is None:
+            return None
+        return to_representation(value) if to_representation else value
+    return read
+
+
+def accessors(serializer_class, columns, computed=None):
+    """(key, accessor) for each field the serializer outputs, in its order.
+
+    A field is read from `columns[key]` (default: the key itself) of a values()
+    row and formatted by the serializer field; `computed` maps keys to
+    accessors of their own.
+    """
+    computed = computed or {}
+    result = []
+    for key, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if key in computed:
+            result.append((key, computed[key]))
+            continue
+        # Foreign keys come out of values() as their ids already
+        to_representation = None if isinstance(field, RelatedField) else field.to_representation
+        result.append((key, _read(columns.get(key, key), to_representation)))
+    return result
+
+
+def build(rows, fields):
+    items = []
+    for row in rows:
+        item = {}
+        for key, read in fields:
+            value = read(row)
+            if value is not SKIP:
+                item[key] = value
+        items.append(item)
+    return items
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _nested(model, parent, ids, columns, fields):
+    """{parent id: [item]} for the rows of `model` under the given parents"""
+    grouped = defaultdict(list)
+    for chunk in _chunks(ids):
+        rows = list(model.objects.filter(**{f'{parent}__in': chunk}).values(*columns))
+        for row, item in zip(rows, build(rows, fields)):
+            grouped[row[parent]].append(item)
+    return grouped
+
+
+def _base_amount(serializer_class):
+    # BaseAmountField.to_representation, from the row's own columns
+    field = serializer_class().fields['base_amount']
+
+    def read(row):
+        try:
+            return field.format(fx.convert(row['amount'], row['currency'], row['company__base_currency'], row['date']))
+        except fx.MissingRate:
+            return None
+    return read
+
+
+def _all_approved(row):
+    # Transaction.all_approved
+    return row['approvals_received'] >= row['approvals_required']
+
+
+def _pending_count(row):
+    return max(row['approvals_required'] - row['approvals_received'], 0)
+
+
+def _related(parent, ids, approval_model, approval_serializer):
+    """({parent id: approvals}, {parent id: attachments}) as the nested serializers output them"""
+    nested = []
+    for model, serializer_class, columns in (
+        (approval_model, approval_serializer, {'approver_name': 'approver__username'}),
+        (Attachment, AttachmentSerializer, {'sha256': 'blob_id'}),
+    ):
+        fields = accessors(serializer_class, columns)
+        nested.append(_nested(model, parent, ids, [columns.get(key, key) for key, _ in fields], fields))
+    return nested
+
+
+def transactions(queryset):
+    """TransactionSerializer(queryset, many=True).data, without model instances"""
+    columns = {
+        'company_name': 'company__name', 'project_name': 'project__name', 'created_by_name': 'created_by__username',
+    }
+    extra = ['approvals_required', 'approvals_received', 'company__base_currency']
+    rows = list(queryset.prefetch_related(None).values(
+        *[columns.get(key, key) for key in _plain_keys(TransactionSerializer, columns)], *extra,
+    ))
+    ids = [row['id'] for row in rows]
+    approvals, attachments = _related('transaction', ids, TransactionApproval, TransactionApprovalSerializer)
+    fields = accessors(TransactionSerializer, columns, {
+        'project_name': lambda row: SKIP if row['project'] is None else row['project__name'],
+        'base_amount': _base_amount(TransactionSerializer),
+        'approvals': lambda row: approvals[row['id']],
+        'attachments': lambda row: attachments[row['id']],
+        'all_approved': _all_approved,
+        'pending_count': _pending_count,
+    })
+    return build(rows, fields)
+
+
+def salaries(queryset):
+    """SalarySerializer(queryset, many=True).data, without model instances"""
+    columns = {
+        'company_name': 'company__name', 'director_name': 'director__user__username',
+        'created_by_name': 'created_by__username',
+    }
+    rows = list(queryset.prefetch_related(None).values(
+        *[columns.get(key, key) for key in _plain_keys(SalarySerializer, columns)], 'company__base_currency',
+    ))
+    ids = [row['id'] for row in rows]
+    approvals, attachments = _related('salary', ids, SalaryApproval, SalaryApprovalSerializer)
+    fields = accessors(SalarySerializer, columns, {
+        'base_amount': _base_amount(SalarySerializer),
+        'approvals': lambda row: approvals[row['id']],
+        'attachments': lambda row: attachments[row['id']],
+        'pending_count': _pending_count,
+    })
+    return build(rows, fields)
+
+
+def milestones(queryset):
+    """MilestoneSerializer(queryset, many=True).data, without model instances"""
+    columns = {
+        'company_name': 'company__name', 'created_by_name': 'created_by__username',
+    }
+    rows = list(queryset.values(
+        *[columns.get(key, key) for key in _plain_keys(MilestoneSerializer, columns)], 'company__incorporation_date',
+    ))
+    income = {
+        row['company_id']: row
+        for row in Transaction.objects.filter(
+            company_id__in={row['company'] for row in rows}, transaction_type='INCOME', status='APPROVED',
+        ).values('company_id').annotate(total=Sum(base_amount()), first_date=Min('date'))
+    }
+
+    def progress(row):
+        # MilestoneSerializer.get_progress
+        total_income = income.get(row['company'], {}).get('total') or 0
+        target = row['target_amount']
+        if target > 0:
+            return min(100, (float(total_income) / float(target)) * 100)
+        return 0
+
+    def days_taken(row):
+        # MilestoneSerializer.get_days_taken
+        if row['achieved'] and row['achieved_at']:
+            start = row['company__incorporation_date'] or income.get(row['company'], {}).get('first_date')
+            if start:
+                return (row['achieved_at'] - start).days
+        return None
+
+    fields = accessors(MilestoneSerializer, columns, {'progress': progress, 'days_taken': days_taken})
+    return build(rows, fields)
+
+
+def _plain_keys(serializer_class, columns):
+    """Keys of the serializer's readable fields that are model fields or `columns`"""
+    model = serializer_class.Meta.model
+    names = {field.name for field in model._meta.concrete_fields}
+    return [
+        key for key, field in serializer_class().fields.items()
+        if not field.write_only and (key in columns or key in names)
+    ]
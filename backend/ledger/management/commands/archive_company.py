@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.archive import CHUNK_SIZE, archive_company
+from ledger.models import Company
+
+
+class Command(BaseCommand):
+    help = "Move a company's ledger rows to the archive table, in chunks (restore with restore_company)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('company_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        company = Company.all_objects.filter(pk=options['company_id']).first()
+        if company is None:
+            raise CommandError(f"Company {options['company_id']} does not exist")
+        if company.deleted_at is not None:
+            raise CommandError(f'Company {company.pk} is deleted and will be purged; restore it before archiving')
+        counts = archive_company(company, chunk_size=options['chunk_size'])
+        for name, count in counts.items():
+            if count:
+                self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Archived {sum(counts.values())} rows of {company.name}'))
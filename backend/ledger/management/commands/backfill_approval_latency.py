@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ledger.models import ApprovalLatencyBucket, ProjectApproval, TransactionApproval
+from ledger.metrics import record_approval_latency
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the approval latency histogram from existing approval rows'
+
+    def handle(self, *args, **options):
+        sources = [
+            ('PROJECT', ProjectApproval.objects.select_related('project'), 'project'),
+            ('TRANSACTION', TransactionApproval.objects.select_related('transaction'), 'transaction'),
+        ]
+        with transaction.atomic():
+            ApprovalLatencyBucket.objects.all().delete()
+            recorded = 0
+            for object_type, approvals, field in sources:
+                approvals = approvals.filter(approved=True, approved_at__isnull=False)
+                for approval in approvals.iterator():
+                    obj = getattr(approval, field)
+                    record_approval_latency(
+                        obj.company_id, approval.approver_id, object_type,
+                        obj.created_at, approval.approved_at,
+                    )
+                    recorded += 1
+        self.stdout.write(self.style.SUCCESS(f'Recorded {recorded} approvals'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from ledger.models import Company
+from ledger.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild month-end BalanceSnapshot rows (run monthly, e.g. from cron on the 1st)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only rebuild this company')
+        parser.add_argument('--through', help='Last month to snapshot (YYYY-MM-DD); defaults to last month')
+
+    def handle(self, *args, **options):
+        through = None
+        if options['through']:
+            through = parse_date(options['through'])
+            if through is None:
+                raise CommandError('--through must be YYYY-MM-DD')
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(id=options['company'])
+        total = 0
+        for company_id in companies.values_list('id', flat=True):
+            total += build_snapshots(company_id, through=through)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} snapshots for {companies.count()} companies'))
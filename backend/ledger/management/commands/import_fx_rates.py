@@ -0,0 +1,51 @@
+import csv
+import sys
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from ledger import fx
+from ledger.models import FxRate
+
+
+class Command(BaseCommand):
+    help = 'Import exchange rates from a CSV with currency,base_currency,date,rate columns (re-imports overwrite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, or '-' for stdin")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            rows = self._parse(sys.stdin)
+        else:
+            with open(options['path'], newline='') as f:
+                rows = self._parse(f)
+        FxRate.objects.bulk_create(
+            rows, batch_size=options['batch_size'],
+            update_conflicts=True, unique_fields=['currency', 'base_currency', 'date'], update_fields=['rate'],
+        )
+        # Only this process; running app servers keep their cached rates until they reload
+        fx.clear_caches()
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(rows)} exchange rates'))
+        self.stdout.write(
+            'Stored totals convert at write time: if these rates replace or precede rates already in use, '
+            'run reconcile_project_totals, reconcile_company_counters and build_balance_snapshots.'
+        )
+
+    def _parse(self, f):
+        rows = {}
+        for line, record in enumerate(csv.DictReader(f), start=2):
+            try:
+                currency = record['currency'].strip().upper()
+                base_currency = record['base_currency'].strip().upper()
+                day = parse_date(record['date'].strip())
+                rate = Decimal(record['rate'].strip())
+            except (KeyError, AttributeError, InvalidOperation, ValueError):
+                raise CommandError(f'Line {line}: expected currency,base_currency,date,rate')
+            if day is None or len(currency) != 3 or len(base_currency) != 3 or rate <= 0:
+                raise CommandError(f'Line {line}: invalid rate {record}')
+            # The last row for a (currency, base, date) wins, as a re-import would
+            rows[(currency, base_currency, day)] = FxRate(currency=currency, base_currency=base_currency, date=day, rate=rate)
+        return list(rows.values())
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from ledger.recurring import materialize
+
+
+class Command(BaseCommand):
+    help = 'Book all due recurring transactions and salaries (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Book occurrences due on or before this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Recurring entries per database transaction')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('--date must be YYYY-MM-DD')
+        started = time.perf_counter()
+        stats = materialize(today, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Booked {stats.get('created', 0)} rows from {stats.get('entries', 0)} recurring entries "
+            f"in {time.perf_counter() - started:.2f}s "
+            f"({stats.get('already_booked', 0)} already booked, {stats.get('skipped_closed', 0)} in closed periods, "
+            f"{stats.get('missing_rate', 0)} waiting for exchange rates)"
+        ))
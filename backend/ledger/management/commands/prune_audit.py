@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from ledger.models import AuditEntry
+
+
+class Command(BaseCommand):
+    help = 'Delete audit entries of whole months before the given one (retention)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='First month to keep (YYYY-MM)')
+
+    def handle(self, *args, **options):
+        first_kept = parse_date(f"{options['before']}-01")
+        if first_kept is None:
+            raise CommandError('--before must be YYYY-MM')
+        deleted, _ = AuditEntry.objects.filter(month__lt=first_kept).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} audit entries before {options["before"]}'))
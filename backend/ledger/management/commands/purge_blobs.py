@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ledger.attachments import purge_blobs
+
+
+class Command(BaseCommand):
+    help = 'Delete stored attachment files no attachment refers to (e.g. after a company was deleted)'
+
+    def handle(self, *args, **options):
+        purged = purge_blobs()
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} unreferenced blobs'))
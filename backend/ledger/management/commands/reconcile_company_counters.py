@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from ledger.fx import base_amount
+from ledger.models import Company, CompanyCounters, Milestone, Project, Salary, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Recompute CompanyCounters from the ledger tables'
+
+    def handle(self, *args, **options):
+        def by_company(qs, **aggregates):
+            return {row.pop('company_id'): row for row in qs.values('company_id').annotate(**aggregates).order_by()}
+
+        projects = by_company(Project.objects.filter(status='PENDING'), n=Count('id'))
+        salaries = by_company(Salary.objects.filter(status='PENDING'), n=Count('id'))
+        milestones = by_company(Milestone.objects.filter(achieved=True), n=Count('id'))
+        transactions = by_company(
+            Transaction.objects.all(),
+            pending=Count('id', filter=Q(status='PENDING')),
+            income=Sum(base_amount(), filter=Q(status='APPROVED', transaction_type='INCOME')),
+        )
+
+        counters = []
+        for company_id in Company.objects.values_list('id', flat=True):
+            tx = transactions.get(company_id, {})
+            counters.append(CompanyCounters(
+                company_id=company_id,
+                pending_projects=projects.get(company_id, {}).get('n', 0),
+                pending_transactions=tx.get('pending') or 0,
+                pending_salaries=salaries.get(company_id, {}).get('n', 0),
+                approved_income_total=tx.get('income') or Decimal('0'),
+                milestones_achieved=milestones.get(company_id, {}).get('n', 0),
+            ))
+        with transaction.atomic():
+            CompanyCounters.objects.all().delete()
+            CompanyCounters.objects.bulk_create(counters)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {len(counters)} companies'))
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from ledger.fx import base_amount
+from ledger.models import Project, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Recompute Project income/expense/profit rollups from approved transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only reconcile projects of this company')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['company']:
+            projects = projects.filter(company_id=options['company'])
+
+        totals = {
+            row['project_id']: row
+            for row in Transaction.objects.filter(status='APPROVED', project__in=projects)
+            .values('project_id')
+            .annotate(
+                income=Sum(base_amount(), filter=Q(transaction_type='INCOME')),
+                expense=Sum(base_amount(), filter=Q(transaction_type='EXPENSE')),
+            )
+            .order_by()
+        }
+
+        drifted = []
+        for project in projects.only('id', 'income_total', 'expense_total', 'profit'):
+            row = totals.get(project.id, {})
+            income = row.get('income') or Decimal('0')
+            expense = row.get('expense') or Decimal('0')
+            if (project.income_total, project.expense_total, project.profit) != (income, expense, income - expense):
+                project.income_total = income
+                project.expense_total = expense
+                project.profit = income - expense
+                drifted.append(project)
+
+        if drifted and not options['dry_run']:
+            with transaction.atomic():
+                Project.objects.bulk_update(drifted, Project.ROLLUP_FIELDS, batch_size=500)
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted projects'))
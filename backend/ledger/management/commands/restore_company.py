@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.archive import CHUNK_SIZE, restore_company
+from ledger.models import Company
+
+
+class Command(BaseCommand):
+    help = "Move an archived company's rows back into the ledger tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('company_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        company = Company.all_objects.filter(pk=options['company_id']).first()
+        if company is None:
+            raise CommandError(f"Company {options['company_id']} does not exist")
+        if company.archived_at is None:
+            raise CommandError(f'Company {company.pk} is not archived')
+        counts = restore_company(company, chunk_size=options['chunk_size'])
+        for name, count in counts.items():
+            if count:
+                self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Restored {sum(counts.values())} rows of {company.name}'))
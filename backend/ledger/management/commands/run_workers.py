@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ledger.tasks import drain, make_executor
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (milestone checks, approval latency, ...) from the outbox table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Companies processed in parallel')
+        parser.add_argument('--batch', type=int, default=200, help='Tasks fetched per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        executor = make_executor(options['threads'])
+        total = 0
+        try:
+            while True:
+                done = drain(executor, batch_size=options['batch'])
+                total += done
+                if options['once']:
+                    if not done:
+                        break
+                    continue
+                if not done:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            executor.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} tasks'))
@@ -0,0 +1,293 @@
+import threading
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ApprovalLatencyBucket, CompanyCounters
+
+
+# Upper bounds (seconds) of the time-to-approve histogram buckets.
+# The last bucket catches everything slower than 30 days.
+LATENCY_BUCKETS = (
+    60, 300, 900, 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+    float('inf'),
+)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def latency_bucket(seconds):
+    """Index of the histogram bucket a latency falls into"""
+    return bisect_left(LATENCY_BUCKETS, seconds)
+
+
+def record_approval_latency(company_id, approver_id, object_type, created_at, approved_at):
+    """Count one approval in the pre-aggregated latency histogram"""
+    seconds = max(0.0, (approved_at - created_at).total_seconds())
+    bucket, _ = ApprovalLatencyBucket.objects.get_or_create(
+        company_id=company_id,
+        approver_id=approver_id,
+        object_type=object_type,
+        day=timezone.localdate(approved_at),
+        bucket=latency_bucket(seconds),
+    )
+    # F-expressions so concurrent approvals don't lose increments
+    ApprovalLatencyBucket.objects.filter(pk=bucket.pk).update(
+        count=F('count') + 1,
+        total_seconds=F('total_seconds') + seconds,
+    )
+
+
+def histogram_quantile(q, counts):
+    """Estimate a quantile from per-bucket counts, interpolating inside the bucket
+    the same way Prometheus' histogram_quantile() does."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            lower = LATENCY_BUCKETS[index - 1] if index else 0
+            upper = LATENCY_BUCKETS[index]
+            if upper == float('inf'):
+                # Nothing to interpolate towards, report the lower bound
+                return lower
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return LATENCY_BUCKETS[-2]
+
+
+def approval_latency_stats(company_ids, days=30):
+    """Time-to-approve stats per company, approver and object type over the last `days` days"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = (
+        ApprovalLatencyBucket.objects
+        .filter(company_id__in=company_ids, day__gte=since)
+        .values('company_id', 'company__name', 'approver_id', 'approver__username', 'object_type', 'bucket')
+        .annotate(count=Sum('count'), total_seconds=Sum('total_seconds'))
+        .order_by()
+    )
+
+    groups = {}
+    for row in rows:
+        key = (row['company_id'], row['approver_id'], row['object_type'])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'company_id': row['company_id'],
+                'company_name': row['company__name'],
+                'approver_id': row['approver_id'],
+                'approver_name': row['approver__username'],
+                'object_type': row['object_type'],
+                'buckets': [0] * len(LATENCY_BUCKETS),
+                'total_seconds': 0.0,
+            }
+        group['buckets'][row['bucket']] += row['count']
+        group['total_seconds'] += row['total_seconds']
+
+    stats = []
+    for group in sorted(groups.values(), key=lambda g: (g['company_id'], g['object_type'], g['approver_name'])):
+        count = sum(group['buckets'])
+        group['count'] = count
+        group['mean_seconds'] = group['total_seconds'] / count if count else None
+        for q in QUANTILES:
+            group[f'p{int(q * 100)}_seconds'] = histogram_quantile(q, group['buckets'])
+        stats.append(group)
+    return stats
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+def _bucket_bound(bound):
+    return '+Inf' if bound == float('inf') else f'{bound:g}'
+
+
+def render_approval_latency_prometheus(stats):
+    """Render approval_latency_stats() output in the Prometheus text exposition format"""
+    name = 'ledger_approval_latency_seconds'
+    lines = [
+        f'# HELP {name} Time from creation to approval of projects and transactions.',
+        f'# TYPE {name} histogram',
+    ]
+    for group in stats:
+        labels = _labels(
+            company=group['company_id'],
+            approver=group['approver_name'],
+            object_type=group['object_type'],
+        )
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, group['buckets']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{_bucket_bound(bound)}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {group["total_seconds"]:g}')
+        lines.append(f'{name}_count{{{labels}}} {group["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# In-process metrics registry.
+# Values live in this worker's memory; with several gunicorn workers each one
+# exposes its own series and Prometheus sums them.
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            labels = _labels(**dict(zip(self.labelnames, labelvalues)))
+            lines.append(f'{self.name}{{{labels}}} {value:g}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labelvalues, list(series)) for labelvalues, series in self._series.items())
+        for labelvalues, series in items:
+            labels = _labels(**dict(zip(self.labelnames, labelvalues)))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{_bucket_bound(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:g}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    'ledger_request_duration_seconds',
+    'Request latency per view and action.',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')),
+    labelnames=('view', 'method', 'status'),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'ledger_request_db_queries',
+    'Database queries executed per request.',
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, float('inf')),
+    labelnames=('view', 'method'),
+)
+CACHE_REQUESTS = Counter(
+    'ledger_cache_requests_total',
+    'Cache lookups made through metrics.cached(), by result.',
+    labelnames=('cache', 'result'),
+)
+
+
+def cached(name, key, compute, timeout=300):
+    """cache.get/set wrapper that counts hits and misses under `name`"""
+    value = cache.get(key)
+    if value is not None:
+        CACHE_REQUESTS.inc(name, 'hit')
+        return value
+    CACHE_REQUESTS.inc(name, 'miss')
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def company_cache_version(company_id):
+    """Generation counter mixed into cache keys of company-derived data"""
+    return cache.get_or_set(f'ledger:company-version:{company_id}', 0, None)
+
+
+def invalidate_company_caches(company_id):
+    """Orphan every cached entry keyed with company_cache_version()"""
+    key = f'ledger:company-version:{company_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _render_cache_hit_ratio():
+    name = 'ledger_cache_hit_ratio'
+    lines = [f'# HELP {name} Share of cache lookups that were hits.', f'# TYPE {name} gauge']
+    caches = sorted({labelvalues[0] for labelvalues in CACHE_REQUESTS._values})
+    for cache_name in caches:
+        hits = CACHE_REQUESTS.value(cache_name, 'hit')
+        total = hits + CACHE_REQUESTS.value(cache_name, 'miss')
+        lines.append(f'{name}{{{_labels(cache=cache_name)}}} {hits / total if total else 0:g}')
+    return lines
+
+
+def _render_business_gauges():
+    """Business gauges, read straight from the counters the approve/reject actions maintain"""
+    counters = list(CompanyCounters.objects.values_list(
+        'company_id', 'pending_projects', 'pending_transactions', 'pending_salaries',
+        'approved_income_total', 'milestones_achieved',
+    ))
+    lines = [
+        '# HELP ledger_pending_items Items awaiting approval.',
+        '# TYPE ledger_pending_items gauge',
+    ]
+    for company_id, projects, transactions, salaries, _, _ in counters:
+        for object_type, value in (('project', projects), ('transaction', transactions), ('salary', salaries)):
+            lines.append(f'ledger_pending_items{{{_labels(company=company_id, type=object_type)}}} {value}')
+    lines += [
+        '# HELP ledger_approved_income_total Sum of approved income transactions.',
+        '# TYPE ledger_approved_income_total gauge',
+    ]
+    for company_id, _, _, _, income, _ in counters:
+        lines.append(f'ledger_approved_income_total{{{_labels(company=company_id)}}} {income}')
+    lines += [
+        '# HELP ledger_milestones_achieved Milestones achieved.',
+        '# TYPE ledger_milestones_achieved gauge',
+    ]
+    for company_id, _, _, _, _, achieved in counters:
+        lines.append(f'ledger_milestones_achieved{{{_labels(company=company_id)}}} {achieved}')
+    return lines
+
+
+def render_prometheus():
+    """Everything exported on /metrics"""
+    lines = []
+    lines += REQUEST_LATENCY.render()
+    lines += REQUEST_DB_QUERIES.render()
+    lines += CACHE_REQUESTS.render()
+    lines += _render_cache_hit_ratio()
+    lines += _render_business_gauges()
+    return '\n'.join(lines) + '\n'
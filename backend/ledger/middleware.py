@@ -0,0 +1,127 @@
+import re
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from . import audit
+from .metrics import REQUEST_DB_QUERIES, REQUEST_LATENCY
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+
+class MetricsMiddleware:
+    """Records per-view request latency and DB query counts for /metrics"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # Router url names identify both the viewset and the action,
+        # e.g. "transaction-list" or "transaction-approve"
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        REQUEST_LATENCY.observe(elapsed, view, request.method, str(response.status_code))
+        REQUEST_DB_QUERIES.observe(queries, view, request.method)
+        return response
+
+
+class AuditMiddleware:
+    """Writes the audit entries of a request in one INSERT once its response is ready"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit.buffered() as entries:
+            response = self.get_response(request)
+        # DRF copies the user it authenticated (e.g. from a JWT) onto the Django request
+        user = getattr(request, 'user', None)
+        audit.flush(entries, user.pk if user is not None and user.is_authenticated else None, request.path)
+        return response
+
+
+_ACCEPT_ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+BROTLI_QUALITY = 4
+
+
+def accepted_encodings(header):
+    """Codings the Accept-Encoding header allows, best first ("identity" and q=0 left out)"""
+    weighted = []
+    for position, part in enumerate(header.split(',')):
+        match = _ACCEPT_ENCODING_RE.match(part)
+        if not match:
+            continue
+        coding, q = match.group(1).lower(), match.group(2)
+        try:
+            q = float(q) if q is not None else 1.0
+        except ValueError:
+            continue
+        if q > 0 and coding != 'identity':
+            weighted.append((-q, position, coding))
+    return [coding for _, _, coding in sorted(weighted)]
+
+
+def _compressible(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type.startswith('text/') or media_type == 'application/json' or media_type.endswith('+json')
+
+
+class CompressionMiddleware:
+    """Brotli (when installed) or gzip for JSON and text responses of at least
+    LEDGER_COMPRESS_MIN_BYTES, whichever the client ranks higher.
+
+    Streaming responses (file downloads, the consolidated summary) go out as
+    they are, so they keep streaming and byte ranges keep meaning what they say.
+    Bodies are compressed only if that makes them smaller.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not _compressible(response.get('Content-Type', '')):
+            return response
+        # The representation depends on Accept-Encoding even when it is sent as is
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.LEDGER_COMPRESS_MIN_BYTES:
+            return response
+        for coding in accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            if coding == 'br' and brotli is not None:
+                compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            elif coding in ('gzip', '*'):
+                # Random padding in the gzip header, as in Django's GZipMiddleware, against BREACH
+                coding, compressed = 'gzip', compress_string(response.content, max_random_bytes=100)
+            else:
+                continue
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+            response['Content-Encoding'] = coding
+            # Strong ETags promise identical bytes, which no longer holds across encodings
+            etag = response.get('ETag')
+            if etag and etag.startswith('"'):
+                response['ETag'] = 'W/' + etag
+            return response
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0003_company_incorporation_date_milestone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApprovalLatencyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('PROJECT', 'Project'), ('TRANSACTION', 'Transaction')], max_length=20)),
+                ('day', models.DateField()),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('approver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_latency_buckets', to=settings.AUTH_USER_MODEL)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_latency_buckets', to='ledger.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'day'], name='ledger_appr_company_dae03f_idx')],
+                'unique_together': {('company', 'approver', 'object_type', 'day', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0004_approvallatencybucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyCounters',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='ledger.company')),
+                ('pending_projects', models.IntegerField(default=0)),
+                ('pending_transactions', models.IntegerField(default=0)),
+                ('pending_salaries', models.IntegerField(default=0)),
+                ('approved_income_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('milestones_achieved', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Company counters',
+            },
+        ),
+    ]
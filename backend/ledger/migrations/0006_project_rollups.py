@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:38
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    Project = apps.get_model('ledger', 'Project')
+    Transaction = apps.get_model('ledger', 'Transaction')
+    totals = (
+        Transaction.objects.filter(status='APPROVED', project__isnull=False)
+        .values('project_id')
+        .annotate(
+            income=Sum('amount', filter=Q(transaction_type='INCOME')),
+            expense=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+        )
+        .order_by()
+    )
+    for row in totals:
+        income = row['income'] or Decimal('0')
+        expense = row['expense'] or Decimal('0')
+        Project.objects.filter(pk=row['project_id']).update(
+            income_total=income, expense_total=expense, profit=income - expense,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0005_companycounters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='expense_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='income_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='profit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
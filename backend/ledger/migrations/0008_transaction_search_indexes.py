@@ -0,0 +1,81 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'ledger_transaction_fts'
+TRIGRAM_TABLE = 'ledger_transaction_trigram'
+
+
+def _sqlite_statements():
+    statements = []
+    for table, tokenize in ((FTS_TABLE, 'porter unicode61'), (TRIGRAM_TABLE, 'trigram')):
+        # External-content tables: the text lives in ledger_transaction only, triggers keep the index in sync
+        statements += [
+            f"CREATE VIRTUAL TABLE {table} USING fts5("
+            f"description, content='ledger_transaction', content_rowid='id', tokenize='{tokenize}')",
+            f"CREATE TRIGGER {table}_ai AFTER INSERT ON ledger_transaction BEGIN "
+            f"INSERT INTO {table}(rowid, description) VALUES (new.id, new.description); END",
+            f"CREATE TRIGGER {table}_ad AFTER DELETE ON ledger_transaction BEGIN "
+            f"INSERT INTO {table}({table}, rowid, description) VALUES ('delete', old.id, old.description); END",
+            f"CREATE TRIGGER {table}_au AFTER UPDATE OF description ON ledger_transaction BEGIN "
+            f"INSERT INTO {table}({table}, rowid, description) VALUES ('delete', old.id, old.description); "
+            f"INSERT INTO {table}(rowid, description) VALUES (new.id, new.description); END",
+            f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+        ]
+    return statements
+
+
+POSTGRES_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ledger_transaction_description_tsv "
+    "ON ledger_transaction USING GIN (to_tsvector('english', description))",
+    "CREATE INDEX IF NOT EXISTS ledger_transaction_description_trgm "
+    "ON ledger_transaction USING GIN (description gin_trgm_ops)",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.ledger_fts5_probe USING fts5(x, tokenize='trigram')")
+        except Exception:
+            return False
+        cursor.execute("DROP TABLE temp.ledger_fts5_probe")
+    return True
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        if not _sqlite_has_fts5(connection):
+            # Search falls back to LIKE queries, see ledger/search.py
+            return
+        statements = _sqlite_statements()
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRES_STATEMENTS
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for table in (FTS_TABLE, TRIGRAM_TABLE):
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS ledger_transaction_description_tsv')
+        schema_editor.execute('DROP INDEX IF EXISTS ledger_transaction_description_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0007_project_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
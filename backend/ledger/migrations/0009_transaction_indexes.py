@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0008_transaction_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['company', 'date'], name='ledger_tran_company_b11be6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['company', 'status'], name='ledger_tran_company_a8827a_idx'),
+        ),
+    ]
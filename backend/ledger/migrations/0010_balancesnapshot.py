@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0009_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('PARTNER1', 'Jouhar'), ('PARTNER2', 'Aleena'), ('COMPANY', 'Company Account')], max_length=10)),
+                ('month_end', models.DateField()),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('salary', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='ledger.company')),
+            ],
+            options={
+                'ordering': ['company', 'month_end', 'account'],
+                'unique_together': {('company', 'account', 'month_end')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0010_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='books_closed_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_end', models.DateField()),
+                ('account', models.CharField(choices=[('PARTNER1', 'Jouhar'), ('PARTNER2', 'Aleena'), ('COMPANY', 'Company Account')], max_length=10)),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('salary', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='periods_closed', to=settings.AUTH_USER_MODEL)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closed_periods', to='ledger.company')),
+            ],
+            options={
+                'ordering': ['company', 'month_end', 'account'],
+                'unique_together': {('company', 'month_end', 'account')},
+            },
+        ),
+    ]
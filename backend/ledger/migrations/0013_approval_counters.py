@@ -0,0 +1,91 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:49
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_approval_counters(apps, schema_editor):
+    Director = apps.get_model('ledger', 'Director')
+    Project = apps.get_model('ledger', 'Project')
+    Salary = apps.get_model('ledger', 'Salary')
+    Transaction = apps.get_model('ledger', 'Transaction')
+    director_counts = dict(
+        Director.objects.values('company_id').annotate(n=Count('id')).values_list('company_id', 'n')
+    )
+    for company_id, directors in director_counts.items():
+        if directors <= 1:
+            continue
+        # Multi-director companies need every director; salaries need any one of them
+        Project.objects.filter(company_id=company_id).update(approvals_required=directors)
+        Transaction.objects.filter(company_id=company_id).update(approvals_required=directors)
+        Salary.objects.filter(company_id=company_id).update(approvals_required=1)
+    for model, approval_model in ((Project, 'ProjectApproval'), (Transaction, 'TransactionApproval')):
+        approvals = (
+            apps.get_model('ledger', approval_model).objects
+            .filter(**{model._meta.model_name: OuterRef('pk')}, approved=True)
+            .values(model._meta.model_name).annotate(n=Count('id')).values('n')
+        )
+        model.objects.update(approvals_received=Coalesce(Subquery(approvals), 0))
+    Salary.objects.filter(status='APPROVED').update(approvals_received=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0012_outboxtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='approvals_received',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='approvals_required',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salary',
+            name='approvals_received',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salary',
+            name='approvals_required',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='approvals_received',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='approvals_required',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('request_hash', models.CharField(max_length=64)),
+                ('response_status', models.PositiveSmallIntegerField()),
+                ('response_body', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'key')},
+            },
+        ),
+        migrations.RunPython(populate_approval_counters, migrations.RunPython.noop),
+    ]
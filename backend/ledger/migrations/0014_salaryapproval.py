@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_salary_approvals(apps, schema_editor):
+    Director = apps.get_model('ledger', 'Director')
+    Salary = apps.get_model('ledger', 'Salary')
+    SalaryApproval = apps.get_model('ledger', 'SalaryApproval')
+    director_counts = dict(
+        Director.objects.values('company_id').annotate(n=Count('id')).values_list('company_id', 'n')
+    )
+    for company_id, directors in director_counts.items():
+        if directors <= 1:
+            continue
+        # Every director except the one being paid now has to approve
+        Salary.objects.filter(company_id=company_id).update(approvals_required=directors - 1)
+        company_directors = list(Director.objects.filter(company_id=company_id))
+        approvals = [
+            SalaryApproval(salary_id=salary.id, approver_id=director.user_id)
+            for salary in Salary.objects.filter(company_id=company_id, status='PENDING').only('id', 'director_id')
+            for director in company_directors
+            if director.id != salary.director_id
+        ]
+        SalaryApproval.objects.bulk_create(approvals, batch_size=500)
+        # Approved under the old any-one-director rule
+        Salary.objects.filter(company_id=company_id, status='APPROVED').update(approvals_received=directors - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0013_approval_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='approvallatencybucket',
+            name='object_type',
+            field=models.CharField(choices=[('PROJECT', 'Project'), ('TRANSACTION', 'Transaction'), ('SALARY', 'Salary')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SalaryApproval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('approved', models.BooleanField(default=False)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('approver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salary_approvals', to=settings.AUTH_USER_MODEL)),
+                ('salary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approvals', to='ledger.salary')),
+            ],
+            options={
+                'unique_together': {('salary', 'approver')},
+            },
+        ),
+        migrations.RunPython(create_salary_approvals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:54
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0014_salaryapproval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salary',
+            name='occurrence_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='occurrence_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecurringEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('TRANSACTION', 'Transaction'), ('SALARY', 'Salary')], max_length=12)),
+                ('transaction_type', models.CharField(blank=True, choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense'), ('SALARY', 'Salary')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('account', models.CharField(choices=[('PARTNER1', 'Jouhar'), ('PARTNER2', 'Aleena'), ('COMPANY', 'Company Account')], max_length=10)),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly'), ('YEARLY', 'Yearly')], default='MONTHLY', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('next_date', models.DateField()),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_entries', to='ledger.company')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_entries_created', to=settings.AUTH_USER_MODEL)),
+                ('director', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recurring_salaries', to='ledger.director')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_entries', to='ledger.project')),
+            ],
+            options={
+                'ordering': ['next_date', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='salary',
+            name='recurring_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='salaries', to='ledger.recurringentry'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='recurring_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='ledger.recurringentry'),
+        ),
+        migrations.AddConstraint(
+            model_name='salary',
+            constraint=models.UniqueConstraint(fields=('recurring_entry', 'occurrence_date'), name='ledger_salary_unique_occurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('recurring_entry', 'occurrence_date'), name='ledger_transaction_unique_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringentry',
+            index=models.Index(fields=['active', 'next_date'], name='ledger_recu_active_0da526_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:57
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0015_recurringentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='base_currency',
+            field=models.CharField(default='INR', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='currency',
+            field=models.CharField(default='INR', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringentry',
+            name='currency',
+            field=models.CharField(default='INR', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='salary',
+            name='currency',
+            field=models.CharField(default='INR', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency',
+            field=models.CharField(default='INR', max_length=3),
+        ),
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('base_currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18, validators=[django.core.validators.MinValueValidator(0)])),
+            ],
+            options={
+                'ordering': ['currency', 'base_currency', '-date'],
+                'unique_together': {('currency', 'base_currency', 'date')},
+            },
+        ),
+    ]
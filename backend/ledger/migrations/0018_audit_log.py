@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:05
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0017_attachments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('CREATE', 'Create'), ('UPDATE', 'Update'), ('DELETE', 'Delete')], max_length=6)),
+                ('object_type', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=64)),
+                ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('path', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('month', models.DateField()),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('company', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='ledger.company')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['company', '-id'], name='ledger_audi_company_dbe842_idx'), models.Index(fields=['object_type', 'object_id', '-id'], name='ledger_audi_object__a6d16a_idx'), models.Index(fields=['actor', '-id'], name='ledger_audi_actor_i_22f9b5_idx'), models.Index(fields=['month'], name='ledger_audi_month_93e70e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+def populate_sync_changes(apps, schema_editor):
+    # Every existing row gets a sequence, so a client starting from since=0 receives it
+    SyncChange = apps.get_model('ledger', 'SyncChange')
+    for name, company_field in (
+        ('Company', 'id'), ('Director', 'company_id'), ('Project', 'company_id'), ('Transaction', 'company_id'),
+        ('Salary', 'company_id'), ('Milestone', 'company_id'), ('RecurringEntry', 'company_id'),
+    ):
+        model = apps.get_model('ledger', name)
+        batch = []
+        for company_id, object_id in model.objects.order_by('id').values_list(company_field, 'id').iterator(chunk_size=2000):
+            batch.append(SyncChange(company_id=company_id, model=name.lower(), object_id=object_id))
+            if len(batch) == 2000:
+                SyncChange.objects.bulk_create(batch)
+                batch = []
+        SyncChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0019_company_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_id', models.BigIntegerField()),
+                ('model', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company_id', 'id'], name='ledger_sync_company_3f2b98_idx')],
+                'unique_together': {('model', 'object_id')},
+            },
+        ),
+        migrations.RunPython(populate_sync_changes, migrations.RunPython.noop),
+    ]
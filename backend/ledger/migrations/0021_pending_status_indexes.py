@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0020_sync_change'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['company', 'status'], name='ledger_proj_company_0b112a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['company', 'status'], name='ledger_sala_company_d33ca4_idx'),
+        ),
+    ]
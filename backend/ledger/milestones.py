@@ -0,0 +1,64 @@
+from datetime import date as date_class
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .bookkeeping import record_change, snapshot
+from .fx import base_amount, to_base
+from .models import Milestone, Transaction
+
+
+def check_and_update_milestones(company, income_transaction=None):
+    """Check and update milestones when income is approved"""
+    total_income = Transaction.objects.filter(
+        company=company,
+        transaction_type='INCOME',
+        status='APPROVED'
+    ).aggregate(total=Sum(base_amount()))['total'] or Decimal('0')
+    
+    # Check incomplete milestones
+    incomplete_milestones = Milestone.objects.filter(
+        company=company,
+        achieved=False
+    )
+    
+    for milestone in incomplete_milestones:
+        if float(total_income) >= float(milestone.target_amount):
+            before = snapshot(milestone)
+            milestone.achieved = True
+            # Use the date of the income transaction that achieved the milestone
+            # If income_transaction is provided, use its date
+            if income_transaction and income_transaction.date:
+                milestone.achieved_at = income_transaction.date
+            else:
+                # Fallback: find the income transaction that made this milestone achievable
+                # We need to find the transaction where cumulative income first reached the target
+                cumulative = Decimal('0')
+                achieving_transaction = None
+                income_transactions = Transaction.objects.filter(
+                    company=company,
+                    transaction_type='INCOME',
+                    status='APPROVED'
+                ).order_by('date', 'id')
+                
+                for tx in income_transactions:
+                    cumulative += to_base(tx)
+                    if cumulative >= milestone.target_amount and not achieving_transaction:
+                        achieving_transaction = tx
+                        break
+                
+                if achieving_transaction:
+                    milestone.achieved_at = achieving_transaction.date
+                else:
+                    # Last resort: use latest income transaction date
+                    latest_income = Transaction.objects.filter(
+                        company=company,
+                        transaction_type='INCOME',
+                        status='APPROVED'
+                    ).order_by('-date').first()
+                    if latest_income:
+                        milestone.achieved_at = latest_income.date
+                    else:
+                        milestone.achieved_at = date_class.today()
+            milestone.save()
+            record_change(before, snapshot(milestone))
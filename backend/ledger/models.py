@@ -1,6 +1,25 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+
+
+# ISO 4217 code money rows and companies default to
+DEFAULT_CURRENCY = 'INR'
+
+
+class CounterFieldsMixin:
+    """Keeps save() from writing back stale copies of fields only ever changed through F() updates"""
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
 
 class User(AbstractUser):
@@ -16,6 +35,13 @@ class User(AbstractUser):
         return f"{self.username} ({self.role})"
 
 
+class ActiveCompanyManager(models.Manager):
+    """Companies that are neither deleted nor archived"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True, archived_at__isnull=True)
+
+
 class Company(models.Model):
     name = models.CharField(max_length=200)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='companies_created')
@@ -23,6 +49,17 @@ class Company(models.Model):
     incorporation_date = models.DateField(null=True, blank=True)
     partner1_name = models.CharField(max_length=100, default='Jouhar')
     partner2_name = models.CharField(max_length=100, default='Aleena')
+    # Last day of the latest closed period; rows dated on or before it are frozen
+    books_closed_through = models.DateField(null=True, blank=True)
+    # Totals, balances and rollups are reported in this currency; fixed once the company exists
+    base_currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    # Soft delete: the company disappears at once and ledger/archive.py purges its rows in the background
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # Set while the company's rows live in ArchivedRow instead of the ledger tables
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveCompanyManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name_plural = 'Companies'
@@ -52,7 +89,7 @@ class Director(models.Model):
         return f"{self.user.username} - {self.company.name}"
 
 
-class Project(models.Model):
+class Project(CounterFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending Approval'),
         ('APPROVED', 'Approved'),
@@ -66,13 +103,28 @@ class Project(models.Model):
     end_date = models.DateField(null=True, blank=True)
     project_value = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
     received_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    # Rollups of approved transactions linked to this project in the company's base currency,
+    # kept current by bookkeeping.record_change
+    income_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Bumped whenever the project's approved transactions change; keys the ledger cache
+    version = models.PositiveIntegerField(default=0)
+    # Fixed when the project is created; approvals_received is maintained by ledger.approvals
+    approvals_required = models.PositiveSmallIntegerField(default=0)
+    approvals_received = models.PositiveSmallIntegerField(default=0)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projects_created')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    ROLLUP_FIELDS = ('income_total', 'expense_total', 'profit', 'version')
+    COUNTER_FIELDS = ROLLUP_FIELDS + ('approvals_received',)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['company', 'status'])]
 
     def __str__(self):
         return f"{self.name} - {self.company.name}"
@@ -87,12 +139,8 @@ class Project(models.Model):
 
     @property
     def all_approved(self):
-        # Only directors need to approve, not company owner
-        directors = Director.objects.filter(company=self.company)
-        if directors.count() <= 1:
-            return True  # No approval needed if only one director
-        approvals = ProjectApproval.objects.filter(project=self, approved=True)
-        return approvals.count() == directors.count()
+        # Stored counters, see ledger.approvals; nothing is required with a single director
+        return self.approvals_received >= self.approvals_required
 
 
 class ProjectApproval(models.Model):
@@ -109,7 +157,7 @@ class ProjectApproval(models.Model):
         return f"{self.project.name} - {self.approver.username} ({'Approved' if self.approved else 'Pending'})"
 
 
-class Transaction(models.Model):
+class Transaction(CounterFieldsMixin, models.Model):
     class TransactionType(models.TextChoices):
         INCOME = 'INCOME', 'Income'
         EXPENSE = 'EXPENSE', 'Expense'
@@ -123,6 +171,7 @@ class Transaction(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='transactions')
     transaction_type = models.CharField(max_length=10, choices=TransactionType.choices)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     description = models.CharField(max_length=255, blank=True)
     date = models.DateField()
     account = models.CharField(max_length=10, choices=Account.choices)
@@ -135,21 +184,33 @@ class Transaction(models.Model):
         ('APPROVED', 'Approved'),
         ('REJECTED', 'Rejected'),
     ])
+    approvals_required = models.PositiveSmallIntegerField(default=0)
+    approvals_received = models.PositiveSmallIntegerField(default=0)
+    # Set on rows generated from a RecurringEntry; one row per entry and occurrence date
+    recurring_entry = models.ForeignKey(
+        'RecurringEntry', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions'
+    )
+    occurrence_date = models.DateField(null=True, blank=True)
+
+    COUNTER_FIELDS = ('approvals_received',)
 
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['company', 'date']),
+            models.Index(fields=['company', 'status']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_entry', 'occurrence_date'], name='ledger_transaction_unique_occurrence'),
+        ]
 
     def __str__(self) -> str:
         return f"{self.transaction_type} {self.amount} on {self.date} -> {self.account}"
 
     @property
     def all_approved(self):
-        # Only directors need to approve, not company owner
-        directors = Director.objects.filter(company=self.company)
-        if directors.count() <= 1:
-            return True  # No approval needed if only one director
-        approvals = TransactionApproval.objects.filter(transaction=self, approved=True)
-        return approvals.count() == directors.count()
+        # Stored counters, see ledger.approvals; nothing is required with a single director
+        return self.approvals_received >= self.approvals_required
 
 
 class TransactionApproval(models.Model):
@@ -166,10 +227,11 @@ class TransactionApproval(models.Model):
         return f"{self.transaction} - {self.approver.username} ({'Approved' if self.approved else 'Pending'})"
 
 
-class Salary(models.Model):
+class Salary(CounterFieldsMixin, models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='salaries')
     director = models.ForeignKey(Director, on_delete=models.CASCADE, related_name='salaries')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     description = models.CharField(max_length=255, blank=True)
     date = models.DateField()
     account = models.CharField(max_length=10, choices=Transaction.Account.choices)
@@ -180,14 +242,84 @@ class Salary(models.Model):
         ('APPROVED', 'Approved'),
         ('REJECTED', 'Rejected'),
     ])
+    approvals_required = models.PositiveSmallIntegerField(default=0)
+    approvals_received = models.PositiveSmallIntegerField(default=0)
+    recurring_entry = models.ForeignKey(
+        'RecurringEntry', on_delete=models.SET_NULL, null=True, blank=True, related_name='salaries'
+    )
+    occurrence_date = models.DateField(null=True, blank=True)
+
+    COUNTER_FIELDS = ('approvals_received',)
 
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [models.Index(fields=['company', 'status'])]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_entry', 'occurrence_date'], name='ledger_salary_unique_occurrence'),
+        ]
 
     def __str__(self):
         return f"Salary {self.amount} for {self.director.user.username} on {self.date}"
 
 
+class SalaryApproval(models.Model):
+    # One row per director other than the one being paid; nobody approves their own salary
+    salary = models.ForeignKey(Salary, on_delete=models.CASCADE, related_name='approvals')
+    approver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='salary_approvals')
+    approved = models.BooleanField(default=False)
+    approved_at = models.DateTimeField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ['salary', 'approver']
+
+    def __str__(self):
+        return f"{self.salary} - {self.approver.username} ({'Approved' if self.approved else 'Pending'})"
+
+
+class RecurringEntry(models.Model):
+    """A transaction or salary that `manage.py materialize_recurring` books on a schedule"""
+    KIND_CHOICES = [
+        ('TRANSACTION', 'Transaction'),
+        ('SALARY', 'Salary'),
+    ]
+    FREQUENCY_CHOICES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly'),
+        ('YEARLY', 'Yearly'),
+    ]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='recurring_entries')
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TransactionType.choices, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    description = models.CharField(max_length=255, blank=True)
+    account = models.CharField(max_length=10, choices=Transaction.Account.choices)
+    director = models.ForeignKey(Director, on_delete=models.CASCADE, null=True, blank=True, related_name='recurring_salaries')
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='recurring_entries')
+    # Every `interval` days/weeks/months/years from start_date; monthly dates past a
+    # short month's end fall on its last day (Jan 31 -> Feb 28 -> Mar 31)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='MONTHLY')
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    # The next occurrence not booked yet, and how many have been
+    next_date = models.DateField()
+    occurrences = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_entries_created')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_date', 'id']
+        indexes = [models.Index(fields=['active', 'next_date'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.amount} {self.frequency.lower()} - {self.company.name}"
+
+
 class Milestone(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='milestones')
     target_amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
@@ -204,3 +336,285 @@ class Milestone(models.Model):
         return f"{self.label} - {self.company.name}"
 
 
+
+
+class FxRate(models.Model):
+    """Value of one unit of `currency` in `base_currency` on `date`, imported with `manage.py import_fx_rates`.
+
+    A row dated d applies to every day from d until the next imported date.
+    """
+    currency = models.CharField(max_length=3)
+    base_currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8, validators=[MinValueValidator(0)])
+
+    class Meta:
+        ordering = ['currency', 'base_currency', '-date']
+        unique_together = ['currency', 'base_currency', 'date']
+
+    def __str__(self):
+        return f"1 {self.currency} = {self.rate} {self.base_currency} on {self.date}"
+
+
+class ApprovalLatencyBucket(models.Model):
+    """Pre-aggregated time-to-approve histogram, updated by the approve actions.
+
+    One row per company / approver / object type / day / latency bucket, so
+    percentile queries read a handful of counters instead of every approval.
+    """
+    OBJECT_TYPE_CHOICES = [
+        ('PROJECT', 'Project'),
+        ('TRANSACTION', 'Transaction'),
+        ('SALARY', 'Salary'),
+    ]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='approval_latency_buckets')
+    approver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='approval_latency_buckets')
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPE_CHOICES)
+    day = models.DateField()
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['company', 'approver', 'object_type', 'day', 'bucket']
+        indexes = [models.Index(fields=['company', 'day'])]
+
+    def __str__(self):
+        return f"{self.company.name} {self.object_type} {self.day} bucket {self.bucket}: {self.count}"
+
+
+class CompanyCounters(models.Model):
+    """Running business counters per company, maintained by the create/approve/reject
+    paths so metrics never have to aggregate the ledger on scrape."""
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    pending_projects = models.IntegerField(default=0)
+    pending_transactions = models.IntegerField(default=0)
+    pending_salaries = models.IntegerField(default=0)
+    approved_income_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    milestones_achieved = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Company counters'
+
+    def __str__(self):
+        return f"Counters for {self.company.name}"
+
+
+class BalanceSnapshot(models.Model):
+    """Closing position of one company account at a month end.
+
+    Amounts are cumulative from the first approved entry up to and including
+    `month_end`, so a point-in-time balance is the nearest snapshot plus the
+    approved rows dated after it.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='balance_snapshots')
+    account = models.CharField(max_length=10, choices=Transaction.Account.choices)
+    month_end = models.DateField()
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    salary = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['company', 'account', 'month_end']
+        ordering = ['company', 'month_end', 'account']
+
+    def __str__(self):
+        return f"{self.company.name} {self.account} @ {self.month_end}"
+
+    @property
+    def balance(self):
+        return self.income - self.expense - self.salary
+
+
+class ClosedPeriod(models.Model):
+    """Final totals of one account for a closed month.
+
+    The first period a company closes also carries everything dated before it,
+    so the sum of a company's closed periods is its position at books_closed_through.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='closed_periods')
+    month_end = models.DateField()
+    account = models.CharField(max_length=10, choices=Transaction.Account.choices)
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    salary = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='periods_closed')
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['company', 'month_end', 'account']
+        ordering = ['company', 'month_end', 'account']
+
+    def __str__(self):
+        return f"{self.company.name} {self.account} closed {self.month_end}"
+
+
+class OutboxTask(models.Model):
+    """Derived work queued by request handlers and drained by `manage.py run_workers`"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True, related_name='outbox_tasks')
+    payload = models.JSONField(default=dict, blank=True)
+    # At most one PENDING task per key, so repeated enqueues of the same work coalesce
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['status', 'available_at'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status='PENDING'),
+                name='ledger_outbox_pending_dedupe_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of a request sent with an Idempotency-Key header, replayed on retries"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ['user', 'key']
+
+    def __str__(self):
+        return f"{self.key} ({self.method} {self.path})"
+
+
+class Blob(models.Model):
+    """Stored file body, named by the SHA-256 of its bytes and shared by every attachment with that content"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.size} bytes)"
+
+
+class Attachment(models.Model):
+    """Receipt or invoice file attached to a transaction or a salary"""
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='attachments')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, null=True, blank=True, related_name='attachments')
+    salary = models.ForeignKey(Salary, on_delete=models.CASCADE, null=True, blank=True, related_name='attachments')
+    # Orphaned blobs are removed by the purge_blobs task, never by deleting an attachment
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='attachments')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    # Copied from the blob so listings don't join it
+    size = models.PositiveBigIntegerField()
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='attachments_uploaded')
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['uploaded_at', 'id']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(transaction__isnull=False, salary__isnull=True)
+                | models.Q(transaction__isnull=True, salary__isnull=False),
+                name='ledger_attachment_one_parent',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.size} bytes)"
+
+
+class AuditEntry(models.Model):
+    """Append-only record of one create, update or delete of an audited model, see ledger/audit.py"""
+    ACTION_CHOICES = [
+        ('CREATE', 'Create'),
+        ('UPDATE', 'Update'),
+        ('DELETE', 'Delete'),
+    ]
+
+    # Plain ids rather than constraints: entries outlive the rows and users they describe
+    company = models.ForeignKey(
+        Company, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+',
+    )
+    actor = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+',
+    )
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    object_type = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    # {field: [before, after]}
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    path = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # First day of created_at's month; old months are dropped whole with `manage.py prune_audit`
+    month = models.DateField()
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['company', '-id']),
+            models.Index(fields=['object_type', 'object_id', '-id']),
+            models.Index(fields=['actor', '-id']),
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.object_type} #{self.object_id}"
+
+
+class ArchivedRow(models.Model):
+    """A ledger row of an archived company, as serialized by `manage.py archive_company`.
+
+    Lives in the LEDGER_ARCHIVE_DATABASE (see ledger/routers.py), so it has no foreign keys.
+    """
+    company_id = models.BigIntegerField()
+    model = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['model', 'object_id']
+        indexes = [models.Index(fields=['company_id', 'model', 'id'])]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} of company {self.company_id}"
+
+
+class SyncChange(models.Model):
+    """The latest change to a row served by GET /api/sync/, see ledger/sync.py.
+
+    id is the change sequence: a row's entry is replaced, with a new id, every
+    time the row changes, and a deleted row keeps an entry with deleted=True.
+    """
+    company_id = models.BigIntegerField()
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ['model', 'object_id']
+        indexes = [models.Index(fields=['company_id', 'id'])]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} at {self.id}{' (deleted)' if self.deleted else ''}"
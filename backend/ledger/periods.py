@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import audit, sync
+from .metrics import invalidate_company_caches
+from .models import ClosedPeriod, Company, Salary, Transaction
+from .snapshots import ACCOUNTS, last_closed_month_end, month_end, totals_by_account
+
+
+class PeriodLocked(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This date falls in a closed period.'
+    default_code = 'period_locked'
+
+
+def ensure_period_open(company, *dates):
+    """Raise PeriodLocked if any of the dates is on or before the company's closed-through date"""
+    closed_through = company.books_closed_through
+    if closed_through is None:
+        return
+    for day in dates:
+        if day is not None and day <= closed_through:
+            raise PeriodLocked(f'Books are closed through {closed_through.isoformat()}.')
+
+
+def lock_period_open(company, *dates):
+    """ensure_period_open() against the company row as committed now, locked until the transaction ends.
+
+    Call inside transaction.atomic() before writing dated rows, so a
+    close_period() can't commit between the check and the write.
+    """
+    locked = Company.objects.select_for_update().only('books_closed_through').get(pk=company.pk)
+    ensure_period_open(locked, *dates)
+
+
+def close_period(company, month, user):
+    """Close the month containing `month` and store its final totals.
+
+    Months close in order: the next one is always the month after
+    books_closed_through. The first close also folds in everything before it.
+    """
+    period_end = month_end(month)
+    if period_end > last_closed_month_end():
+        raise ValueError('Only months that have already ended can be closed.')
+    if company.books_closed_through:
+        expected = month_end(company.books_closed_through + timedelta(days=1))
+        if period_end != expected:
+            raise ValueError(f'The next month to close is {expected.strftime("%Y-%m")}.')
+
+    # Lock before reading the period, so no create or approval can commit between
+    # the pending check, the totals and the close (on SQLite, BEGIN IMMEDIATE takes the write lock)
+    with transaction.atomic():
+        locked = Company.objects.select_for_update().get(pk=company.pk)
+        if locked.books_closed_through != company.books_closed_through:
+            raise ValueError('The period was closed concurrently, reload and try again.')
+        transactions = Transaction.objects.filter(company=company, date__lte=period_end)
+        salaries = Salary.objects.filter(company=company, date__lte=period_end)
+        if company.books_closed_through:
+            transactions = transactions.filter(date__gt=company.books_closed_through)
+            salaries = salaries.filter(date__gt=company.books_closed_through)
+        pending = transactions.filter(status='PENDING').count() + salaries.filter(status='PENDING').count()
+        if pending:
+            raise ValueError(f'{pending} items in this period are still pending approval.')
+
+        totals = totals_by_account(
+            transactions.filter(status='APPROVED', transaction_type__in=('INCOME', 'EXPENSE')),
+            salaries.filter(status='APPROVED'),
+        )
+        ClosedPeriod.objects.bulk_create([
+            ClosedPeriod(company=company, month_end=period_end, account=account, closed_by=user, **totals[account])
+            for account in ACCOUNTS
+        ])
+        Company.objects.filter(pk=company.pk).update(books_closed_through=period_end)
+        audit.record('UPDATE', company, {'books_closed_through': [company.books_closed_through, period_end]})
+        sync.touch(Company, [(company.pk, company.pk)])
+    company.books_closed_through = period_end
+    invalidate_company_caches(company.pk)
+    return period_end
+
+
+def reopen_period(company):
+    """Reopen the most recently closed month"""
+    if company.books_closed_through is None:
+        raise ValueError('No closed period to reopen.')
+    with transaction.atomic():
+        ClosedPeriod.objects.filter(company=company, month_end=company.books_closed_through).delete()
+        previous = ClosedPeriod.objects.filter(company=company).aggregate(latest=Max('month_end'))['latest']
+        Company.objects.filter(pk=company.pk).update(books_closed_through=previous)
+        audit.record('UPDATE', company, {'books_closed_through': [company.books_closed_through, previous]})
+        sync.touch(Company, [(company.pk, company.pk)])
+    reopened = company.books_closed_through
+    company.books_closed_through = previous
+    # Anything computed from the frozen totals may now be stale
+    invalidate_company_caches(company.pk)
+    return reopened
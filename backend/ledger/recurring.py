@@ -0,0 +1,160 @@
+"""Booking of RecurringEntry schedules as Transaction and Salary rows.
+
+materialize() works through due entries in chunks. For each chunk it creates
+all rows and their approval rows with bulk_create and applies the derived
+bookkeeping in one batch. Each generated row carries (recurring_entry,
+occurrence_date) under a unique constraint, and existing occurrences are
+skipped, so a run that dies half way, or a second run, never books an
+occurrence twice. A foreign-currency entry stops at the first occurrence
+without an imported exchange rate and resumes from there on a later run.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import sync
+from .approvals import APPROVAL_MODELS
+from .bookkeeping import record_changes, snapshot
+from .fx import rate
+from .models import Director, RecurringEntry, Salary, Transaction
+from .tasks import enqueue
+
+
+def _add_months(day, months):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_date(entry, index):
+    """Date of the index-th (0-based) occurrence, always counted from start_date so month ends don't drift"""
+    step = entry.interval * index
+    if entry.frequency == 'DAILY':
+        return entry.start_date + timedelta(days=step)
+    if entry.frequency == 'WEEKLY':
+        return entry.start_date + timedelta(weeks=step)
+    if entry.frequency == 'YEARLY':
+        return _add_months(entry.start_date, 12 * step)
+    return _add_months(entry.start_date, step)
+
+
+def _directors_by_company(company_ids):
+    directors = defaultdict(list)
+    for director_id, company_id, user_id in Director.objects.filter(company_id__in=company_ids).values_list(
+        'id', 'company_id', 'user_id'
+    ):
+        directors[company_id].append((director_id, user_id))
+    return directors
+
+
+def _build_row(entry, day, directors):
+    if entry.kind == 'SALARY':
+        required = len(directors) - 1 if len(directors) > 1 else 0
+        row = Salary(director_id=entry.director_id)
+    else:
+        required = len(directors) if len(directors) > 1 else 0
+        row = Transaction(
+            transaction_type=entry.transaction_type, project_id=entry.project_id,
+            is_project_related=entry.project_id is not None,
+        )
+    row.company_id = entry.company_id
+    row.amount = entry.amount
+    row.currency = entry.currency
+    row.description = entry.description
+    row.account = entry.account
+    row.date = day
+    row.created_by_id = entry.created_by_id
+    row.status = 'PENDING' if required else 'APPROVED'
+    row.approvals_required = required
+    row.recurring_entry_id = entry.id
+    row.occurrence_date = day
+    return row
+
+
+def _existing_occurrences(entries):
+    ids = [entry.id for entry in entries]
+    existing = set()
+    for model in (Transaction, Salary):
+        existing.update(model.objects.filter(recurring_entry_id__in=ids).values_list('recurring_entry_id', 'occurrence_date'))
+    return existing
+
+
+def _materialize_chunk(entries, today, stats):
+    directors = _directors_by_company({entry.company_id for entry in entries})
+    with transaction.atomic():
+        existing = _existing_occurrences(entries)
+        rows = {Transaction: [], Salary: []}
+        for entry in entries:
+            closed_through = entry.company.books_closed_through
+            while entry.active and entry.next_date <= today:
+                day = entry.next_date
+                if closed_through and day <= closed_through:
+                    # Closed periods can't take new rows; the occurrence is dropped, not booked late
+                    stats['skipped_closed'] += 1
+                elif rate(entry.currency, entry.company.base_currency, day) is None:
+                    stats['missing_rate'] += 1
+                    break
+                elif (entry.id, day) in existing:
+                    stats['already_booked'] += 1
+                else:
+                    model = Salary if entry.kind == 'SALARY' else Transaction
+                    rows[model].append(_build_row(entry, day, directors[entry.company_id]))
+                entry.occurrences += 1
+                entry.next_date = occurrence_date(entry, entry.occurrences)
+                if entry.end_date and entry.next_date > entry.end_date:
+                    entry.active = False
+
+        changes = []
+        for model, objs in rows.items():
+            if not objs:
+                continue
+            model.objects.bulk_create(objs, batch_size=500)
+            approval_model, field, _ = APPROVAL_MODELS[model]
+            approval_model.objects.bulk_create([
+                approval_model(**{field: obj, 'approver_id': user_id})
+                for obj in objs if obj.approvals_required
+                for director_id, user_id in directors[obj.company_id]
+                # Nobody approves their own salary
+                if not (model is Salary and director_id == obj.director_id)
+            ], batch_size=500)
+            changes.extend((None, snapshot(obj)) for obj in objs)
+            sync.touch(model, [(obj.company_id, obj.pk) for obj in objs])
+            stats['created'] += len(objs)
+        # Entries on the same schedule end up in the same state: one UPDATE per distinct state
+        by_state = defaultdict(list)
+        for entry in entries:
+            by_state[(entry.next_date, entry.occurrences, entry.active)].append(entry.id)
+        for (next_date, occurrences, active), ids in by_state.items():
+            RecurringEntry.objects.filter(id__in=ids).update(next_date=next_date, occurrences=occurrences, active=active)
+        sync.touch(RecurringEntry, [(entry.company_id, entry.id) for entry in entries])
+        record_changes(changes)
+        income_companies = {
+            obj.company_id for obj in rows[Transaction] if obj.status == 'APPROVED' and obj.transaction_type == 'INCOME'
+        }
+        for company_id in income_companies:
+            enqueue('check_milestones', company_id, dedupe_key=f'check_milestones:{company_id}')
+
+
+def materialize(today=None, chunk_size=500):
+    """Book every occurrence due on or before `today` for all companies. Returns counts."""
+    today = today or timezone.localdate()
+    stats = defaultdict(int)
+    last_id = 0
+    while True:
+        # Keyset pagination over due entries; a chunk's entries are no longer due once it commits.
+        # Deleted and archived companies book nothing; a restored company catches up on its next run.
+        entries = list(
+            RecurringEntry.objects.filter(
+                active=True, next_date__lte=today, id__gt=last_id,
+                company__deleted_at__isnull=True, company__archived_at__isnull=True,
+            ).select_related('company').order_by('id')[:chunk_size]
+        )
+        if not entries:
+            break
+        _materialize_chunk(entries, today, stats)
+        stats['entries'] += len(entries)
+        last_id = entries[-1].id
+    return dict(stats)
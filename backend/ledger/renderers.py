@@ -0,0 +1,37 @@
+"""JSON renderer encoding with orjson when it is installed.
+
+The output matches rest_framework.renderers.JSONRenderer with the default
+COMPACT_JSON, UNICODE_JSON and STRICT_JSON settings: the same separators,
+non-ASCII text left as UTF-8, U+2028/U+2029 escaped, UTC datetimes ending in
+Z, and decimals, lazy strings and other non-JSON types converted by DRF's own
+JSONEncoder.default(). Two differences remain. Floats that need an exponent
+are written 1e-05 by the stdlib and 1e-5 by orjson (the same number). NaN
+and infinity become null instead of raising. Requests for indented JSON,
+changed JSON settings and anything orjson refuses (integers over 64 bits)
+fall back to the stock renderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or not (self.compact and not self.ensure_ascii and self.strict)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer: both are valid JSON but not valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
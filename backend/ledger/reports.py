@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.db.models import Case, F, Sum, Value, When, Window
+from django.db.models.functions import TruncMonth
+
+from .fx import CENT, MONEY, MissingRate, base_amount, to_base
+from .models import Transaction
+
+
+def money(value):
+    return str((value or Decimal('0')).quantize(CENT))
+
+
+def signed_amount():
+    """+amount for income, -amount for expense, in the company's base currency"""
+    return Case(
+        When(transaction_type='INCOME', then=base_amount()),
+        When(transaction_type='EXPENSE', then=-base_amount()),
+        default=Value(0),
+        output_field=MONEY,
+    )
+
+
+def amount_of_type(transaction_type):
+    return Case(When(transaction_type=transaction_type, then=base_amount()), default=Value(0), output_field=MONEY)
+
+
+def project_transactions(project):
+    """Approved transactions of a project in ledger order, each with its running balance.
+
+    The running balance is a window over the whole stream, so it stays correct
+    when the caller slices out a page.
+    """
+    return (
+        Transaction.objects
+        .filter(project=project, status='APPROVED')
+        .annotate(
+            base_amount=base_amount(),
+            running_balance=Window(Sum(signed_amount()), order_by=[F('date').asc(), F('id').asc()]),
+        )
+        .order_by('date', 'id')
+        .values(
+            'id', 'date', 'transaction_type', 'amount', 'currency', 'base_amount', 'description', 'account',
+            'created_by__username', 'running_balance',
+        )
+    )
+
+
+def project_monthly_series(project):
+    """Monthly income, expense and cumulative profit of a project in a single query.
+
+    Window functions instead of GROUP BY: SUM() OVER (PARTITION BY month) gives the
+    month totals, SUM() OVER (ORDER BY month) the cumulative figure (its default
+    RANGE frame includes the whole current month), and DISTINCT folds the rows of
+    each month into one.
+    """
+    month = F('month')
+    rows = (
+        Transaction.objects
+        .filter(project=project, status='APPROVED')
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(
+            income=Window(Sum(amount_of_type('INCOME')), partition_by=[month]),
+            expense=Window(Sum(amount_of_type('EXPENSE')), partition_by=[month]),
+            cumulative=Window(Sum(signed_amount()), order_by=month.asc()),
+        )
+        .distinct()
+        .order_by('month')
+    )
+    return [
+        {
+            'month': row['month'].strftime('%Y-%m'),
+            'income': money(row['income']),
+            'expense': money(row['expense']),
+            'net': money((row['income'] or 0) - (row['expense'] or 0)),
+            'cumulative': money(row['cumulative']),
+        }
+        for row in rows
+    ]
+
+
+def project_completion(project):
+    """Approved project income as a percentage of the contracted project value"""
+    if not project.project_value:
+        return None
+    try:
+        project_value = to_base(project, 'project_value', 'start_date')
+    except MissingRate:
+        return None
+    return round(float(project.income_total) / float(project_value) * 100, 2)
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+
+class ArchiveRouter:
+    """Puts ArchivedRow in LEDGER_ARCHIVE_DATABASE, and nothing else there.
+
+    With the default setting ('default') this routes nothing anywhere special.
+    """
+
+    def _archive_db(self):
+        return getattr(settings, 'LEDGER_ARCHIVE_DATABASE', 'default')
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label == 'ledger.ArchivedRow':
+            return self._archive_db()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive_db = self._archive_db()
+        if app_label == 'ledger' and model_name == 'archivedrow':
+            return db == archive_db
+        if db == archive_db and archive_db != 'default':
+            return False
+        return None
@@ -0,0 +1,132 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Project, Transaction
+
+
+# Full-text indexes are created by migration 0008 and kept in sync by the database
+# itself: FTS5 tables + triggers on SQLite, expression GIN indexes on Postgres. Table
+# rebuilds in later migrations drop SQLite's triggers; restore_triggers() runs after migrate.
+FTS_TABLE = 'ledger_transaction_fts'
+TRIGRAM_TABLE = 'ledger_transaction_trigram'
+TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts_tables = None
+
+
+def _sqlite_fts_ready():
+    # FTS5 is optional in SQLite builds; the migration skips the tables when it's missing
+    global _fts_tables
+    if _fts_tables is None:
+        _fts_tables = {FTS_TABLE, TRIGRAM_TABLE} <= set(connection.introspection.table_names())
+    return _fts_tables
+
+
+def _trigger_statements(table):
+    # The triggers of migration 0008
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON ledger_transaction BEGIN "
+        f"INSERT INTO {table}(rowid, description) VALUES (new.id, new.description); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON ledger_transaction BEGIN "
+        f"INSERT INTO {table}({table}, rowid, description) VALUES ('delete', old.id, old.description); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF description ON ledger_transaction BEGIN "
+        f"INSERT INTO {table}({table}, rowid, description) VALUES ('delete', old.id, old.description); "
+        f"INSERT INTO {table}(rowid, description) VALUES (new.id, new.description); END",
+    ]
+
+
+def restore_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate handler: put back the FTS5 triggers and re-index if any are missing.
+
+    SQLite drops a table's triggers when Django rebuilds it to alter a column,
+    as 0013_approval_counters and most column changes do to ledger_transaction.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    tables = set(db.introspection.table_names())
+    with db.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'ledger_transaction'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table in (FTS_TABLE, TRIGRAM_TABLE):
+            if table not in tables or all(f'{table}_{suffix}' in existing for suffix in TRIGGER_SUFFIXES):
+                continue
+            for statement in _trigger_statements(table):
+                cursor.execute(statement)
+            # Rows written while the triggers were gone are missing from the index
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def _fts5_prefix_query(tokens):
+    # Quote every token so user input can't inject FTS5 syntax; '*' makes it a prefix match
+    return ' '.join('"{}"*'.format(token.replace('"', '')) for token in tokens)
+
+
+def _trigrams(tokens):
+    grams = set()
+    for token in tokens:
+        token = token.lower()
+        grams.update(token[i:i + 3] for i in range(len(token) - 2))
+    return sorted(grams)
+
+
+def _fulltext_condition(tokens):
+    if connection.vendor == 'sqlite' and _sqlite_fts_ready():
+        return Q(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts5_prefix_query(tokens)],
+        ))
+    if connection.vendor == 'postgresql':
+        return Q(RawSQL(
+            "to_tsvector('english', \"ledger_transaction\".\"description\") @@ plainto_tsquery('english', %s)",
+            [' '.join(tokens)], output_field=BooleanField(),
+        ))
+    return Q(*[Q(description__icontains=token) for token in tokens])
+
+
+def _fuzzy_condition(qs, text, tokens):
+    """Trigram matching, so typos like "invoise" still find "invoice" """
+    if connection.vendor == 'sqlite' and _sqlite_fts_ready():
+        grams = _trigrams(tokens)
+        if not grams:
+            return None
+        # Any shared trigram matches; bm25 ranking keeps the closest 200 of the rows in qs,
+        # so other companies' better matches can't use up the limit
+        query = ' OR '.join('"{}"'.format(gram.replace('"', '')) for gram in grams)
+        scope, scope_params = qs.order_by().values('id').query.sql_with_params()
+        return Q(id__in=RawSQL(
+            f'SELECT rowid FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH %s AND rowid IN ({scope}) '
+            f'ORDER BY rank LIMIT 200',
+            [query, *scope_params],
+        ))
+    if connection.vendor == 'postgresql':
+        # <% is word_similarity above pg_trgm.word_similarity_threshold, served by the gin_trgm_ops index
+        return Q(RawSQL('%s <%% "ledger_transaction"."description"', [text], output_field=BooleanField()))
+    return None
+
+
+def search_transactions(qs, text):
+    """Filter a transaction queryset by free text over description and project name.
+
+    Tries an exact full-text match first and falls back to trigram similarity
+    when that finds nothing.
+    """
+    tokens = TOKEN_RE.findall(text)
+    if not tokens:
+        return qs
+    # Both OR branches are "id IN (...)" so SQLite answers them with a multi-index OR
+    # on the primary key instead of scanning every transaction of the company
+    project_match = Q(id__in=Transaction.objects.filter(
+        project__in=Project.objects.filter(name__icontains=text.strip())
+    ).values('id'))
+    matches = qs.filter(_fulltext_condition(tokens) | project_match)
+    if matches.exists():
+        return matches
+    fuzzy = _fuzzy_condition(qs, text, tokens)
+    if fuzzy is None:
+        return matches
+    return qs.filter(fuzzy | project_match)
@@ -2,8 +2,50 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import (
     User, Company, Director, Project, ProjectApproval,
-    Transaction, TransactionApproval, Salary, Milestone
+    Transaction, TransactionApproval, Salary, SalaryApproval, Milestone, RecurringEntry, Attachment, AuditEntry
 )
+from . import fx
+from .fx import base_amount
+
+
+def validate_currency(serializer, attrs, date_field='date'):
+    """Default a new row's currency to its company's base currency and require
+    an exchange rate for a foreign one on or before the row's date"""
+    instance = serializer.instance
+    company = attrs.get('company', getattr(instance, 'company', None))
+    if company is None:
+        return attrs
+    currency = attrs.get('currency', getattr(instance, 'currency', None))
+    if 'currency' not in serializer.initial_data and instance is None:
+        currency = company.base_currency
+    currency = currency.upper()
+    day = attrs.get(date_field, getattr(instance, date_field, None))
+    if day is not None and fx.rate(currency, company.base_currency, day) is None:
+        raise serializers.ValidationError({
+            'currency': f'No {currency}/{company.base_currency} exchange rate on or before {day.isoformat()}'
+        })
+    attrs['currency'] = currency
+    return attrs
+
+
+class BaseAmountField(serializers.DecimalField):
+    """The row's amount in its company's base currency, None while no rate is imported.
+
+    Rendered as a decimal string like `amount`; converted amounts can outgrow
+    the 12 digits of the amount columns, so the digits aren't capped.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(max_digits=None, decimal_places=2, source='*', read_only=True, **kwargs)
+
+    def to_representation(self, obj):
+        try:
+            return self.format(fx.to_base(obj))
+        except fx.MissingRate:
+            return None
+
+    def format(self, value):
+        return None if value is None else super().to_representation(value)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -83,12 +125,18 @@ class CompanySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Company
-        fields = ['id', 'name', 'created_by', 'created_by_name', 'created_at', 'incorporation_date', 'partner1_name', 'partner2_name', 'directors_count']
-        read_only_fields = ['created_by', 'created_at']
+        fields = ['id', 'name', 'created_by', 'created_by_name', 'created_at', 'incorporation_date', 'partner1_name', 'partner2_name', 'directors_count', 'books_closed_through', 'base_currency']
+        read_only_fields = ['created_by', 'created_at', 'books_closed_through']
 
     def get_directors_count(self, obj):
         return obj.directors.count()
 
+    def validate_base_currency(self, value):
+        # Stored rollups, counters and snapshots are all in the base currency
+        if self.instance is not None and value.upper() != self.instance.base_currency:
+            raise serializers.ValidationError('The base currency of an existing company cannot change')
+        return value.upper()
+
     def to_internal_value(self, data):
         # Handle empty string for incorporation_date before validation
         if 'incorporation_date' in data and (data['incorporation_date'] == '' or data['incorporation_date'] is None):
@@ -128,28 +176,34 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = Project
         fields = [
             'id', 'company', 'company_name', 'name', 'start_date', 'end_date',
-            'project_value', 'received_amount', 'status', 'created_by', 'created_by_name',
-            'created_at', 'updated_at', 'approvals', 'all_approved', 'pending_count', 'profit'
+            'project_value', 'received_amount', 'currency', 'status', 'created_by', 'created_by_name',
+            'created_at', 'updated_at', 'approvals', 'all_approved', 'pending_count',
+            'income_total', 'expense_total', 'profit'
+        ]
+        read_only_fields = [
+            'created_by', 'created_at', 'updated_at', 'all_approved', 'income_total', 'expense_total'
         ]
-        read_only_fields = ['created_by', 'created_at', 'updated_at', 'all_approved']
 
     def get_pending_count(self, obj):
-        return obj.pending_approvals.count()
+        # Iterate the (usually prefetched) approvals instead of issuing a COUNT per project
+        return sum(1 for approval in obj.approvals.all() if not approval.approved)
 
     def get_profit(self, obj):
-        from django.db.models import Sum
-        from .models import Transaction
-        income = Transaction.objects.filter(
-            project=obj,
-            transaction_type='INCOME',
-            status='APPROVED'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        expense = Transaction.objects.filter(
-            project=obj,
-            transaction_type='EXPENSE',
-            status='APPROVED'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        return float(income) - float(expense)
+        # Denormalized rollup of approved project transactions, see bookkeeping.update_project_totals
+        return float(obj.profit)
+
+    def validate(self, attrs):
+        return validate_currency(self, attrs, date_field='start_date')
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    # Metadata only; the bytes are at /api/attachments/{id}/download/
+    sha256 = serializers.CharField(source='blob_id', read_only=True)
+
+    class Meta:
+        model = Attachment
+        fields = ['id', 'transaction', 'salary', 'filename', 'content_type', 'size', 'sha256', 'uploaded_by', 'uploaded_at']
+        read_only_fields = fields
 
 
 class TransactionApprovalSerializer(serializers.ModelSerializer):
@@ -166,38 +220,100 @@ class TransactionSerializer(serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
     project_name = serializers.CharField(source='project.name', read_only=True)
     approvals = TransactionApprovalSerializer(many=True, read_only=True)
+    attachments = AttachmentSerializer(many=True, read_only=True)
     all_approved = serializers.BooleanField(read_only=True)
     pending_count = serializers.SerializerMethodField()
+    base_amount = BaseAmountField()
 
     class Meta:
         model = Transaction
         fields = [
-            'id', 'company', 'company_name', 'transaction_type', 'amount', 'description',
+            'id', 'company', 'company_name', 'transaction_type', 'amount', 'currency', 'base_amount', 'description',
             'date', 'account', 'project', 'project_name', 'is_project_related',
             'created_by', 'created_by_name', 'created_at', 'status', 'approvals',
-            'all_approved', 'pending_count'
+            'all_approved', 'pending_count', 'attachments'
         ]
         read_only_fields = ['created_by', 'created_at', 'status', 'all_approved']
 
     def get_pending_count(self, obj):
-        members = obj.company.get_all_members()
-        approvals = TransactionApproval.objects.filter(transaction=obj, approved=True)
-        return len(members) - approvals.count()
+        # Stored counters, see ledger.approvals
+        return max(obj.approvals_required - obj.approvals_received, 0)
+
+    def validate(self, attrs):
+        return validate_currency(self, attrs)
+
+
+class SalaryApprovalSerializer(serializers.ModelSerializer):
+    approver_name = serializers.CharField(source='approver.username', read_only=True)
+
+    class Meta:
+        model = SalaryApproval
+        fields = ['id', 'salary', 'approver', 'approver_name', 'approved', 'approved_at', 'notes']
+        read_only_fields = ['approved_at']
 
 
 class SalarySerializer(serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
     director_name = serializers.CharField(source='director.user.username', read_only=True)
     company_name = serializers.CharField(source='company.name', read_only=True)
+    approvals = SalaryApprovalSerializer(many=True, read_only=True)
+    attachments = AttachmentSerializer(many=True, read_only=True)
+    pending_count = serializers.SerializerMethodField()
+    base_amount = BaseAmountField()
 
     class Meta:
         model = Salary
         fields = [
             'id', 'company', 'company_name', 'director', 'director_name',
-            'amount', 'description', 'date', 'account', 'created_by', 'created_by_name',
-            'created_at', 'status'
+            'amount', 'currency', 'base_amount', 'description', 'date', 'account', 'created_by', 'created_by_name',
+            'created_at', 'status', 'approvals', 'approvals_required', 'approvals_received', 'pending_count',
+            'attachments'
         ]
-        read_only_fields = ['created_by', 'created_at', 'status']
+        read_only_fields = ['created_by', 'created_at', 'status', 'approvals_required', 'approvals_received']
+
+    def get_pending_count(self, obj):
+        return max(obj.approvals_required - obj.approvals_received, 0)
+
+    def validate(self, attrs):
+        return validate_currency(self, attrs)
+
+
+class RecurringEntrySerializer(serializers.ModelSerializer):
+    company_name = serializers.CharField(source='company.name', read_only=True)
+    director_name = serializers.CharField(source='director.user.username', read_only=True)
+
+    SCHEDULE_FIELDS = ('kind', 'frequency', 'interval', 'start_date')
+
+    class Meta:
+        model = RecurringEntry
+        fields = [
+            'id', 'company', 'company_name', 'kind', 'transaction_type', 'amount', 'currency', 'description', 'account',
+            'director', 'director_name', 'project', 'frequency', 'interval', 'start_date', 'end_date',
+            'next_date', 'occurrences', 'active', 'created_by', 'created_at'
+        ]
+        read_only_fields = ['next_date', 'occurrences', 'created_by', 'created_at']
+
+    def validate(self, attrs):
+        instance = self.instance
+        value = lambda field: attrs.get(field, getattr(instance, field, None))
+        company = value('company')
+        if value('kind') == 'SALARY':
+            director = value('director')
+            if director is None or director.company_id != company.id:
+                raise serializers.ValidationError({'director': 'Salaries need a director of this company'})
+        elif value('transaction_type') not in ('INCOME', 'EXPENSE'):
+            raise serializers.ValidationError({'transaction_type': 'Must be INCOME or EXPENSE'})
+        project = value('project')
+        if project is not None and project.company_id != company.id:
+            raise serializers.ValidationError({'project': 'Project belongs to another company'})
+        if value('end_date') and value('end_date') < value('start_date'):
+            raise serializers.ValidationError({'end_date': 'Must not be before start_date'})
+        if instance and instance.occurrences and any(
+            field in attrs and attrs[field] != getattr(instance, field) for field in self.SCHEDULE_FIELDS + ('company',)
+        ):
+            raise serializers.ValidationError('The schedule of an entry that has booked rows is fixed; create a new entry')
+        # Rates for later occurrences may not be imported yet; materialize waits for them
+        return validate_currency(self, attrs, date_field='start_date')
 
 
 class MilestoneSerializer(serializers.ModelSerializer):
@@ -218,11 +334,14 @@ class MilestoneSerializer(serializers.ModelSerializer):
     def get_progress(self, obj):
         from django.db.models import Sum
         from .models import Transaction
-        total_income = Transaction.objects.filter(
-            company=obj.company,
-            transaction_type='INCOME',
-            status='APPROVED'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+        # Callers that have already totalled the company's approved income pass it in the context
+        total_income = self.context.get('approved_income')
+        if total_income is None:
+            total_income = Transaction.objects.filter(
+                company=obj.company,
+                transaction_type='INCOME',
+                status='APPROVED'
+            ).aggregate(total=Sum(base_amount()))['total'] or 0
         if obj.target_amount > 0:
             return min(100, (float(total_income) / float(obj.target_amount)) * 100)
         return 0
@@ -243,3 +362,12 @@ class MilestoneSerializer(serializers.ModelSerializer):
                 delta = obj.achieved_at - first_income.date
                 return delta.days
         return None
+
+
+class AuditEntrySerializer(serializers.ModelSerializer):
+    actor_name = serializers.CharField(source='actor.username', read_only=True, allow_null=True)
+
+    class Meta:
+        model = AuditEntry
+        fields = ['id', 'company', 'actor', 'actor_name', 'action', 'object_type', 'object_id', 'changes', 'path', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,245 @@
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .fx import base_amount
+from .models import BalanceSnapshot, ClosedPeriod, Salary, Transaction
+
+
+ACCOUNTS = [code for code, _ in Transaction.Account.choices]
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def last_closed_month_end(today=None):
+    """Month end of the most recent fully elapsed month"""
+    today = today or timezone.localdate()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+def _empty_totals():
+    return {'income': ZERO, 'expense': ZERO, 'salary': ZERO}
+
+
+def _approved(company_id):
+    transactions = Transaction.objects.filter(
+        company_id=company_id, status='APPROVED', transaction_type__in=('INCOME', 'EXPENSE'),
+    )
+    salaries = Salary.objects.filter(company_id=company_id, status='APPROVED')
+    return transactions, salaries
+
+
+def totals_by_account(transactions, salaries):
+    totals = defaultdict(_empty_totals)
+    rows = transactions.values('account').annotate(
+        income=Sum(base_amount(), filter=Q(transaction_type='INCOME')),
+        expense=Sum(base_amount(), filter=Q(transaction_type='EXPENSE')),
+    ).order_by()
+    for row in rows:
+        totals[row['account']]['income'] += row['income'] or ZERO
+        totals[row['account']]['expense'] += row['expense'] or ZERO
+    for row in salaries.values('account').annotate(salary=Sum(base_amount())).order_by():
+        totals[row['account']]['salary'] += row['salary'] or ZERO
+    return totals
+
+
+def account_totals(company_id, as_of=None):
+    """Cumulative approved income, expense and salary per account.
+
+    Starts from the latest pre-computed position on or before `as_of` (a month-end
+    snapshot or the sum of the closed periods, whichever is newer) and only
+    aggregates the approved rows dated after it, so the cost depends on the days
+    since that point rather than the whole history. Without `as_of` every
+    approved row counts, including future-dated ones.
+    """
+    snapshots = BalanceSnapshot.objects.filter(company_id=company_id)
+    closed = ClosedPeriod.objects.filter(company_id=company_id)
+    if as_of:
+        snapshots = snapshots.filter(month_end__lte=as_of)
+        closed = closed.filter(month_end__lte=as_of)
+    # The build command writes every account for every month, so the newest
+    # len(ACCOUNTS) rows are one complete month
+    latest_rows = list(snapshots.order_by('-month_end')[:len(ACCOUNTS)])
+    base_date = latest_rows[0].month_end if latest_rows else None
+    base = {row.account: row for row in latest_rows if row.month_end == base_date}
+
+    # Closed periods are per-month totals; their sum is the position at the last one
+    closed_rows = list(closed.values('account').annotate(
+        income=Sum('income'), expense=Sum('expense'), salary=Sum('salary'), through=Max('month_end'),
+    ).order_by())
+    closed_through = max((row['through'] for row in closed_rows), default=None)
+    if closed_through and (base_date is None or closed_through > base_date):
+        base_date = closed_through
+        base = {row['account']: row for row in closed_rows}
+
+    transactions, salaries = _approved(company_id)
+    if base_date:
+        transactions = transactions.filter(date__gt=base_date)
+        salaries = salaries.filter(date__gt=base_date)
+    if as_of:
+        transactions = transactions.filter(date__lte=as_of)
+        salaries = salaries.filter(date__lte=as_of)
+
+    totals = totals_by_account(transactions, salaries)
+    for account, row in base.items():
+        for field in ('income', 'expense', 'salary'):
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            totals[account][field] += value or ZERO
+    return {
+        account: {field: amount.quantize(CENT) for field, amount in totals[account].items()}
+        for account in ACCOUNTS
+    }, base_date
+
+
+def account_totals_many(company_ids):
+    """account_totals() of several companies, without as_of, in a fixed number of queries.
+
+    The base positions come from one query for the newest snapshot month of
+    each company, one for those snapshot rows and one for the closed periods.
+    The rows after them are summed by two GROUP BY company_id, account queries,
+    one per table, whose filter combines the companies that share a base date
+    (usually all of them, as snapshots are built for every company at once).
+    Returns {company_id: {account: {income, expense, salary}}}.
+    """
+    company_ids = list(company_ids)
+    latest = dict(
+        BalanceSnapshot.objects.filter(company_id__in=company_ids)
+        .values('company_id').annotate(latest=Max('month_end')).values_list('company_id', 'latest').order_by()
+    )
+    base_dates = dict(latest)
+    base = defaultdict(lambda: defaultdict(_empty_totals))
+    by_date = defaultdict(list)
+    for company_id, day in latest.items():
+        by_date[day].append(company_id)
+    if by_date:
+        newest = Q()
+        for day, ids in by_date.items():
+            newest |= Q(company_id__in=ids, month_end=day)
+        for row in BalanceSnapshot.objects.filter(newest):
+            base[row.company_id][row.account] = {field: getattr(row, field) for field in ('income', 'expense', 'salary')}
+
+    closed = defaultdict(dict)
+    for row in ClosedPeriod.objects.filter(company_id__in=company_ids).values('company_id', 'account').annotate(
+        income=Sum('income'), expense=Sum('expense'), salary=Sum('salary'), through=Max('month_end'),
+    ).order_by():
+        closed[row['company_id']][row['account']] = row
+    for company_id, rows in closed.items():
+        closed_through = max(row['through'] for row in rows.values())
+        if company_id not in base_dates or closed_through > base_dates[company_id]:
+            base_dates[company_id] = closed_through
+            base[company_id] = defaultdict(_empty_totals, {
+                account: {field: row[field] for field in ('income', 'expense', 'salary')} for account, row in rows.items()
+            })
+
+    after_base = Q(company_id__in=[company_id for company_id in company_ids if company_id not in base_dates])
+    grouped = defaultdict(list)
+    for company_id, day in base_dates.items():
+        grouped[day].append(company_id)
+    for day, ids in grouped.items():
+        after_base |= Q(company_id__in=ids, date__gt=day)
+
+    totals = {company_id: defaultdict(_empty_totals) for company_id in company_ids}
+    rows = Transaction.objects.filter(
+        after_base, status='APPROVED', transaction_type__in=('INCOME', 'EXPENSE'),
+    ).values('company_id', 'account').annotate(
+        income=Sum(base_amount(), filter=Q(transaction_type='INCOME')),
+        expense=Sum(base_amount(), filter=Q(transaction_type='EXPENSE')),
+    ).order_by()
+    for row in rows:
+        totals[row['company_id']][row['account']]['income'] += row['income'] or ZERO
+        totals[row['company_id']][row['account']]['expense'] += row['expense'] or ZERO
+    rows = Salary.objects.filter(after_base, status='APPROVED').values('company_id', 'account').annotate(
+        salary=Sum(base_amount()),
+    ).order_by()
+    for row in rows:
+        totals[row['company_id']][row['account']]['salary'] += row['salary'] or ZERO
+
+    for company_id, accounts in base.items():
+        for account, row in accounts.items():
+            for field in ('income', 'expense', 'salary'):
+                totals[company_id][account][field] += row[field] or ZERO
+    return {
+        company_id: {
+            account: {field: amount.quantize(CENT) for field, amount in accounts[account].items()}
+            for account in ACCOUNTS
+        }
+        for company_id, accounts in totals.items()
+    }
+
+
+def build_snapshots(company_id, through=None):
+    """(Re)write the month-end snapshots of a company up to `through`"""
+    through = month_end(through) if through else last_closed_month_end()
+    transactions, salaries = _approved(company_id)
+    transactions = transactions.filter(date__lte=through)
+    salaries = salaries.filter(date__lte=through)
+
+    monthly = defaultdict(lambda: defaultdict(_empty_totals))
+    rows = transactions.annotate(month=TruncMonth('date')).values('month', 'account').annotate(
+        income=Sum(base_amount(), filter=Q(transaction_type='INCOME')),
+        expense=Sum(base_amount(), filter=Q(transaction_type='EXPENSE')),
+    ).order_by()
+    for row in rows:
+        monthly[row['month']][row['account']]['income'] += row['income'] or ZERO
+        monthly[row['month']][row['account']]['expense'] += row['expense'] or ZERO
+    rows = salaries.annotate(month=TruncMonth('date')).values('month', 'account').annotate(
+        salary=Sum(base_amount()),
+    ).order_by()
+    for row in rows:
+        monthly[row['month']][row['account']]['salary'] += row['salary'] or ZERO
+
+    snapshots = []
+    if monthly:
+        cumulative = defaultdict(_empty_totals)
+        month = min(monthly)
+        while month <= through:
+            for account in ACCOUNTS:
+                for field, amount in monthly.get(month, {}).get(account, {}).items():
+                    cumulative[account][field] += amount
+                snapshots.append(BalanceSnapshot(
+                    company_id=company_id, account=account, month_end=month_end(month), **cumulative[account]
+                ))
+            month = month_end(month) + timedelta(days=1)
+
+    with transaction.atomic():
+        BalanceSnapshot.objects.filter(company_id=company_id).delete()
+        BalanceSnapshot.objects.bulk_create(snapshots, batch_size=500)
+    return len(snapshots)
+
+
+def _snapshot_contribution(snap):
+    """(account, date, field, amount) an approved row adds to the snapshots"""
+    if snap is None or snap['status'] != 'APPROVED' or snap['date'] is None:
+        return None
+    if snap['model'] == 'Transaction' and snap['transaction_type'] in ('INCOME', 'EXPENSE'):
+        return snap['account'], snap['date'], snap['transaction_type'].lower(), snap['amount'] or ZERO
+    if snap['model'] == 'Salary':
+        return snap['account'], snap['date'], 'salary', snap['amount'] or ZERO
+    return None
+
+
+def update_balance_snapshots(changes):
+    """Carry (possibly back-dated) (before, after) changes into every snapshot at or after their month"""
+    deltas = defaultdict(lambda: defaultdict(lambda: ZERO))
+    for before, after in changes:
+        for snap, sign in ((after, 1), (before, -1)):
+            contribution = _snapshot_contribution(snap)
+            if contribution:
+                account, day, field, amount = contribution
+                deltas[(snap['company_id'], account, month_end(day))][field] += sign * amount
+    for (company_id, account, first_month_end), fields in deltas.items():
+        fields = {field: amount for field, amount in fields.items() if amount}
+        if fields:
+            BalanceSnapshot.objects.filter(
+                company_id=company_id, account=account, month_end__gte=first_month_end,
+            ).update(**{field: F(field) + amount for field, amount in fields.items()})
@@ -0,0 +1,127 @@
+"""Change sequence behind the delta-sync feed (GET /api/sync/).
+
+Every row a client replicates has one SyncChange entry. Each time the row is
+saved or deleted, its entry is replaced by a new one, so its id (the change
+sequence) only grows. A deleted row keeps an entry with deleted=True (a
+tombstone). "What changed since cursor N" is then a range scan of the
+(company_id, id) index: its cost follows the number of changed rows, not the
+size of the ledger.
+
+Approvals and attachments are served nested in their transaction, salary or
+project, so a change to one of them re-sends its parent. Saves and deletes
+through the ORM are picked up by signals, as in ledger/audit.py. Code that
+writes with QuerySet.update() or bulk_create() (rollups, recurring batches,
+period close) calls touch() itself. The names of related rows shown in a row
+(company_name, project_name, ...) are as of that row's last change; clients
+should take them from the companies and projects they replicate.
+
+The entries are written in the same database transaction as the change. On
+SQLite writers are serialized, so ids commit in increasing order and a
+client that has seen id N can never miss a later commit with a smaller id.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from .models import (
+    Attachment, Company, Director, Milestone, Project, ProjectApproval, RecurringEntry, Salary, SalaryApproval,
+    SyncChange, Transaction, TransactionApproval,
+)
+
+
+# model -> attribute holding the company id
+SYNCED = {
+    Company: 'id',
+    Director: 'company_id',
+    Project: 'company_id',
+    Transaction: 'company_id',
+    Salary: 'company_id',
+    Milestone: 'company_id',
+    RecurringEntry: 'company_id',
+}
+
+# model -> foreign keys to the synced rows it is nested in
+NESTED = {
+    ProjectApproval: ('project',),
+    TransactionApproval: ('transaction',),
+    SalaryApproval: ('salary',),
+    Attachment: ('transaction', 'salary'),
+}
+
+_paused = ContextVar('sync_paused', default=False)
+
+
+def touch(model, rows, deleted=False):
+    """Give rows of `model` a new change sequence; rows are (company_id, object_id) pairs"""
+    rows = dict((object_id, company_id) for company_id, object_id in rows)
+    if not rows or _paused.get():
+        return
+    name = model._meta.model_name
+    SyncChange.objects.filter(model=name, object_id__in=list(rows)).delete()
+    SyncChange.objects.bulk_create([
+        SyncChange(company_id=company_id, model=name, object_id=object_id, deleted=deleted)
+        for object_id, company_id in rows.items()
+    ])
+
+
+def _parents(instance):
+    for field in NESTED[type(instance)]:
+        parent_id = getattr(instance, f'{field}_id')
+        if parent_id is None:
+            continue
+        company_id = getattr(instance, 'company_id', None)
+        if company_id is None:
+            company_id = getattr(instance, field).company_id
+        yield type(instance)._meta.get_field(field).related_model, company_id, parent_id
+
+
+def _saved(sender, instance, raw=False, **kwargs):
+    if raw or _paused.get():
+        return
+    if sender in SYNCED:
+        touch(sender, [(getattr(instance, SYNCED[sender]), instance.pk)])
+    else:
+        for model, company_id, parent_id in _parents(instance):
+            touch(model, [(company_id, parent_id)])
+
+
+def _deleted(sender, instance, origin=None, **kwargs):
+    if _paused.get():
+        return
+    if sender in SYNCED:
+        touch(sender, [(getattr(instance, SYNCED[sender]), instance.pk)], deleted=True)
+    elif origin is None or origin is instance:
+        # Nested rows removed along with their parent are covered by the parent's tombstone
+        for model, company_id, parent_id in _parents(instance):
+            touch(model, [(company_id, parent_id)])
+
+
+def _project_deleting(sender, instance, origin=None, **kwargs):
+    # Deleting a project nulls the project of its transactions and recurring entries without saving them
+    if _paused.get():
+        return
+    for model in (Transaction, RecurringEntry):
+        touch(model, model.objects.filter(project_id=instance.pk).values_list('company_id', 'id'))
+
+
+def connect():
+    pre_delete.connect(_project_deleting, sender=Project, dispatch_uid='sync-project-deleting')
+    for model in (*SYNCED, *NESTED):
+        post_save.connect(_saved, sender=model, dispatch_uid=f'sync-save-{model.__name__}')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'sync-delete-{model.__name__}')
+
+
+@contextmanager
+def paused():
+    """Record nothing, e.g. while a whole company is purged or archived"""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def changes_since(company_id, since, limit):
+    """The company's entries after `since`, oldest first, at most `limit`"""
+    return list(SyncChange.objects.filter(company_id=company_id, id__gt=since).order_by('id')[:limit])
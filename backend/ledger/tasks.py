@@ -0,0 +1,216 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import purge_company
+from .attachments import purge_blobs
+from .metrics import record_approval_latency
+from .milestones import check_and_update_milestones
+from .models import Company, OutboxTask, Transaction
+
+
+logger = logging.getLogger('ledger')
+
+HANDLERS = {}
+# Kinds whose handlers commit in chunks of their own, so they don't share the task's transaction
+CHUNKED = set()
+
+# A RUNNING task whose worker died is handed out again after this long
+LEASE = timedelta(minutes=5)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def task(kind, chunked=False):
+    """Register a handler for an outbox task kind.
+
+    Handlers receive (company_id, payload). They run in one transaction with
+    the task's move to DONE, so their writes count exactly once even if the
+    worker dies or the lease runs out. chunked=True handlers commit as they
+    go instead and must be idempotent: a task is retried after any
+    exception, and may run again if its worker dies mid-way.
+    """
+    def register(func):
+        HANDLERS[kind] = func
+        if chunked:
+            CHUNKED.add(kind)
+        return func
+    return register
+
+
+def enqueue(kind, company_id=None, payload=None, dedupe_key=None, delay=None):
+    """Queue derived work, to run no earlier than `delay` (a timedelta) from now.
+    With a dedupe_key, an identical task that is still pending absorbs this one
+    instead of queueing a duplicate."""
+    try:
+        with transaction.atomic():
+            task = OutboxTask.objects.create(
+                kind=kind, company_id=company_id, payload=payload or {}, dedupe_key=dedupe_key,
+                available_at=timezone.now() + (delay or timedelta()),
+            )
+    except IntegrityError:
+        return None
+    if getattr(settings, 'LEDGER_TASKS_EAGER', False) and not delay:
+        # Development/test mode: run right after the surrounding transaction commits
+        transaction.on_commit(lambda: _claim(task) and run_task(task))
+    return task
+
+
+def enqueue_approval_latency(obj, approver, object_type, approved_at):
+    enqueue('record_approval_latency', obj.company_id, {
+        'approver_id': approver.id,
+        'object_type': object_type,
+        'created_at': obj.created_at.isoformat(),
+        'approved_at': approved_at.isoformat(),
+    })
+
+
+def run_task(task):
+    """Execute one claimed task, recording success or scheduling a retry. Returns True on success."""
+    handler = HANDLERS.get(task.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for task kind {task.kind!r}')
+        if task.kind in CHUNKED:
+            handler(task.company_id, task.payload)
+            _finish(task)
+        else:
+            with transaction.atomic():
+                handler(task.company_id, task.payload)
+                _finish(task)
+    except LeaseLost:
+        # Another worker holds the task now; it commits or retries it
+        logger.warning(f'Task {task.kind} #{task.id} lost its lease while running')
+        return False
+    except Exception as e:
+        attempts = task.attempts + 1
+        failed = attempts >= task.max_attempts
+        logger.error(f'Task {task.kind} #{task.id} failed (attempt {attempts}): {e}', exc_info=True)
+        OutboxTask.objects.filter(pk=task.pk).update(
+            status='FAILED' if failed else 'PENDING',
+            attempts=attempts,
+            last_error=str(e),
+            # Exponential backoff: 2s, 4s, 8s, ...
+            available_at=timezone.now() + timedelta(seconds=2 ** attempts),
+            locked_at=None,
+            # A failed task no longer holds the dedupe slot
+            dedupe_key=None if failed else task.dedupe_key,
+        )
+        return False
+    return True
+
+
+def _finish(task):
+    # Only while this worker's claim stands; after a lease expiry the handler's writes roll back
+    finished = OutboxTask.objects.filter(pk=task.pk, status='RUNNING', locked_at=task.locked_at).update(
+        status='DONE', attempts=task.attempts + 1, finished_at=timezone.now(), locked_at=None, dedupe_key=None,
+    )
+    if not finished:
+        raise LeaseLost(task.pk)
+
+
+def _claim(task):
+    # Conditional update, so two workers can never both win the same task
+    now = timezone.now()
+    if OutboxTask.objects.filter(pk=task.pk, status='PENDING').update(status='RUNNING', locked_at=now) != 1:
+        return False
+    task.status, task.locked_at = 'RUNNING', now
+    return True
+
+
+def _run_company_tasks(tasks):
+    """Run one company's tasks in queue order, stopping at the first failure so
+    later tasks never overtake an earlier one that is waiting for a retry"""
+    done = 0
+    try:
+        for task in tasks:
+            if not _claim(task):
+                continue
+            if not run_task(task):
+                break
+            done += 1
+    finally:
+        connection.close()
+    return done
+
+
+def release_expired_leases():
+    return OutboxTask.objects.filter(status='RUNNING', locked_at__lt=timezone.now() - LEASE).update(
+        status='PENDING', locked_at=None,
+    )
+
+
+def drain(executor, batch_size=200):
+    """Run one batch of due tasks on the executor. Returns how many succeeded."""
+    close_old_connections()
+    release_expired_leases()
+    now = timezone.now()
+    # Companies with a task in flight (another worker process) are left alone this round
+    busy = set(
+        OutboxTask.objects.filter(status='RUNNING').exclude(company=None).values_list('company_id', flat=True)
+    )
+    # Oldest task of each company that is backing off after a failure; nothing newer may overtake it
+    backing_off = {}
+    for company_id, task_id in (
+        OutboxTask.objects.filter(status='PENDING', available_at__gt=now).exclude(company=None)
+        .order_by('-id').values_list('company_id', 'id')
+    ):
+        backing_off[company_id] = task_id
+
+    # Queue order within a company, companies in parallel
+    by_company = OrderedDict()
+    due = OutboxTask.objects.filter(status='PENDING', available_at__lte=now).order_by('id')[:batch_size]
+    for task in due:
+        if task.company_id in busy or task.id > backing_off.get(task.company_id, task.id):
+            continue
+        by_company.setdefault(task.company_id or f'task-{task.id}', []).append(task)
+
+    futures = [executor.submit(_run_company_tasks, tasks) for tasks in by_company.values()]
+    return sum(future.result() for future in futures)
+
+
+def make_executor(threads):
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix='ledger-worker')
+
+
+# Task handlers
+
+@task('check_milestones')
+def _check_milestones(company_id, payload):
+    company = Company.objects.filter(pk=company_id).first()
+    if company is None:
+        # Deleted or archived since the task was queued
+        return
+    income_transaction = None
+    if payload.get('transaction_id'):
+        income_transaction = Transaction.objects.filter(pk=payload['transaction_id']).first()
+    check_and_update_milestones(company, income_transaction=income_transaction)
+
+
+@task('record_approval_latency')
+def _record_approval_latency(company_id, payload):
+    record_approval_latency(
+        company_id, payload['approver_id'], payload['object_type'],
+        parse_datetime(payload['created_at']), parse_datetime(payload['approved_at']),
+    )
+
+
+@task('purge_blobs', chunked=True)
+def _purge_blobs(company_id, payload):
+    purge_blobs()
+
+
+@task('purge_company', chunked=True)
+def _purge_company(company_id, payload):
+    # Queued without a company_id: the task must not be deleted along with the company's own tasks
+    if purge_company(payload['company_id']):
+        # Its attachments are gone, so their files may be unreferenced now
+        purge_blobs()
@@ -0,0 +1,50 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ledger import approvals
+from ledger.models import Company, Director, Transaction, User
+
+
+class AwaitingTests(TestCase):
+    """Items of deleted and archived companies leave every inbox, the admin's included"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.admin = User.objects.create_user('admin', password='x', role='ADMIN')
+        cls.company = Company.objects.create(name='Inbox Co', created_by=cls.owner)
+        cls.directors = []
+        for index in range(2):
+            user = User.objects.create_user(f'director-{index}', password='x')
+            Director.objects.create(user=user, company=cls.company)
+            cls.directors.append(user)
+        transaction = Transaction.objects.create(
+            company=cls.company, transaction_type='EXPENSE', amount=Decimal('10.00'), description='Pending',
+            date=date(2025, 1, 1), account='COMPANY', created_by=cls.owner,
+            approvals_required=approvals.required_approvals(cls.company, Transaction),
+        )
+        approvals.open_approvals(transaction)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def assertAwaiting(self, count):
+        for user in (self.admin, self.directors[0]):
+            client = self.client_for(user)
+            self.assertEqual(client.get('/api/pending-approvals-count/').data['count'], count)
+            self.assertEqual(len(client.get('/api/approvals/inbox/').data['results']), count)
+
+    def test_soft_deleted_company(self):
+        self.assertAwaiting(1)
+        self.assertEqual(self.client_for(self.owner).delete(f'/api/companies/{self.company.id}/').status_code, 204)
+        self.assertAwaiting(0)
+
+    def test_archived_company(self):
+        Company.all_objects.filter(pk=self.company.pk).update(archived_at=timezone.now())
+        self.assertAwaiting(0)
@@ -0,0 +1,38 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ledger.models import Company, Transaction, User
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.company = Company.objects.create(name='Batch Co', created_by=cls.owner)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def create(self):
+        return {'method': 'POST', 'path': '/api/transactions/', 'body': {
+            'transaction_type': 'EXPENSE', 'amount': '10.00', 'date': '2025-01-01', 'account': 'COMPANY',
+            'description': 'Batched', 'company': self.company.id,
+        }}
+
+    def test_bare_array_of_requests(self):
+        response = self.client.post('/api/batch/', [{'method': 'GET', 'path': '/api/companies/'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['responses'][0]['status'], 200)
+
+    def test_body_that_is_neither_object_nor_array(self):
+        self.assertEqual(self.client.post('/api/batch/', '"requests"', content_type='application/json').status_code, 400)
+
+    def test_streaming_response_fails_an_atomic_batch(self):
+        response = self.client.post('/api/batch/', {'atomic': True, 'requests': [
+            self.create(), {'method': 'GET', 'path': '/api/summary/consolidated/'}, self.create(),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['rolled_back'])
+        self.assertEqual([item['status'] for item in response.data['responses']], [201, 400])
+        self.assertFalse(Transaction.objects.exists())
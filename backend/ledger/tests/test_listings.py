@@ -0,0 +1,89 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from ledger.models import (
+    Attachment, Blob, Company, Director, FxRate, Milestone, Project, Salary, SalaryApproval, Transaction,
+    TransactionApproval, User,
+)
+from ledger.serializers import MilestoneSerializer, SalarySerializer, TransactionSerializer
+
+
+class ListingsParityTests(TestCase):
+    """The list endpoints, built by ledger.listings, must match their serializers field for field"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.company = Company.objects.create(name='Parity Co', created_by=cls.owner)
+        cls.directors = []
+        for index in range(3):
+            user = User.objects.create_user(f'director-{index}', password='x')
+            cls.directors.append(Director.objects.create(user=user, company=cls.company))
+        users = [director.user for director in cls.directors]
+        FxRate.objects.create(
+            currency='USD', base_currency=cls.company.base_currency, date=date(2024, 1, 1), rate=Decimal('83.12345678'),
+        )
+        project = Project.objects.create(
+            company=cls.company, name='Parity project', start_date=date(2024, 1, 1), project_value=Decimal('1000'),
+            created_by=cls.owner,
+        )
+        blob = Blob.objects.create(sha256='0' * 64, size=10)
+        # Base currency, a converted currency, a currency without a rate; with and without a project
+        for index, currency in enumerate(('INR', 'USD', 'EUR', 'INR')):
+            pending = index % 2 == 0
+            transaction = Transaction.objects.create(
+                company=cls.company, transaction_type='INCOME' if index < 2 else 'EXPENSE', amount=Decimal('1234.50'),
+                currency=currency, description=f'Row {index}', date=date(2024, 2, index + 1), account='COMPANY',
+                project=project if index == 1 else None, is_project_related=index == 1, created_by=users[0],
+                status='PENDING' if pending else 'APPROVED', approvals_required=len(users),
+                approvals_received=1 if pending else len(users),
+            )
+            for user in users:
+                TransactionApproval.objects.create(
+                    transaction=transaction, approver=user, approved=not pending or user == users[0],
+                )
+            if index == 1:
+                Attachment.objects.create(
+                    company=cls.company, transaction=transaction, blob=blob, filename='receipt.pdf',
+                    content_type='application/pdf', size=10, uploaded_by=users[0],
+                )
+        for director in cls.directors[:2]:
+            salary = Salary.objects.create(
+                company=cls.company, director=director, amount=Decimal('50000.00'), currency='USD',
+                date=date(2024, 3, 1), account='COMPANY', created_by=users[0], approvals_required=len(users) - 1,
+            )
+            for other in cls.directors:
+                if other != director:
+                    SalaryApproval.objects.create(salary=salary, approver=other.user)
+            Attachment.objects.create(
+                company=cls.company, salary=salary, blob=blob, filename='payslip.pdf',
+                content_type='application/pdf', size=10, uploaded_by=users[0],
+            )
+        for target, achieved in ((Decimal('1000'), True), (Decimal('1000000'), False), (Decimal('0'), False)):
+            Milestone.objects.create(
+                company=cls.company, target_amount=target, label=str(target), created_by=cls.owner,
+                achieved=achieved, achieved_at=date(2024, 6, 1) if achieved else None,
+            )
+
+    def assertListMatches(self, url, serializer_class, queryset):
+        # Both in the model's default ordering
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get(url, {'company': self.company.id})
+        self.assertEqual(response.status_code, 200)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(json.loads(response.content), json.loads(expected))
+
+    def test_transactions(self):
+        self.assertListMatches('/api/transactions/', TransactionSerializer, Transaction.objects.filter(company=self.company))
+
+    def test_salaries(self):
+        self.assertListMatches('/api/salaries/', SalarySerializer, Salary.objects.filter(company=self.company))
+
+    def test_milestones(self):
+        self.assertListMatches('/api/milestones/', MilestoneSerializer, Milestone.objects.filter(company=self.company))
@@ -0,0 +1,40 @@
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ledger import periods
+from ledger.models import Company, Transaction, User
+
+
+class PeriodLockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.company = Company.objects.create(name='Period Co', created_by=cls.owner)
+
+    def test_checks_the_committed_close_not_the_loaded_company(self):
+        stale = Company.objects.get(pk=self.company.pk)
+        Company.objects.filter(pk=self.company.pk).update(books_closed_through=date(2025, 1, 31))
+        with self.assertRaises(periods.PeriodLocked):
+            periods.lock_period_open(stale, date(2025, 1, 15))
+        periods.lock_period_open(stale, date(2025, 2, 1))
+
+    def test_create_races_a_period_close(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        lock_period_open = periods.lock_period_open
+
+        def close_first(company, *dates):
+            # The month closes after the request loaded its company, before the row is saved
+            Company.objects.filter(pk=company.pk).update(books_closed_through=date(2025, 1, 31))
+            return lock_period_open(company, *dates)
+
+        with mock.patch('ledger.views.lock_period_open', close_first):
+            response = client.post('/api/transactions/', {
+                'transaction_type': 'EXPENSE', 'amount': '10.00', 'date': '2025-01-15', 'account': 'COMPANY',
+                'description': 'Late', 'company': self.company.id,
+            }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Transaction.objects.exists())
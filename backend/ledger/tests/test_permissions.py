@@ -0,0 +1,45 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ledger.models import Company, Director, Milestone, Project, Salary, Transaction, User
+
+
+class OutsiderCreateTests(TestCase):
+    """Creating rows in someone else's company is refused with 403 and saves nothing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.company = Company.objects.create(name='Private Co', created_by=cls.owner)
+        cls.director = Director.objects.create(user=User.objects.create_user('director', password='x'), company=cls.company)
+        cls.outsider = User.objects.create_user('outsider', password='x', role='COMPANY')
+        cls.newcomer = User.objects.create_user('newcomer', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.outsider)
+
+    def assertRefused(self, path, body, model):
+        count = model.objects.count()
+        response = self.client.post(path, {'company': self.company.id, **body}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(model.objects.count(), count)
+
+    def test_project(self):
+        self.assertRefused('/api/projects/', {'name': 'Theirs', 'start_date': '2025-01-01', 'project_value': '100'}, Project)
+
+    def test_milestone(self):
+        self.assertRefused('/api/milestones/', {'target_amount': '1000', 'label': 'Theirs'}, Milestone)
+
+    def test_director(self):
+        self.assertRefused('/api/directors/', {'user_id': self.newcomer.id}, Director)
+
+    def test_transaction(self):
+        self.assertRefused('/api/transactions/', {
+            'transaction_type': 'EXPENSE', 'amount': '10.00', 'date': '2025-01-01', 'account': 'COMPANY',
+        }, Transaction)
+
+    def test_salary(self):
+        self.assertRefused('/api/salaries/', {
+            'director': self.director.id, 'amount': '10.00', 'date': '2025-01-01', 'account': 'COMPANY',
+        }, Salary)
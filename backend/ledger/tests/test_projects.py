@@ -0,0 +1,46 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ledger import approvals
+from ledger.models import Company, Director, Project, User
+
+
+class ProjectListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.company = Company.objects.create(name='Project Co', created_by=cls.owner)
+        for index in range(3):
+            user = User.objects.create_user(f'director-{index}', password='x')
+            Director.objects.create(user=user, company=cls.company)
+
+    def add_projects(self, count):
+        for index in range(count):
+            project = Project.objects.create(
+                company=self.company, name=f'Project {index}', start_date=date(2025, 1, 1),
+                project_value=Decimal('1000'), created_by=self.owner,
+                approvals_required=approvals.required_approvals(self.company, Project),
+            )
+            approvals.open_approvals(project)
+
+    def list_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/projects/', {'company': self.company.id})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_no_queries_per_project(self):
+        self.add_projects(2)
+        few, _ = self.list_queries()
+        self.add_projects(10)
+        many, data = self.list_queries()
+        self.assertEqual(many, few)
+        self.assertEqual(len(data), 12)
+        self.assertFalse(any(item['all_approved'] for item in data))
@@ -0,0 +1,58 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ledger import throttling
+from ledger.models import Company, Director, User
+
+
+# Only the company buckets are small enough to run out here
+RATES = {'write': '1000/min', 'company_write': '3/min', 'heavy_read': '1000/min', 'company_heavy_read': '3/min'}
+
+
+@override_settings(LEDGER_THROTTLE_RATES=RATES, LEDGER_THROTTLE_DB_PATH=None)
+class CompanyThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x', role='COMPANY')
+        cls.company = Company.objects.create(name='Throttled Co', created_by=cls.owner)
+        cls.director = User.objects.create_user('director', password='x')
+        Director.objects.create(user=cls.director, company=cls.company)
+        cls.outsider = User.objects.create_user('outsider', password='x', role='COMPANY')
+
+    def setUp(self):
+        # Fresh buckets and memberships for every test
+        throttling._buckets.clear()
+        throttling._config.cache_clear()
+        throttling._memberships.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def summary(self, user):
+        return self.client_for(user).get('/api/summary/', {'company': self.company.id})
+
+    def test_members_share_the_company_bucket(self):
+        for user in (self.owner, self.director, self.owner):
+            self.assertEqual(self.summary(user).status_code, 200)
+        self.assertEqual(self.summary(self.director).status_code, 429)
+
+    def test_outsider_cannot_drain_the_company_bucket(self):
+        for _ in range(10):
+            self.assertEqual(self.summary(self.outsider).status_code, 403)
+        for user in (self.owner, self.director, self.owner):
+            self.assertEqual(self.summary(user).status_code, 200)
+
+    def test_outsider_writes_naming_the_company_are_not_charged_to_it(self):
+        body = {
+            'transaction_type': 'EXPENSE', 'amount': '10.00', 'date': '2025-01-01', 'account': 'COMPANY',
+            'description': 'Outsider', 'company': self.company.id,
+        }
+        outsider = self.client_for(self.outsider)
+        for _ in range(10):
+            self.assertEqual(outsider.post('/api/transactions/', body, format='json').status_code, 403)
+        owner = self.client_for(self.owner)
+        for _ in range(3):
+            self.assertEqual(owner.post('/api/transactions/', body, format='json').status_code, 201)
+        self.assertEqual(owner.post('/api/transactions/', body, format='json').status_code, 429)
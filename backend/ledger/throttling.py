@@ -0,0 +1,241 @@
+"""Request throttling with token buckets, per user (or client IP) and per company.
+
+Each scope has a rate in LEDGER_THROTTLE_RATES such as '300/min': a bucket of
+300 tokens that refills at 300 a minute, so a client can burst up to the
+full amount and then gets the steady rate. A scope without a rate is not
+throttled. Rejected requests get 429 with Retry-After.
+
+A bucket is stored as the one number GCRA needs (the "theoretical arrival
+time" of the next request), so taking a token is a read and a write of one
+dict entry. There is no lock: two threads of a process taking a token from
+the same bucket at the same instant can both be let through. Buckets are
+per process unless LEDGER_THROTTLE_DB_PATH names a SQLite file, which every
+worker then shares; each throttle then takes its token with one UPSERT.
+"""
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+from rest_framework.throttling import BaseThrottle
+
+from .models import Company
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Expired buckets are forgotten once a process holds this many
+MAX_MEMORY_BUCKETS = 100_000
+PRUNE_EVERY = 1000  # takes, for the SQLite buckets
+# How long a user's membership of a company is trusted for the company buckets, and how many are kept
+MEMBERSHIP_CACHE_SECONDS = 60
+MAX_MEMBERSHIPS = 100_000
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*([smhd])[a-z]*\s*$')
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """(seconds per token, bucket size) of a DRF-style rate: '100/min', '5/s', '1000/day'"""
+    match = _RATE_RE.match(rate.lower())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f'Invalid throttle rate {rate!r}')
+    count = int(match.group(1))
+    return _PERIODS[match.group(2)] / count, count
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._next = {}
+
+    def take(self, key, interval, size, now=None):
+        """Seconds to wait before `key` may try again, or 0 if it got a token"""
+        now = time.monotonic() if now is None else now
+        arrival = max(self._next.get(key, now), now) + interval
+        wait = arrival - now - interval * size
+        if wait > 0:
+            return wait
+        if len(self._next) >= MAX_MEMORY_BUCKETS:
+            self.prune(now)
+        self._next[key] = arrival
+        return 0
+
+    def prune(self, now):
+        # A bucket whose next arrival has passed is full, the same as no bucket
+        for key, arrival in list(self._next.items()):
+            if arrival <= now:
+                self._next.pop(key, None)
+
+
+class SQLiteBuckets:
+    """The same buckets in a SQLite file shared by every worker process.
+
+    The file only holds throttle state, so its writes never wait for the
+    ledger database, and it is not fsynced: losing it forgets who was throttled.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, next REAL NOT NULL) WITHOUT ROWID'
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, interval, size, now=None):
+        # Wall-clock time, as the processes sharing the file have nothing else in common
+        now = time.time() if now is None else now
+        connection = self._connection()
+        taken = connection.execute(
+            'INSERT INTO bucket (key, next) VALUES (?1, ?2 + ?3) '
+            'ON CONFLICT (key) DO UPDATE SET next = max(next, ?2) + ?3 '
+            'WHERE max(next, ?2) - ?2 <= ?4 '
+            'RETURNING next',
+            (key, now, interval, interval * (size - 1)),
+        ).fetchone()
+        self._takes += 1
+        if self._takes % PRUNE_EVERY == 0:
+            connection.execute('DELETE FROM bucket WHERE next <= ?', (now,))
+        if taken is not None:
+            return 0
+        row = connection.execute('SELECT next FROM bucket WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return 0
+        return max(max(row[0], now) - now - interval * (size - 1), 0) or interval
+
+
+_buckets = {}
+
+
+def buckets():
+    """The bucket store LEDGER_THROTTLE_DB_PATH selects, one per process"""
+    path = getattr(settings, 'LEDGER_THROTTLE_DB_PATH', None)
+    store = _buckets.get(path)
+    if store is None:
+        store = _buckets.setdefault(path, SQLiteBuckets(path) if path else MemoryBuckets())
+    return store
+
+
+@lru_cache(maxsize=None)
+def _config():
+    # Read once rather than per request; settings are only looked up through a lazy proxy
+    return getattr(settings, 'LEDGER_THROTTLE_RATES', {}), buckets()
+
+
+@receiver(setting_changed)
+def _settings_changed(setting, **kwargs):
+    if setting.startswith('LEDGER_THROTTLE_'):
+        _config.cache_clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttles the requests of `methods` (all if None) in `scope`, one bucket per key()"""
+
+    scope = None
+    methods = None
+
+    def key(self, request, view):
+        user = request.user
+        if user is not None and user.is_authenticated:
+            return f'user-{user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self._wait = 0
+        rates, store = _config()
+        rate = rates.get(self.scope)
+        if rate is None or (self.methods is not None and request.method not in self.methods):
+            return True
+        key = self.key(request, view)
+        if key is None:
+            return True
+        interval, size = parse_rate(rate)
+        self._wait = store.take(f'{self.scope}:{key}', interval, size)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+# (user id, company id) -> (expiry, member), apart from the shared cache so it can't evict other entries
+_memberships = {}
+
+
+def _is_member(user, company_id):
+    """Whether the user owns or directs the company, or is an admin (remembered for MEMBERSHIP_CACHE_SECONDS)"""
+    if user is None or not user.is_authenticated:
+        return False
+    if user.role == 'ADMIN' or user.is_staff or user.is_superuser:
+        return True
+    key, now = (user.pk, company_id), time.monotonic()
+    entry = _memberships.get(key)
+    if entry is None or entry[0] <= now:
+        if len(_memberships) >= MAX_MEMBERSHIPS:
+            _memberships.clear()
+        member = Company.objects.filter(pk=company_id).filter(Q(created_by=user) | Q(directors__user=user)).exists()
+        entry = _memberships[key] = (now + MEMBERSHIP_CACHE_SECONDS, member)
+    return entry[1]
+
+
+class CompanyThrottleMixin:
+    """One bucket per company named in ?company= or the request body, shared by all its users.
+
+    Only the company's own users draw from it, so nobody else can use up a
+    company's requests by naming it; their requests are left to the per-user
+    bucket.
+    """
+
+    def key(self, request, view):
+        company = request.query_params.get('company')
+        if company is None and request.method not in SAFE_METHODS:
+            data = request.data
+            company = data.get('company') if hasattr(data, 'get') else None
+        company = str(company or '')
+        if not company.isdigit() or not _is_member(request.user, int(company)):
+            return None
+        return f'company-{company}'
+
+
+class UserWriteThrottle(TokenBucketThrottle):
+    scope = 'write'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class CompanyWriteThrottle(CompanyThrottleMixin, UserWriteThrottle):
+    scope = 'company_write'
+
+
+class HeavyReadThrottle(TokenBucketThrottle):
+    scope = 'heavy_read'
+    methods = SAFE_METHODS
+
+
+class CompanyHeavyReadThrottle(CompanyThrottleMixin, HeavyReadThrottle):
+    scope = 'company_heavy_read'
+
+
+class AuthThrottle(TokenBucketThrottle):
+    """Login and registration, per client IP whoever they claim to be"""
+
+    scope = 'auth'
+
+    def key(self, request, view):
+        return f'ip-{self.get_ident(request)}'
+
+
+# Summaries and counts that aggregate whole ledgers
+HEAVY_READ_THROTTLES = [HeavyReadThrottle, CompanyHeavyReadThrottle]
+AUTH_THROTTLES = [AuthThrottle]
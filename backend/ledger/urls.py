@@ -5,8 +5,9 @@ from .views import (
     register, login_view, current_user, refresh_token_view,
     admin_create_user, list_all_users, admin_update_user, admin_delete_user,
     CompanyViewSet, DirectorViewSet, ProjectViewSet,
-    TransactionViewSet, SalaryViewSet, MilestoneViewSet, summary, admin_dashboard,
-    pending_approvals_count
+    TransactionViewSet, SalaryViewSet, MilestoneViewSet, RecurringEntryViewSet, AttachmentViewSet, summary, consolidated_summary, bootstrap,
+    admin_dashboard, pending_approvals_count, approval_inbox, approval_latency, approval_latency_prometheus,
+    closed_periods, close_period_view, reopen_period_view, audit_log, sync_changes, batch
 )
 
 
@@ -17,6 +18,8 @@ router.register(r'projects', ProjectViewSet, basename='project')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'salaries', SalaryViewSet, basename='salary')
 router.register(r'milestones', MilestoneViewSet, basename='milestone')
+router.register(r'recurring', RecurringEntryViewSet, basename='recurring')
+router.register(r'attachments', AttachmentViewSet, basename='attachment')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -30,5 +33,16 @@ urlpatterns = [
     path('admin/users/<int:user_id>/delete/', admin_delete_user, name='admin_delete_user'),
     path('admin/dashboard/', admin_dashboard, name='admin_dashboard'),
     path('summary/', summary, name='summary'),
+    path('summary/consolidated/', consolidated_summary, name='consolidated_summary'),
+    path('bootstrap/', bootstrap, name='bootstrap'),
     path('pending-approvals-count/', pending_approvals_count, name='pending_approvals_count'),
+    path('approvals/inbox/', approval_inbox, name='approval_inbox'),
+    path('periods/', closed_periods, name='closed_periods'),
+    path('periods/close/', close_period_view, name='close_period'),
+    path('periods/reopen/', reopen_period_view, name='reopen_period'),
+    path('audit/', audit_log, name='audit_log'),
+    path('sync/', sync_changes, name='sync_changes'),
+    path('batch/', batch, name='batch'),
+    path('metrics/approval-latency/', approval_latency, name='approval_latency'),
+    path('metrics/approval-latency/prometheus/', approval_latency_prometheus, name='approval_latency_prometheus'),
 ]
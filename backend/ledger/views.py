@@ -1,30 +1,54 @@
-from datetime import date as date_class, datetime
+import hashlib
+import json
+from datetime import date as date_class, datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
 
-from django.db.models import Sum, Case, When, F, DecimalField, Q
-from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import api_view, permission_classes, action
+from django.db import transaction as db_transaction
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from rest_framework import mixins, viewsets, status, permissions
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes, action
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import (
-    User, Company, Director, Project, ProjectApproval,
-    Transaction, TransactionApproval, Salary, Milestone
+    User, Company, Director, Project,
+    Transaction, Salary, Milestone, ClosedPeriod, RecurringEntry, Attachment, AuditEntry, OutboxTask, SyncChange
 )
 from django.db.models import Q
+from . import approvals, attachments, columnar, listings, sync, throttling
+from . import batch as batch_requests
+from .bookkeeping import record_change, snapshot
+from .idempotency import idempotent
+from .metrics import (
+    cached, company_cache_version, invalidate_company_caches, approval_latency_stats, render_approval_latency_prometheus, render_prometheus
+)
+from .periods import close_period, lock_period_open, reopen_period
+from .reports import money, project_completion, project_monthly_series, project_transactions
+from .search import search_transactions
+from .tasks import enqueue
+from .snapshots import account_totals, account_totals_many
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, LoginSerializer, AdminCreateUserSerializer,
     CompanySerializer, DirectorSerializer,
     ProjectSerializer, ProjectApprovalSerializer,
     TransactionSerializer, TransactionApprovalSerializer,
-    SalarySerializer, MilestoneSerializer
+    SalarySerializer, MilestoneSerializer, RecurringEntrySerializer, AttachmentSerializer, AuditEntrySerializer
 )
 
 
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(throttling.AUTH_THROTTLES)
 def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
@@ -40,6 +64,7 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(throttling.AUTH_THROTTLES)
 def login_view(request):
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
@@ -186,6 +211,31 @@ class CompanyViewSet(viewsets.ModelViewSet):
             logger.error(f'Error creating company: {str(e)}', exc_info=True)
             raise
 
+    def perform_destroy(self, instance):
+        # Soft delete: hidden at once, rows purged in chunks by the workers once the grace period is over
+        instance.deleted_at = timezone.now()
+        instance.save(update_fields=['deleted_at'])
+        enqueue(
+            'purge_company', payload={'company_id': instance.pk}, dedupe_key=f'purge_company:{instance.pk}',
+            delay=timedelta(days=settings.LEDGER_COMPANY_PURGE_DELAY_DAYS),
+        )
+        invalidate_company_caches(instance.pk)
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        """Undo a delete whose rows haven't been purged yet; owner or admin only"""
+        company = Company.all_objects.filter(pk=pk, deleted_at__isnull=False).first()
+        user = request.user
+        if company is None:
+            return Response({'error': 'No deleted company with this id'}, status=status.HTTP_404_NOT_FOUND)
+        if company.created_by != user and user.role != 'ADMIN' and not user.is_superuser:
+            return Response({'error': 'Only the company owner can restore it'}, status=status.HTTP_403_FORBIDDEN)
+        company.deleted_at = None
+        company.save(update_fields=['deleted_at'])
+        OutboxTask.objects.filter(dedupe_key=f'purge_company:{company.pk}', status='PENDING').delete()
+        invalidate_company_caches(company.pk)
+        return Response(CompanySerializer(company).data)
+
 
 class DirectorViewSet(viewsets.ModelViewSet):
     serializer_class = DirectorSerializer
@@ -207,20 +257,84 @@ class DirectorViewSet(viewsets.ModelViewSet):
         user = self.request.user
         # Only company owner can add directors
         if company.created_by != user and user.role != 'ADMIN':
-            return Response({'error': 'Only company owner can add directors'}, status=status.HTTP_403_FORBIDDEN)
+            raise PermissionDenied('Only company owner can add directors')
         serializer.save()
 
 
 # Project Views
-class ProjectViewSet(viewsets.ModelViewSet):
+class BulkApproveMixin:
+    """POST .../bulk-approve/ {ids: [...], notes} for the viewsets of approvable items"""
+    MAX_BULK_IDS = 500
+
+    @action(detail=False, methods=['post'], url_path='bulk-approve')
+    @idempotent
+    def bulk_approve(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.MAX_BULK_IDS:
+            return Response({'error': f'At most {self.MAX_BULK_IDS} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+        approved, errors = approvals.approve_many(
+            self.get_queryset(), list(dict.fromkeys(ids)), request.user, request.data.get('notes', ''),
+        )
+        return Response({
+            'approved': self.get_serializer(approved, many=True).data,
+            'errors': {str(pk): error for pk, error in errors.items()},
+        })
+
+
+class AttachmentsMixin:
+    """GET/POST .../{id}/attachments/ (multipart field `file`) for the viewsets of rows that take receipts"""
+
+    @action(detail=True, methods=['get', 'post'], parser_classes=[MultiPartParser])
+    def attachments(self, request, pk=None):
+        parent = self.get_object()
+        if request.method == 'GET':
+            return Response(AttachmentSerializer(parent.attachments.all(), many=True).data)
+        if request.user not in parent.company.get_all_members():
+            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Send the file in the multipart field "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        attachment = attachments.store(upload, parent, request.user)
+        return Response(AttachmentSerializer(attachment).data, status=status.HTTP_201_CREATED)
+
+    def _queue_blob_purge(self, instance):
+        # Deleting the row cascades to its attachments; their blobs may now be orphaned
+        if instance.attachments.exists():
+            enqueue('purge_blobs', dedupe_key='purge_blobs')
+
+
+class ColumnarListMixin:
+    """?format=columnar (or arrow) and ?fields= on the list action, read with values_list(), see ledger/columnar.py"""
+    columnar_columns = None
+
+    def get_renderers(self):
+        if self.action == 'list':
+            return [renderer() for renderer in columnar.renderers()]
+        return super().get_renderers()
+
+    def columnar_list(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(columnar.from_queryset(queryset, self.columnar_columns, self.request.query_params.get('fields')))
+
+
+class ProjectViewSet(BulkApproveMixin, viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
 
+    ORDERING_FIELDS = ('profit', 'income_total', 'expense_total', 'project_value', 'start_date', 'created_at', 'name')
+
     def get_queryset(self):
         company_id = self.request.query_params.get('company')
-        qs = Project.objects.all()
+        qs = Project.objects.filter(company__deleted_at__isnull=True).select_related('company', 'created_by').prefetch_related(
+            'approvals__approver',
+        )
         if company_id:
             qs = qs.filter(company_id=company_id)
+        ordering = self.request.query_params.get('ordering', '')
+        if ordering.lstrip('-') in self.ORDERING_FIELDS:
+            qs = qs.order_by(ordering, '-id')
         user = self.request.user
         if user.role == 'ADMIN':
             return qs
@@ -235,135 +349,245 @@ class ProjectViewSet(viewsets.ModelViewSet):
         user = self.request.user
         # Check if user can create project for this company
         if company.created_by != user and not Director.objects.filter(company=company, user=user).exists() and user.role != 'ADMIN':
-            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        project = serializer.save(created_by=user)
+            raise PermissionDenied('Not authorized')
+        project = serializer.save(created_by=user, approvals_required=approvals.required_approvals(company, Project))
         # Create approval records only for directors (not company owner)
         # If only one director, no approval needed
-        directors = Director.objects.filter(company=company).select_related('user')
-        if directors.count() > 1:
-            for director in directors:
-                ProjectApproval.objects.get_or_create(project=project, approver=director.user)
+        approvals.open_approvals(project)
+        record_change(None, snapshot(project))
+
+    def perform_update(self, serializer):
+        before = snapshot(serializer.instance)
+        project = serializer.save()
+        record_change(before, snapshot(project))
+
+    def perform_destroy(self, instance):
+        before = snapshot(instance)
+        instance.delete()
+        record_change(before, None)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def approve(self, request, pk=None):
         project = self.get_object()
-        user = request.user
         # Check if user is a member
-        if user not in project.company.get_all_members():
+        if request.user not in project.company.get_all_members():
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        approval, created = ProjectApproval.objects.get_or_create(
-            project=project, approver=user
-        )
-        approval.approved = True
-        approval.approved_at = datetime.now()
-        approval.notes = request.data.get('notes', '')
-        approval.save()
-        # Check if all approved - only need approval if more than 1 director
-        directors = Director.objects.filter(company=project.company)
-        if directors.count() <= 1:
-            project.status = 'APPROVED'
-            project.save()
-        elif project.all_approved:
-            project.status = 'APPROVED'
-            project.save()
+        project = approvals.approve(project, request.user, request.data.get('notes', ''))
         return Response(ProjectSerializer(project).data)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def reject(self, request, pk=None):
         project = self.get_object()
-        user = request.user
-        if user not in project.company.get_all_members():
+        if request.user not in project.company.get_all_members():
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        project.status = 'REJECTED'
-        project.save()
+        project = approvals.reject(project, request.user)
         return Response(ProjectSerializer(project).data)
 
+    @action(detail=True, methods=['get'], renderer_classes=columnar.renderers(arrow=False))
+    def ledger(self, request, pk=None):
+        """Approved transactions with running balance, monthly cash-flow series and completion.
+
+        ?format=columnar turns the series and the page of transactions (narrowed by ?fields=) into arrays per column.
+        """
+        project = self.get_object()
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = max(1, min(int(request.query_params.get('page_size', 50)), 500))
+        except ValueError:
+            return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            transactions = project_transactions(project)
+            count = Transaction.objects.filter(project=project, status='APPROVED').count()
+            offset = (page - 1) * page_size
+            return {
+                'project': {
+                    'id': project.id,
+                    'name': project.name,
+                    'project_value': money(project.project_value),
+                    'currency': project.currency,
+                    'income_total': money(project.income_total),
+                    'expense_total': money(project.expense_total),
+                    'profit': money(project.profit),
+                    'completion_percent': project_completion(project),
+                },
+                'series': project_monthly_series(project),
+                'transactions': {
+                    'count': count,
+                    'page': page,
+                    'page_size': page_size,
+                    'next': page + 1 if offset + page_size < count else None,
+                    'previous': page - 1 if page > 1 else None,
+                    'results': [
+                        {
+                            'id': row['id'],
+                            'date': row['date'].isoformat(),
+                            'transaction_type': row['transaction_type'],
+                            'amount': money(row['amount']),
+                            'currency': row['currency'],
+                            'base_amount': money(row['base_amount']),
+                            'description': row['description'],
+                            'account': row['account'],
+                            'created_by_name': row['created_by__username'],
+                            'running_balance': money(row['running_balance']),
+                        }
+                        for row in transactions[offset:offset + page_size]
+                    ],
+                },
+            }
+
+        # version moves with every approved-transaction change, updated_at with project edits,
+        # the company version with period reopens
+        key = (
+            f'project-ledger:{project.pk}:{project.version}:{project.updated_at.timestamp()}:'
+            f'{company_cache_version(project.company_id)}:{page}:{page_size}'
+        )
+        data = cached('project_ledger', key, build)
+        if columnar.requested(request):
+            data = {
+                **data,
+                'series': columnar.from_rows(data['series']),
+                'transactions': {
+                    **data['transactions'],
+                    'results': columnar.from_rows(data['transactions']['results'], request.query_params.get('fields')),
+                },
+            }
+        return Response(data)
+
+
+def _parse_decimal(value):
+    return Decimal(value)
+
+
+def _parse_param(value, parse):
+    if not value:
+        return None
+    try:
+        return parse(value)
+    except (ValueError, ArithmeticError):
+        return None
+
 
 # Transaction Views
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ColumnarListMixin, BulkApproveMixin, AttachmentsMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    columnar_columns = columnar.TRANSACTION_COLUMNS
 
     def get_queryset(self):
-        company_id = self.request.query_params.get('company')
-        tx_type = self.request.query_params.get('type')
-        qs = Transaction.objects.all()
+        params = self.request.query_params
+        company_id = params.get('company')
+        tx_type = params.get('type')
+        qs = Transaction.objects.filter(company__deleted_at__isnull=True).select_related(
+            'company', 'project', 'created_by',
+        ).prefetch_related(
+            'approvals__approver', 'attachments',
+        )
         if company_id:
             qs = qs.filter(company_id=company_id)
         if tx_type in ('INCOME', 'EXPENSE', 'SALARY'):
             qs = qs.filter(transaction_type=tx_type)
+        if params.get('status') in ('PENDING', 'APPROVED', 'REJECTED'):
+            qs = qs.filter(status=params['status'])
+        if params.get('project'):
+            qs = qs.filter(project_id=params['project'])
+        # Malformed values are ignored, like an unknown ?type=
+        for param, lookup, parse in (
+            ('date_from', 'date__gte', parse_date),
+            ('date_to', 'date__lte', parse_date),
+            ('min_amount', 'amount__gte', _parse_decimal),
+            ('max_amount', 'amount__lte', _parse_decimal),
+        ):
+            value = _parse_param(params.get(param), parse)
+            if value is not None:
+                qs = qs.filter(**{lookup: value})
         user = self.request.user
-        if user.role == 'ADMIN':
-            return qs
-        elif user.role == 'COMPANY':
-            return qs.filter(company__created_by=user)
+        if user.role == 'COMPANY':
+            qs = qs.filter(company__created_by=user)
         elif user.role == 'DIRECTOR':
-            return qs.filter(company__directors__user=user)
-        return qs.none()
+            qs = qs.filter(company__directors__user=user)
+        elif user.role != 'ADMIN':
+            return qs.none()
+        # After scoping to the user's companies, so fuzzy matching ranks only rows they can see
+        if params.get('q'):
+            qs = search_transactions(qs, params['q'])
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        if columnar.requested(request):
+            return self.columnar_list()
+        # Built from values() rows; the same output as TransactionSerializer(many=True), see ledger/listings.py
+        return Response(listings.transactions(self.filter_queryset(self.get_queryset())))
 
     def perform_create(self, serializer):
         company = serializer.validated_data['company']
         user = self.request.user
         if company.created_by != user and not Director.objects.filter(company=company, user=user).exists() and user.role != 'ADMIN':
-            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        transaction = serializer.save(created_by=user, status='PENDING')
-        # Create approval records only for directors (not company owner)
-        # If only one director, auto-approve
-        directors = Director.objects.filter(company=company).select_related('user')
-        if directors.count() <= 1:
-            transaction.status = 'APPROVED'
-            transaction.save()
-        else:
-            for director in directors:
-                TransactionApproval.objects.get_or_create(transaction=transaction, approver=director.user)
+            raise PermissionDenied('Not authorized')
+        # Checked and saved in one transaction, so the period can't close in between
+        with db_transaction.atomic():
+            lock_period_open(company, serializer.validated_data['date'])
+            transaction = serializer.save(
+                created_by=user, status='PENDING', approvals_required=approvals.required_approvals(company, Transaction),
+            )
+            # Create approval records only for directors (not company owner)
+            # If only one director, auto-approve
+            if not transaction.approvals_required:
+                transaction.status = 'APPROVED'
+                transaction.save()
+            approvals.open_approvals(transaction)
+            record_change(None, snapshot(transaction))
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        with db_transaction.atomic():
+            lock_period_open(instance.company, instance.date, serializer.validated_data.get('date'))
+            before = snapshot(instance)
+            transaction = serializer.save()
+            record_change(before, snapshot(transaction))
+
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            lock_period_open(instance.company, instance.date)
+            before = snapshot(instance)
+            self._queue_blob_purge(instance)
+            instance.delete()
+            record_change(before, None)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def approve(self, request, pk=None):
         transaction = self.get_object()
-        user = request.user
-        if user not in transaction.company.get_all_members():
+        if request.user not in transaction.company.get_all_members():
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        approval, created = TransactionApproval.objects.get_or_create(
-            transaction=transaction, approver=user
-        )
-        approval.approved = True
-        approval.approved_at = datetime.now()
-        approval.notes = request.data.get('notes', '')
-        approval.save()
-        # Check if all approved - only need approval if more than 1 director
-        directors = Director.objects.filter(company=transaction.company)
-        if directors.count() <= 1:
-            transaction.status = 'APPROVED'
-            transaction.save()
-        elif transaction.all_approved:
-            transaction.status = 'APPROVED'
-            transaction.save()
-        
-        # Check milestones if this is an approved income transaction
-        if transaction.status == 'APPROVED' and transaction.transaction_type == 'INCOME':
-            check_and_update_milestones(transaction.company, income_transaction=transaction)
-        
+        transaction = approvals.approve(transaction, request.user, request.data.get('notes', ''))
         return Response(TransactionSerializer(transaction).data)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def reject(self, request, pk=None):
         transaction = self.get_object()
-        user = request.user
-        if user not in transaction.company.get_all_members():
+        if request.user not in transaction.company.get_all_members():
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        transaction.status = 'REJECTED'
-        transaction.save()
+        transaction = approvals.reject(transaction, request.user)
         return Response(TransactionSerializer(transaction).data)
 
 
 # Salary Views
-class SalaryViewSet(viewsets.ModelViewSet):
+class SalaryViewSet(ColumnarListMixin, BulkApproveMixin, AttachmentsMixin, viewsets.ModelViewSet):
     serializer_class = SalarySerializer
     permission_classes = [IsAuthenticated]
+    columnar_columns = columnar.SALARY_COLUMNS
 
     def get_queryset(self):
         company_id = self.request.query_params.get('company')
-        qs = Salary.objects.all()
+        qs = Salary.objects.filter(company__deleted_at__isnull=True).select_related(
+            'company', 'director__user', 'created_by',
+        ).prefetch_related(
+            'approvals__approver', 'attachments',
+        )
         if company_id:
             qs = qs.filter(company_id=company_id)
         user = self.request.user
@@ -377,109 +601,113 @@ class SalaryViewSet(viewsets.ModelViewSet):
         return qs.none()
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def approve(self, request, pk=None):
         salary = self.get_object()
-        user = request.user
-        if user not in salary.company.get_all_members():
+        if request.user not in salary.company.get_all_members():
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        # For salaries, if there's only one director, auto-approve
-        # Otherwise, need approval from other directors
-        directors = Director.objects.filter(company=salary.company)
-        if directors.count() <= 1:
-            salary.status = 'APPROVED'
-            salary.save()
-        else:
-            # If the salary is for a different director, current director can approve
-            # If it's for themselves, it needs approval from other directors
-            if salary.director.user != user:
-                salary.status = 'APPROVED'
-                salary.save()
-            else:
-                # Self-created salary needs approval from others
-                # For simplicity, if any director approves, it's approved
-                salary.status = 'APPROVED'
-                salary.save()
+        salary = approvals.approve(salary, request.user, request.data.get('notes', ''))
         return Response(SalarySerializer(salary).data)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def reject(self, request, pk=None):
         salary = self.get_object()
-        user = request.user
-        if user not in salary.company.get_all_members():
+        if request.user not in salary.company.get_all_members():
             return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        salary.status = 'REJECTED'
-        salary.save()
+        salary = approvals.reject(salary, request.user)
         return Response(SalarySerializer(salary).data)
 
+    def list(self, request, *args, **kwargs):
+        if columnar.requested(request):
+            return self.columnar_list()
+        # Built from values() rows; the same output as SalarySerializer(many=True), see ledger/listings.py
+        return Response(listings.salaries(self.filter_queryset(self.get_queryset())))
+
     def perform_create(self, serializer):
         company = serializer.validated_data['company']
         user = self.request.user
         if company.created_by != user and not Director.objects.filter(company=company, user=user).exists() and user.role != 'ADMIN':
-            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
-        salary = serializer.save(created_by=user, status='PENDING')
-        # Create approval records only for directors (not company owner)
-        # If only one director, auto-approve
-        directors = Director.objects.filter(company=company).select_related('user')
-        if directors.count() <= 1:
-            salary.status = 'APPROVED'
-            salary.save()
-        # Note: Salary approvals are handled separately, not through a separate approval model
-        # Directors can approve/reject through the approve/reject actions
-
-
-def check_and_update_milestones(company, income_transaction=None):
-    """Check and update milestones when income is approved"""
-    from django.db.models import Sum
-    total_income = Transaction.objects.filter(
-        company=company,
-        transaction_type='INCOME',
-        status='APPROVED'
-    ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    
-    # Check incomplete milestones
-    incomplete_milestones = Milestone.objects.filter(
-        company=company,
-        achieved=False
-    )
-    
-    for milestone in incomplete_milestones:
-        if float(total_income) >= float(milestone.target_amount):
-            milestone.achieved = True
-            # Use the date of the income transaction that achieved the milestone
-            # If income_transaction is provided, use its date
-            if income_transaction and income_transaction.date:
-                milestone.achieved_at = income_transaction.date
-            else:
-                # Fallback: find the income transaction that made this milestone achievable
-                # We need to find the transaction where cumulative income first reached the target
-                cumulative = Decimal('0')
-                achieving_transaction = None
-                income_transactions = Transaction.objects.filter(
-                    company=company,
-                    transaction_type='INCOME',
-                    status='APPROVED'
-                ).order_by('date', 'id')
-                
-                for tx in income_transactions:
-                    cumulative += tx.amount
-                    if cumulative >= milestone.target_amount and not achieving_transaction:
-                        achieving_transaction = tx
-                        break
-                
-                if achieving_transaction:
-                    milestone.achieved_at = achieving_transaction.date
-                else:
-                    # Last resort: use latest income transaction date
-                    latest_income = Transaction.objects.filter(
-                        company=company,
-                        transaction_type='INCOME',
-                        status='APPROVED'
-                    ).order_by('-date').first()
-                    if latest_income:
-                        milestone.achieved_at = latest_income.date
-                    else:
-                        milestone.achieved_at = date_class.today()
-            milestone.save()
+            raise PermissionDenied('Not authorized')
+        # Checked and saved in one transaction, so the period can't close in between
+        with db_transaction.atomic():
+            lock_period_open(company, serializer.validated_data['date'])
+            salary = serializer.save(
+                created_by=user, status='PENDING', approvals_required=approvals.required_approvals(company, Salary),
+            )
+            # Create approval records only for directors (not company owner)
+            # If only one director, auto-approve
+            if not salary.approvals_required:
+                salary.status = 'APPROVED'
+                salary.save()
+            # Every other director approves; the paid director can't approve their own salary
+            approvals.open_approvals(salary)
+            record_change(None, snapshot(salary))
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        with db_transaction.atomic():
+            lock_period_open(instance.company, instance.date, serializer.validated_data.get('date'))
+            before = snapshot(instance)
+            salary = serializer.save()
+            record_change(before, snapshot(salary))
+
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            lock_period_open(instance.company, instance.date)
+            before = snapshot(instance)
+            self._queue_blob_purge(instance)
+            instance.delete()
+            record_change(before, None)
+
+
+# Attachment Views
+class AttachmentViewSet(mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Attachment metadata, download and thumbnail; uploads go to .../{transactions,salaries}/{id}/attachments/"""
+    serializer_class = AttachmentSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        qs = Attachment.objects.filter(company__deleted_at__isnull=True)
+        user = self.request.user
+        if user.role == 'ADMIN':
+            return qs
+        elif user.role == 'COMPANY':
+            return qs.filter(company__created_by=user)
+        elif user.role == 'DIRECTOR':
+            return qs.filter(company__directors__user=user)
+        return qs.none()
+
+    def perform_destroy(self, instance):
+        if self.request.user not in instance.company.get_all_members():
+            raise PermissionDenied('Not authorized')
+        instance.delete()
+        enqueue('purge_blobs', dedupe_key='purge_blobs')
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The file itself; supports Range requests"""
+        response = attachments.serve(request, self.get_object())
+        if response is None:
+            return Response({'error': 'File is missing from storage'}, status=status.HTTP_404_NOT_FOUND)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def thumbnail(self, request, pk=None):
+        """JPEG preview of an image attachment, rendered on first request"""
+        attachment = self.get_object()
+        try:
+            path = attachments.thumbnail(attachment)
+        except TimeoutError:
+            response = Response({'error': 'Thumbnail is still rendering'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '2'
+            return response
+        response = None
+        if path is not None:
+            response = attachments.serve(request, attachment, path, 'image/jpeg', as_attachment=False)
+        if response is None:
+            return Response({'error': 'No thumbnail for this attachment'}, status=status.HTTP_404_NOT_FOUND)
+        return response
 
 
 # Milestone Views
@@ -489,7 +717,7 @@ class MilestoneViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         company_id = self.request.query_params.get('company')
-        qs = Milestone.objects.all()
+        qs = Milestone.objects.filter(company__deleted_at__isnull=True)
         if company_id:
             qs = qs.filter(company_id=company_id)
         user = self.request.user
@@ -501,14 +729,51 @@ class MilestoneViewSet(viewsets.ModelViewSet):
             return qs.filter(company__directors__user=user)
         return qs.none()
 
+    def list(self, request, *args, **kwargs):
+        # Built from values() rows; the same output as MilestoneSerializer(many=True), see ledger/listings.py
+        return Response(listings.milestones(self.filter_queryset(self.get_queryset())))
+
     def perform_create(self, serializer):
         company = serializer.validated_data['company']
         user = self.request.user
         if company.created_by != user and not Director.objects.filter(company=company, user=user).exists() and user.role != 'ADMIN':
-            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+            raise PermissionDenied('Not authorized')
         milestone = serializer.save(created_by=user)
         # Check if milestone is already achieved
-        check_and_update_milestones(company)
+        enqueue('check_milestones', company.id, dedupe_key=f'check_milestones:{company.id}')
+
+    def perform_destroy(self, instance):
+        before = snapshot(instance)
+        instance.delete()
+        record_change(before, None)
+
+
+# Recurring Entry Views
+class RecurringEntryViewSet(viewsets.ModelViewSet):
+    """Schedules booked by `manage.py materialize_recurring`"""
+    serializer_class = RecurringEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        company_id = self.request.query_params.get('company')
+        qs = RecurringEntry.objects.filter(company__deleted_at__isnull=True).select_related('company', 'director__user')
+        if company_id:
+            qs = qs.filter(company_id=company_id)
+        user = self.request.user
+        if user.role == 'ADMIN':
+            return qs
+        elif user.role == 'COMPANY':
+            return qs.filter(company__created_by=user)
+        elif user.role == 'DIRECTOR':
+            return qs.filter(company__directors__user=user)
+        return qs.none()
+
+    def perform_create(self, serializer):
+        company = serializer.validated_data['company']
+        user = self.request.user
+        if company.created_by != user and not Director.objects.filter(company=company, user=user).exists() and user.role != 'ADMIN':
+            raise PermissionDenied('Not authorized')
+        serializer.save(created_by=user, next_date=serializer.validated_data['start_date'])
 
 
 # Admin Dashboard View
@@ -532,52 +797,67 @@ def admin_dashboard(request):
 # Pending Approvals Count
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes(throttling.HEAVY_READ_THROTTLES)
 def pending_approvals_count(request):
     """Get count of pending approvals for the current user"""
     user = request.user
-    count = 0
-    
-    if user.role == 'ADMIN':
-        # Admins see all pending items
-        count += Project.objects.filter(status='PENDING').count()
-        count += Transaction.objects.filter(status='PENDING').count()
-        count += Salary.objects.filter(status='PENDING').count()
-    else:
-        # Get companies the user is associated with
-        companies = Company.objects.filter(
-            Q(created_by=user) | Q(directors__user=user)
-        ).distinct()
-        
-        for company in companies:
-            # Projects pending approval
-            projects = Project.objects.filter(company=company, status='PENDING')
-            for project in projects:
-                # Check if user hasn't approved yet
-                if not ProjectApproval.objects.filter(project=project, approver=user, approved=True).exists():
-                    if user in company.get_all_members():
-                        count += 1
-            
-            # Transactions pending approval
-            transactions = Transaction.objects.filter(company=company, status='PENDING')
-            for transaction in transactions:
-                # Check if user hasn't approved yet
-                if not TransactionApproval.objects.filter(transaction=transaction, approver=user, approved=True).exists():
-                    if user in company.get_all_members():
-                        count += 1
-            
-            # Salaries pending approval
-            salaries = Salary.objects.filter(company=company, status='PENDING')
-            for salary in salaries:
-                # Directors can approve salaries
-                if user in company.get_all_members() and user != salary.created_by:
-                    count += 1
-    
+    # One COUNT per type instead of a query per pending item
+    count = sum(approvals.awaiting(model, user).count() for model in (Project, Transaction, Salary))
     return Response({'count': count})
 
 
+# Approval Inbox View
+INBOX_PAGE_SIZE = 50
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _inbox_cursor(row):
+    micros = (row['created_at'] - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{row['kind']}-{row['id']}"
+
+
+def _parse_inbox_cursor(value):
+    micros, kind, item_id = value.split('-')
+    if kind not in ('project', 'transaction', 'salary'):
+        raise ValueError(kind)
+    return _EPOCH + timedelta(microseconds=int(micros)), kind, int(item_id)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes(throttling.HEAVY_READ_THROTTLES)
+def approval_inbox(request):
+    """Projects, transactions and salaries awaiting the user's approval, newest first; page with ?after=<next>"""
+    params = request.query_params
+    try:
+        cursor = _parse_inbox_cursor(params['after']) if params.get('after') else None
+        limit = min(max(1, int(params.get('limit', INBOX_PAGE_SIZE))), INBOX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'Invalid after or limit'}, status=status.HTTP_400_BAD_REQUEST)
+    rows = approvals.inbox(request.user, limit + 1, cursor)
+    return Response({
+        'results': [{
+            'type': row['kind'],
+            'id': row['id'],
+            'company': row['company_id'],
+            'company_name': row['company_name'],
+            'title': row['title'],
+            'amount': money(row['amount_']),
+            'currency': row['currency'],
+            'date': row['date_'],
+            'created_at': row['created_at'],
+            'created_by': row['created_by_name'],
+            'approvals_required': row['approvals_required'],
+            'approvals_received': row['approvals_received'],
+        } for row in rows[:limit]],
+        'next': _inbox_cursor(rows[limit - 1]) if len(rows) > limit else None,
+    })
+
+
 # Summary View
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes(throttling.HEAVY_READ_THROTTLES)
 def summary(request):
     company_id = request.query_params.get('company')
     if not company_id:
@@ -593,40 +873,27 @@ def summary(request):
     if company.created_by != user and not Director.objects.filter(company=company, user=user).exists() and user.role != 'ADMIN':
         return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Only count approved transactions
-    transactions = Transaction.objects.filter(company=company, status='APPROVED')
-    
-    # Get approved salaries (from Salary model, not Transaction)
-    approved_salaries = Salary.objects.filter(company=company, status='APPROVED')
-    
-    income_total = (
-        transactions.filter(transaction_type='INCOME').aggregate(total=Sum('amount'))['total']
-        or Decimal('0')
-    )
-    expense_total = (
-        transactions.filter(transaction_type='EXPENSE').aggregate(total=Sum('amount'))['total']
-        or Decimal('0')
-    )
-    salary_total = (
-        approved_salaries.aggregate(total=Sum('amount'))['total']
-        or Decimal('0')
-    )
+    as_of = None
+    if request.query_params.get('as_of'):
+        as_of = _parse_param(request.query_params['as_of'], parse_date)
+        if as_of is None:
+            return Response({'error': 'as_of must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(_company_summary(company, as_of))
+
+
+def _company_summary(company, as_of=None):
+    """Balances and milestones of the summary endpoint, shared with bootstrap"""
+    # Approved transactions and salaries per account: nearest month-end snapshot plus the rows after it
+    totals, snapshot_date = account_totals(company.id, as_of=as_of)
+
+    income_total = sum((t['income'] for t in totals.values()), Decimal('0'))
+    expense_total = sum((t['expense'] for t in totals.values()), Decimal('0'))
+    salary_total = sum((t['salary'] for t in totals.values()), Decimal('0'))
 
     def account_balance(account_code: str) -> Decimal:
-        # Calculate from transactions
-        agg = transactions.filter(account=account_code).aggregate(
-            inc=Sum(Case(When(transaction_type='INCOME', then=F('amount')), output_field=DecimalField())),
-            exp=Sum(Case(When(transaction_type='EXPENSE', then=F('amount')), output_field=DecimalField())),
-        )
-        inc = agg['inc'] or Decimal('0')
-        exp = agg['exp'] or Decimal('0')
-        
-        # Subtract salaries from the account where they are debited
-        sal = approved_salaries.filter(account=account_code).aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
-        
-        return inc - exp - sal
+        # Salaries are debited from the account they were paid from
+        account = totals[account_code]
+        return account['income'] - account['expense'] - account['salary']
 
     company_bal = account_balance('COMPANY')
     
@@ -701,7 +968,7 @@ def summary(request):
             'achieved_at': milestone.achieved_at.isoformat() if milestone.achieved_at else None,
         })
 
-    return Response({
+    return {
         'income_total': str(income_total),
         'expense_total': str(expense_total),
         'salary_total': str(salary_total),
@@ -712,4 +979,483 @@ def summary(request):
         'director_balances': director_balances,
         'milestones': milestones_list,
         'today': date_class.today().isoformat(),
+        'as_of': as_of.isoformat() if as_of else None,
+        'books_closed_through': company.books_closed_through.isoformat() if company.books_closed_through else None,
+        'snapshot_date': snapshot_date.isoformat() if snapshot_date else None,
+    }
+
+
+# Consolidated Summary View
+CONSOLIDATED_CHUNK_SIZE = 500
+_TOTAL_FIELDS = ('income_total', 'expense_total', 'salary_total', 'total_balance')
+
+
+def _consolidated_company(company, accounts, milestones):
+    balances = {
+        account: totals['income'] - totals['expense'] - totals['salary'] for account, totals in accounts.items()
+    }
+    income = sum((totals['income'] for totals in accounts.values()), Decimal('0'))
+    expense = sum((totals['expense'] for totals in accounts.values()), Decimal('0'))
+    salary = sum((totals['salary'] for totals in accounts.values()), Decimal('0'))
+    next_target = milestones['next_target'] if milestones else None
+    return {
+        'id': company.id,
+        'name': company.name,
+        'base_currency': company.base_currency,
+        'income_total': income,
+        'expense_total': expense,
+        'salary_total': salary,
+        'total_balance': income - expense - salary,
+        'balances': balances,
+        'milestones': {
+            'achieved': milestones['achieved_count'] if milestones else 0,
+            'next_target': next_target,
+            # As in the summary: approved income against the smallest target not reached yet
+            'progress': min(100, float(income) / float(next_target) * 100) if next_target else None,
+        },
+    }
+
+
+def _decimals_as_strings(value):
+    # As in the other summaries, amounts go out as strings
+    if isinstance(value, dict):
+        return {key: _decimals_as_strings(item) for key, item in value.items()}
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def _consolidated_json(company_ids):
+    """The consolidated summary as JSON chunks, CONSOLIDATED_CHUNK_SIZE companies per round of queries"""
+    grand = {}
+    yield '{"companies": ['
+    separator = ''
+    for start in range(0, len(company_ids), CONSOLIDATED_CHUNK_SIZE):
+        chunk = company_ids[start:start + CONSOLIDATED_CHUNK_SIZE]
+        totals = account_totals_many(chunk)
+        milestones = {
+            row['company_id']: row for row in Milestone.objects.filter(company_id__in=chunk).values('company_id').annotate(
+                achieved_count=Count('id', filter=Q(achieved=True)),
+                next_target=Min('target_amount', filter=Q(achieved=False)),
+            ).order_by()
+        }
+        for company in Company.objects.filter(id__in=chunk).only('id', 'name', 'base_currency').order_by('id'):
+            item = _consolidated_company(company, totals[company.id], milestones.get(company.id))
+            # Amounts are in each company's base currency, so they only add up per currency
+            currency = grand.setdefault(company.base_currency, {
+                'companies': 0, **{field: Decimal('0') for field in _TOTAL_FIELDS},
+                'balances': {account: Decimal('0') for account in item['balances']},
+            })
+            currency['companies'] += 1
+            for field in _TOTAL_FIELDS:
+                currency[field] += item[field]
+            for account, balance in item['balances'].items():
+                currency['balances'][account] += balance
+            yield separator + json.dumps(_decimals_as_strings(item))
+            separator = ','
+    yield '], "totals": ' + json.dumps(_decimals_as_strings(grand)) + '}'
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes(throttling.HEAVY_READ_THROTTLES)
+def consolidated_summary(request):
+    """Totals, account balances and milestone progress of every company the user can see,
+    with grand totals per base currency. Streamed, for admins with thousands of companies."""
+    user = request.user
+    companies = Company.objects.all()
+    if user.role != 'ADMIN' and not user.is_staff and not user.is_superuser:
+        companies = companies.filter(Q(created_by=user) | Q(directors__user=user)).distinct()
+    company_ids = list(companies.order_by('id').values_list('id', flat=True))
+    return StreamingHttpResponse(_consolidated_json(company_ids), content_type='application/json')
+
+
+# Bootstrap View
+BOOTSTRAP_SECTIONS = ('companies', 'summary', 'pending_approvals', 'milestones', 'recent_transactions')
+RECENT_TRANSACTIONS = 10
+
+
+def _section_etag(section, *parts):
+    return f'"{section}-{hashlib.sha1(repr(parts).encode()).hexdigest()[:16]}"'
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes(throttling.HEAVY_READ_THROTTLES)
+def bootstrap(request):
+    """Everything the dashboard loads, in one response.
+
+    ?sections= picks some of BOOTSTRAP_SECTIONS (default all); ?company= defaults
+    to the user's first company. Every section has an ETag under `etags`: send
+    the ones you hold in If-None-Match and unchanged sections are left out and
+    listed under `unchanged`, or the response is a 304 if nothing changed.
+    """
+    user = request.user
+    params = request.query_params
+    sections = [section for section in params.get('sections', '').split(',') if section] or list(BOOTSTRAP_SECTIONS)
+    unknown = set(sections) - set(BOOTSTRAP_SECTIONS)
+    if unknown:
+        return Response({'error': f'Unknown sections: {", ".join(sorted(unknown))}'}, status=status.HTTP_400_BAD_REQUEST)
+    is_admin = user.role == 'ADMIN' or user.is_staff or user.is_superuser
+
+    # One membership lookup for every section, with each company's latest change
+    # sequence (see ledger/sync.py), which is what the ETags are made of
+    companies = Company.objects.annotate(seq=Subquery(
+        SyncChange.objects.filter(company_id=OuterRef('pk')).order_by('-id').values('id')[:1]
+    ))
+    if not is_admin:
+        companies = companies.filter(Q(created_by=user) | Q(directors__user=user)).distinct()
+    companies = list(companies.select_related('created_by').prefetch_related('directors').order_by('id'))
+    by_id = {company.id: company for company in companies}
+    company = companies[0] if companies else None
+    if params.get('company'):
+        company = by_id.get(_parse_param(params['company'], int))
+        if company is None:
+            return Response({'error': 'Company not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    seqs = [(c.id, c.seq) for c in companies]
+    etags = {
+        'companies': _section_etag('companies', seqs),
+        'pending_approvals': _section_etag('pending_approvals', user.id, is_admin, seqs),
+    }
+    if company is not None:
+        for section in ('summary', 'milestones', 'recent_transactions'):
+            etags[section] = _section_etag(section, company.id, company.seq, date_class.today())
+    etags = {section: etag for section, etag in etags.items() if section in sections}
+    held = {tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')}
+    unchanged = [section for section, etag in etags.items() if etag in held]
+    if etags and len(unchanged) == len(etags):
+        return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+    wanted = set(etags) - set(unchanged)
+    context = {'request': request}
+    data = {}
+    if 'companies' in wanted:
+        data['companies'] = CompanySerializer(companies, many=True, context=context).data
+    if 'pending_approvals' in wanted:
+        data['pending_approvals'] = {'count': sum(
+            approvals.awaiting(model, user, companies=list(by_id)).count() for model in (Project, Transaction, Salary)
+        )}
+    if wanted & {'summary', 'milestones'}:
+        # One pass over the balances; milestone progress reuses its approved income
+        summary_data = _company_summary(company)
+        if 'summary' in wanted:
+            data['summary'] = summary_data
+        if 'milestones' in wanted:
+            data['milestones'] = MilestoneSerializer(
+                Milestone.objects.filter(company=company).select_related('company', 'created_by').order_by('target_amount'),
+                many=True, context={**context, 'approved_income': Decimal(summary_data['income_total'])},
+            ).data
+    if 'recent_transactions' in wanted:
+        recent = Transaction.objects.filter(company=company).select_related(
+            'company', 'project', 'created_by',
+        ).prefetch_related('approvals__approver', 'attachments').order_by('-date', '-id')[:RECENT_TRANSACTIONS]
+        data['recent_transactions'] = TransactionSerializer(recent, many=True, context=context).data
+    return Response({
+        'company': company.id if company else None,
+        'sections': data,
+        'etags': etags,
+        'unchanged': unchanged,
     })
+
+
+def _metrics_company_ids(request):
+    """Company ids the current user may see metrics for, narrowed by ?company=; ValueError if that isn't an id"""
+    user = request.user
+    companies = Company.objects.all()
+    if user.role != 'ADMIN' and not user.is_staff and not user.is_superuser:
+        companies = companies.filter(Q(created_by=user) | Q(directors__user=user)).distinct()
+    company_id = request.query_params.get('company')
+    if company_id:
+        companies = companies.filter(id=int(company_id))
+    return list(companies.values_list('id', flat=True))
+
+
+def _metrics_window_days(request):
+    try:
+        days = int(request.query_params.get('days', 30))
+    except (TypeError, ValueError):
+        days = 30
+    return max(1, min(days, 365))
+
+
+# Approval Latency Metrics
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(columnar.renderers())
+def approval_latency(request):
+    """Time-to-approve percentiles per company, approver and object type; ?format=columnar for one array per column"""
+    days = _metrics_window_days(request)
+    try:
+        company_ids = _metrics_company_ids(request)
+    except ValueError:
+        return Response({'error': 'Invalid company'}, status=status.HTTP_400_BAD_REQUEST)
+    stats = approval_latency_stats(company_ids, days=days)
+    results = [
+        {key: value for key, value in group.items() if key != 'buckets'}
+        for group in stats
+    ]
+    if columnar.requested(request):
+        return Response({'window_days': days, **columnar.from_rows(results, request.query_params.get('fields'))})
+    return Response({
+        'window_days': days,
+        'results': results,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def approval_latency_prometheus(request):
+    """Same data as approval_latency, in Prometheus text format"""
+    try:
+        company_ids = _metrics_company_ids(request)
+    except ValueError:
+        return Response({'error': 'Invalid company'}, status=status.HTTP_400_BAD_REQUEST)
+    stats = approval_latency_stats(company_ids, days=_metrics_window_days(request))
+    return HttpResponse(
+        render_approval_latency_prometheus(stats),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def _metrics_scrape_allowed(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if settings.METRICS_TOKEN and constant_time_compare(header, f'Bearer {settings.METRICS_TOKEN}'):
+        return True
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    if authenticated is None:
+        return False
+    user = authenticated[0]
+    return user.role == 'ADMIN' or user.is_staff or user.is_superuser
+
+
+def prometheus_metrics(request):
+    """Prometheus scrape endpoint: request, DB, cache and business metrics.
+
+    Plain Django view so the scrape token doesn't go through DRF's JWT authentication.
+    """
+    if not _metrics_scrape_allowed(request):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _period_company(request):
+    """Resolve ?company= / body company for the period endpoints, owner or admin only"""
+    company_id = request.data.get('company') or request.query_params.get('company')
+    if not company_id:
+        return None, Response({'error': 'company parameter required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        company = Company.objects.get(id=company_id)
+    except (Company.DoesNotExist, ValueError):
+        return None, Response({'error': 'Company not found'}, status=status.HTTP_404_NOT_FOUND)
+    user = request.user
+    if company.created_by != user and user.role != 'ADMIN' and not user.is_superuser:
+        return None, Response({'error': 'Only the company owner can close or reopen periods'}, status=status.HTTP_403_FORBIDDEN)
+    return company, None
+
+
+# Period Close Views
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def closed_periods(request):
+    """Closed months of a company with their frozen per-account totals"""
+    company, error = _period_company(request)
+    if error:
+        return error
+    periods = {}
+    for period in ClosedPeriod.objects.filter(company=company).select_related('closed_by'):
+        entry = periods.setdefault(period.month_end, {
+            'month': period.month_end.strftime('%Y-%m'),
+            'month_end': period.month_end.isoformat(),
+            'closed_by': period.closed_by.username if period.closed_by else None,
+            'closed_at': period.closed_at.isoformat(),
+            'accounts': {},
+        })
+        entry['accounts'][period.account] = {
+            'income': str(period.income),
+            'expense': str(period.expense),
+            'salary': str(period.salary),
+        }
+    return Response({
+        'books_closed_through': company.books_closed_through.isoformat() if company.books_closed_through else None,
+        'periods': list(periods.values()),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def close_period_view(request):
+    """Close a month (body: company, month=YYYY-MM); its rows become read-only"""
+    company, error = _period_company(request)
+    if error:
+        return error
+    month = _parse_param(f"{request.data.get('month', '')}-01", parse_date)
+    if month is None:
+        return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        closed_through = close_period(company, month, request.user)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'books_closed_through': closed_through.isoformat()})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def reopen_period_view(request):
+    """Reopen the most recently closed month of a company"""
+    company, error = _period_company(request)
+    if error:
+        return error
+    try:
+        reopened = reopen_period(company)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'reopened': reopened.strftime('%Y-%m'),
+        'books_closed_through': company.books_closed_through.isoformat() if company.books_closed_through else None,
+    })
+
+
+# Batch View
+MAX_BATCH_REQUESTS = 20
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    """Several API calls in one round trip: {requests: [{method, path, body, headers}], atomic}.
+
+    The calls run in order as the current user; `responses` holds {status, body}
+    for each. With atomic=true they share one transaction, which is rolled back
+    (`rolled_back`) at the first call that fails, and the calls after it don't run.
+    A bare array of calls is taken as `requests`, without atomic.
+    """
+    data = request.data
+    if isinstance(data, list):
+        data = {'requests': data}
+    elif not hasattr(data, 'get'):
+        return Response({'error': 'Send an object with requests, or an array of requests'}, status=status.HTTP_400_BAD_REQUEST)
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'requests must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BATCH_REQUESTS:
+        return Response({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        parsed = [batch_requests.parse(item) for item in items]
+    except batch_requests.InvalidSubRequest as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    responses, rolled_back = batch_requests.run(request, parsed, atomic=bool(data.get('atomic')))
+    return Response({'responses': responses, 'rolled_back': rolled_back})
+
+
+# Audit Log Views
+AUDIT_PAGE_SIZE = 100
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def audit_log(request):
+    """Audit entries, newest first, filtered by company, object and actor; page with ?before=<next>"""
+    params = request.query_params
+    user = request.user
+    is_admin = user.role == 'ADMIN' or user.is_staff or user.is_superuser
+    qs = AuditEntry.objects.select_related('actor')
+    try:
+        if params.get('company'):
+            company = Company.objects.get(id=params['company'])
+            if not is_admin and user not in company.get_all_members():
+                return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+            qs = qs.filter(company=company)
+        elif not is_admin:
+            return Response({'error': 'company parameter required'}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('object_type'):
+            qs = qs.filter(object_type=params['object_type'])
+            if params.get('object_id'):
+                qs = qs.filter(object_id=params['object_id'])
+        if params.get('actor'):
+            qs = qs.filter(actor_id=int(params['actor']))
+        if params.get('before'):
+            qs = qs.filter(id__lt=int(params['before']))
+        limit = min(max(1, int(params.get('limit', AUDIT_PAGE_SIZE))), AUDIT_PAGE_SIZE)
+    except (Company.DoesNotExist, ValueError):
+        return Response({'error': 'Invalid company, actor, before or limit'}, status=status.HTTP_400_BAD_REQUEST)
+    # Keyset pagination on id: every filter combination above has an index ending in id
+    entries = list(qs.order_by('-id')[:limit + 1])
+    return Response({
+        'results': AuditEntrySerializer(entries[:limit], many=True).data,
+        'next': entries[limit - 1].id if len(entries) > limit else None,
+    })
+
+
+# Sync Views
+SYNC_PAGE_SIZE = 500
+
+# SyncChange.model -> (response key, queryset, serializer), with the prefetching of the list endpoints
+SYNC_FEEDS = {
+    'company': ('companies', Company.objects.select_related('created_by'), CompanySerializer),
+    'director': ('directors', Director.objects.select_related('user', 'company'), DirectorSerializer),
+    'project': (
+        'projects',
+        Project.objects.select_related('company', 'created_by').prefetch_related('approvals__approver'),
+        ProjectSerializer,
+    ),
+    'transaction': (
+        'transactions',
+        Transaction.objects.select_related('company', 'project', 'created_by').prefetch_related(
+            'approvals__approver', 'attachments',
+        ),
+        TransactionSerializer,
+    ),
+    'salary': (
+        'salaries',
+        Salary.objects.select_related('company', 'director__user', 'created_by').prefetch_related(
+            'approvals__approver', 'attachments',
+        ),
+        SalarySerializer,
+    ),
+    'milestone': ('milestones', Milestone.objects.select_related('company', 'created_by'), MilestoneSerializer),
+    'recurringentry': (
+        'recurring', RecurringEntry.objects.select_related('company', 'director__user'), RecurringEntrySerializer,
+    ),
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """Rows of a company created, updated or deleted after ?since=<cursor> (0 for everything).
+
+    Pass the returned `cursor` as `since` next time; while `more` is true there
+    are further changes to fetch right away.
+    """
+    params = request.query_params
+    user = request.user
+    try:
+        company = Company.objects.get(id=params.get('company'))
+        since = int(params.get('since', 0))
+        limit = min(max(1, int(params.get('limit', SYNC_PAGE_SIZE))), SYNC_PAGE_SIZE)
+    except (Company.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Invalid company, since or limit'}, status=status.HTTP_400_BAD_REQUEST)
+    if user.role != 'ADMIN' and not user.is_superuser and user not in company.get_all_members():
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+
+    entries = sync.changes_since(company.id, since, limit + 1)
+    more = len(entries) > limit
+    entries = entries[:limit]
+    changed, deleted = {}, {}
+    for entry in entries:
+        (deleted if entry.deleted else changed).setdefault(entry.model, []).append(entry.object_id)
+    result = {'changed': {}, 'deleted': {}}
+    for model, (key, queryset, serializer_class) in SYNC_FEEDS.items():
+        ids = changed.get(model, [])
+        rows = list(queryset.filter(pk__in=ids).order_by('pk')) if ids else []
+        # A row changed and deleted again since its entry was read is deleted too
+        gone = set(ids) - {row.pk for row in rows}
+        if rows:
+            result['changed'][key] = serializer_class(rows, many=True, context={'request': request}).data
+        if gone or model in deleted:
+            result['deleted'][key] = sorted(gone.union(deleted.get(model, [])))
+    result['cursor'] = entries[-1].id if entries else since
+    result['more'] = more
+    return Response(result)